@@ -35,4 +35,13 @@ def rate_cumulative_dead_test_confirmed(model):
     return model.rate_cumulative_dead_test_confirmed()
 
 def rate_cumulative_test_done(model):
-    return model.rate_cumulative_test_done()
\ No newline at end of file
+    return model.rate_cumulative_test_done()
+
+def probability_memo_hits(model):
+    return model.probability_memo.hits if model.probability_memo is not None else 0
+
+def probability_memo_misses(model):
+    return model.probability_memo.misses if model.probability_memo is not None else 0
+
+def probability_rescale_count(model):
+    return model.probability_rescale_count
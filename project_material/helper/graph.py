@@ -0,0 +1,187 @@
+import numpy as np
+
+def erdos_renyi_edges(num_nodes, prob, rng):
+    '''G(n, p) random graph drawn straight into edge arrays, without building a networkx graph.
+    Returns `(edge_u, edge_v)` with `edge_u < edge_v` for every undirected edge.'''
+    num_pairs = num_nodes * (num_nodes - 1) // 2
+    num_edges = rng.binomial(num_pairs, prob) if num_pairs > 0 else 0
+    keys = np.empty(0, dtype=np.int64)
+
+    # Draw random pairs and drop self-loops and duplicates until enough distinct edges are found
+    while keys.size < num_edges:
+        num_draws = int((num_edges - keys.size) * 1.1) + 1
+        u = rng.integers(0, num_nodes, size=num_draws, dtype=np.int64)
+        v = rng.integers(0, num_nodes, size=num_draws, dtype=np.int64)
+        keep = u != v
+        new_keys = np.minimum(u[keep], v[keep]) * num_nodes + np.maximum(u[keep], v[keep])
+        keys = np.unique(np.concatenate([keys, new_keys]))
+
+    if keys.size > num_edges:
+        keys = np.sort(rng.choice(keys, size=num_edges, replace=False))
+    return keys // num_nodes, keys % num_nodes
+
+class CSRAdjacency():
+    '''Undirected weighted contact graph stored as compressed sparse row arrays, with node id = agent index.
+    The neighbors of node `i` are `indices[offsets[i]:offsets[i+1]]` and their edge weights sit at the same
+    positions in `weights`. Neighbors of a node are sorted by node id, the same order as `nx.erdos_renyi_graph`.
+
+    The edge position of a neighbor is its index in `indices` in that node id order. With `sort_by_weight` on, the
+    neighbors of a node are stored by increasing edge weight instead, so the edges over a threshold are a suffix of
+    the row found by binary search, and `edge_positions` keeps the node id order position of every entry.
+    `global_offsets` is the edge position where each row starts, the same as `offsets` unless the arrays only hold
+    some rows of a larger graph, see `take_rows()`.'''
+    def __init__(self, num_nodes, edge_u, edge_v, edge_weight, sort_by_weight=False):
+        assert 2 * len(edge_u) < np.iinfo(np.int32).max, 'ValueError: Too many edges for int32 `offsets`.'
+        edge_u = np.asarray(edge_u, dtype=np.int64)
+        edge_v = np.asarray(edge_v, dtype=np.int64)
+        edge_weight = np.asarray(edge_weight, dtype=np.float32)
+
+        # Every undirected edge is stored once per direction
+        source = np.concatenate([edge_u, edge_v])
+        target = np.concatenate([edge_v, edge_u])
+        order = np.lexsort((target, source))
+
+        self.num_nodes = num_nodes
+        self.offsets = np.zeros(num_nodes + 1, dtype=np.int32)
+        np.cumsum(np.bincount(source, minlength=num_nodes), out=self.offsets[1:])
+        self.indices = target[order].astype(np.int32)
+        self.weights = np.concatenate([edge_weight, edge_weight])[order]
+        self.global_offsets = self.offsets
+        self.sorted_by_weight = sort_by_weight
+        self.edge_positions = None
+        self._row_weight_keys = None
+        self._reverse_edge_positions = None
+
+        if sort_by_weight:
+            source = source[order]
+            by_weight = np.lexsort((np.arange(source.size), self.weights, source))
+            self.indices = self.indices[by_weight]
+            self.weights = self.weights[by_weight]
+            self.edge_positions = by_weight.astype(np.int32)
+            # Row id plus weight, increasing over the whole array since every weight is in [0, 1]
+            self._row_weight_keys = source + self.weights.astype(np.float64)
+
+    @classmethod
+    def from_networkx(cls, G, weight='weight', sort_by_weight=False):
+        '''Build from a networkx graph whose nodes are the integers 0 to n-1.'''
+        edges = np.array([(u, v, data) for u, v, data in G.edges(data=weight, default=1.0)], dtype=np.float64)
+        edges = edges.reshape(-1, 3)
+        return cls(G.number_of_nodes(), edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64), edges[:, 2],
+                   sort_by_weight=sort_by_weight)
+
+    def take_rows(self, nodes, node_map):
+        '''Rows of `nodes` as a new `CSRAdjacency` with row `i` for node `nodes[i]` and neighbor ids mapped through
+        `node_map`. Edge positions and `global_offsets` are kept from this graph, so draws keyed on them are the same.'''
+        nodes = np.asarray(nodes, dtype=np.int64)
+        start = self.offsets[nodes].astype(np.int64)
+        count = self.offsets[nodes + 1].astype(np.int64) - start
+        index = np.arange(count.sum(), dtype=np.int64) - np.repeat(np.cumsum(count) - count - start, count)
+
+        rows = self.__class__.__new__(self.__class__)
+        rows.num_nodes = nodes.size
+        rows.offsets = np.zeros(nodes.size + 1, dtype=np.int32)
+        np.cumsum(count, out=rows.offsets[1:])
+        rows.global_offsets = start
+        rows.indices = node_map[self.indices[index]].astype(np.int32)
+        rows.weights = self.weights[index]
+        rows.sorted_by_weight = self.sorted_by_weight
+        rows.edge_positions = index.astype(np.int32) if self.edge_positions is None else self.edge_positions[index]
+        rows._row_weight_keys = np.repeat(np.arange(nodes.size, dtype=np.int64), count) + \
+            rows.weights.astype(np.float64) if self.sorted_by_weight else None
+        rows._reverse_edge_positions = None
+        return rows
+
+    def degree(self):
+        return np.diff(self.offsets)
+
+    def neighbors(self, node):
+        '''Neighbor ids and edge weights of one node, as views into the CSR arrays.'''
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return self.indices[start:end], self.weights[start:end]
+
+    def neighbors_over(self, node, threshold):
+        '''Neighbor ids and edge positions of one node for the edges with weight over `threshold`.'''
+        start, end = self.offsets[node], self.offsets[node + 1]
+        if not self.sorted_by_weight:
+            position = start + (self.weights[start:end] > threshold).nonzero()[0]
+            return self.indices[position], position if self.edge_positions is None else self.edge_positions[position]
+        cut = start + np.searchsorted(self.weights[start:end], self.weights.dtype.type(threshold), side='right')
+        return self.indices[cut:end], self.edge_positions[cut:end]
+
+    def get_reverse_edge_positions(self):
+        '''Edge position of `(j, i)` for the edge `(i, j)` at every edge position, built on the first call.'''
+        if self._reverse_edge_positions is None:
+            # Edges in node id order, the sorted keys that edge positions index
+            source = np.repeat(np.arange(self.num_nodes, dtype=np.int64), self.degree())
+            target = self.indices.astype(np.int64)
+            if self.edge_positions is not None:
+                target = np.empty_like(target)
+                target[self.edge_positions] = self.indices
+            self._reverse_edge_positions = np.searchsorted(source * self.num_nodes + target,
+                                                           target * self.num_nodes + source).astype(np.int32)
+        return self._reverse_edge_positions
+
+    def gather_index(self, nodes, threshold=None):
+        '''Entries of the rows of `nodes` as `(count, index)`, the number of entries of each node and their indices in
+        the CSR arrays, row by row. With `sort_by_weight` on, only the entries with weight over `threshold` are kept.'''
+        start = self.offsets[nodes].astype(np.int64)
+        end = self.offsets[nodes + 1].astype(np.int64)
+        if (threshold is not None) and self.sorted_by_weight:
+            cut = np.searchsorted(self._row_weight_keys, nodes + np.float64(self.weights.dtype.type(threshold)),
+                                  side='right')
+            start = np.clip(cut, start, end)
+        count = end - start
+        row_begin = np.cumsum(count) - count
+        return count, np.arange(count.sum(), dtype=np.int64) - np.repeat(row_begin - start, count)
+
+    def gather(self, nodes, threshold=None):
+        '''All edges leaving `nodes`, or only those with weight over `threshold`, returned as `(source, target,
+        weight, position)` arrays, where `position` is the edge position of each edge.'''
+        nodes = np.asarray(nodes, dtype=np.int64)
+        count, index = self.gather_index(nodes, threshold)
+        source, target, weight = np.repeat(nodes, count), self.indices[index], self.weights[index]
+        position = index if self.edge_positions is None else self.edge_positions[index].astype(np.int64)
+        if (threshold is not None) and not self.sorted_by_weight:
+            over = weight > threshold
+            return source[over], target[over], weight[over], position[over]
+        return source, target, weight, position
+
+class ReplicatedAdjacency():
+    '''`num_replicates` disjoint copies of a `CSRAdjacency`, as read by an `EnsemblePopulation`. Node `i` of copy `k`
+    is node `k*num_nodes + i` and its edge positions are shifted by `k` times the edge positions of one copy, while
+    the CSR arrays are only stored once.'''
+    def __init__(self, adjacency, num_replicates):
+        self.adjacency = adjacency
+        self.num_replicates = num_replicates
+        self.num_nodes = adjacency.num_nodes * num_replicates
+        self.num_edge_positions = adjacency.indices.size
+        self.global_offsets = (np.arange(num_replicates, dtype=np.int64)[:, None] * self.num_edge_positions +
+                               adjacency.global_offsets[:adjacency.num_nodes]).ravel()
+
+    def degree(self):
+        return np.tile(self.adjacency.degree(), self.num_replicates)
+
+    def gather(self, nodes, threshold=None):
+        '''Same as `CSRAdjacency.gather()` over the copies.'''
+        adjacency = self.adjacency
+        nodes = np.asarray(nodes, dtype=np.int64)
+        replicate, row = np.divmod(nodes, adjacency.num_nodes)
+        count, index = adjacency.gather_index(row, threshold)
+        replicate = np.repeat(replicate, count)
+        source = np.repeat(nodes, count)
+        target = adjacency.indices[index] + replicate * adjacency.num_nodes
+        weight = adjacency.weights[index]
+        position = index if adjacency.edge_positions is None else adjacency.edge_positions[index].astype(np.int64)
+        position = position + replicate * self.num_edge_positions
+        if (threshold is not None) and not adjacency.sorted_by_weight:
+            over = weight > threshold
+            return source[over], target[over], weight[over], position[over]
+        return source, target, weight, position
+
+def partition_graph(adjacency, num_parts):
+    '''Part (0 to `num_parts`-1) of every node. The node ids are cut into `num_parts` runs with about the same number
+    of nodes plus edge entries, so the hosts and the rows of a part are contiguous slices of every draw block of
+    `CounterBasedRandom`, and a part only generates the chunks it reads.'''
+    weight = np.cumsum(adjacency.degree().astype(np.int64) + 1)
+    total = int(weight[-1]) if weight.size > 0 else 1
+    return ((weight - 1) * num_parts // total).astype(np.int32)
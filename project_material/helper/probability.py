@@ -1,4 +1,8 @@
 import random
+import bisect
+import itertools
+import collections
+import numpy as np
 
 # Helper constants
 cumulative_age_dist_alberta = [
@@ -320,6 +324,183 @@ def comorbidity_generator(comorbidity_type, age, sex):
             else:
                 return 'N'
 
+def age_array_generator(size, rng):
+    '''Array version of `age_generator()`, draws `size` ages at once from the numpy generator `rng`.'''
+    lower = np.array([i[1] for i in cumulative_age_dist_alberta])
+    upper = np.array([i[2] for i in cumulative_age_dist_alberta])
+    cumulative = np.array([i[3] for i in cumulative_age_dist_alberta])
+
+    index = np.searchsorted(cumulative, rng.random(size), side='right')
+    return rng.integers(lower[index], upper[index]+1).astype(np.int16)
+
+comorbidity_prevalence_tables = {
+    'hypertension': (hypertension_prevalence_female_canada, hypertension_prevalence_male_canada),
+    'diabetes': (diabetes_prevalence_female_canada, diabetes_prevalence_male_canada),
+    'ischemic heart disease': (ischemic_heart_disease_prevalence_female_canada,
+                               ischemic_heart_disease_prevalence_male_canada),
+    'asthma': (asthma_prevalence_female_alberta, asthma_prevalence_male_alberta),
+    'cancer': (cancer_prevalence_female_alberta, cancer_prevalence_male_alberta),
+}
+
+def comorbidity_array_generator(comorbidity_type, ages, is_male, rng):
+    '''Array version of `comorbidity_generator()`, returns a boolean array (True for 'Y').'''
+    if comorbidity_type not in comorbidity_prevalence_tables:
+        raise ValueError('Wrong input for `comorbidity_type` parameter.')
+    prevalence_female, prevalence_male = comorbidity_prevalence_tables[comorbidity_type]
+
+    # Same first-matching age band as `comorbidity_generator()`
+    upper = np.array([i[2] for i in prevalence_female])
+    index = np.searchsorted(upper, ages, side='left')
+    prevalence = np.where(is_male, np.array([i[3] for i in prevalence_male])[index],
+                          np.array([i[3] for i in prevalence_female])[index])
+    return rng.random(len(ages)) < prevalence
+
+def host_attribute_arrays(size, rng):
+    '''Age, sex and comorbidities of `size` hosts, drawn as arrays from the numpy generator `rng`.'''
+    age = age_array_generator(size, rng)
+    is_male = rng.random(size) < 0.5 # Setting: Simply assume probability to be M or F is 50:50
+    return {
+        'age': age,
+        'is_male': is_male,
+        'comorbid_hypertension': comorbidity_array_generator('hypertension', age, is_male, rng),
+        'comorbid_diabetes': comorbidity_array_generator('diabetes', age, is_male, rng),
+        'comorbid_ihd': comorbidity_array_generator('ischemic heart disease', age, is_male, rng),
+        'comorbid_asthma': comorbidity_array_generator('asthma', age, is_male, rng),
+        'comorbid_cancer': comorbidity_array_generator('cancer', age, is_male, rng),
+    }
+
+class RandomBlock():
+    '''Stand-in for `random.Random` (`random()`, `uniform()`, `choices()`, `shuffle()`) that serves numbers
+    pre-drawn in blocks from the numpy generator `rng`, so the agents' scalar draws cost a list pop.'''
+    def __init__(self, rng, block_size=2**16):
+        self.rng = rng
+        self.block_size = block_size
+        self._uniforms = []
+        self._permutations = {} # length: pre-drawn permutations of range(length)
+
+    def random(self):
+        if not self._uniforms:
+            self._uniforms = self.rng.random(self.block_size).tolist()
+        return self._uniforms.pop()
+
+    def uniform(self, a, b):
+        return a + (b-a) * self.random()
+
+    def choices(self, population, weights=None, cum_weights=None, k=1):
+        '''Inverse-CDF sampling on the cumulative weights, same arguments as `random.choices()`.'''
+        if cum_weights is None:
+            cum_weights = list(itertools.accumulate(weights)) if weights is not None else \
+                list(range(1, len(population)+1))
+        total = cum_weights[-1]
+        return [population[bisect.bisect(cum_weights, self.random() * total, 0, len(population)-1)] for i in range(k)]
+
+    def shuffle(self, x):
+        n = len(x)
+        if n > 64:
+            permutation = self.rng.permutation(n).tolist()
+        else:
+            # Short lists, e.g. `HostAgent` behaviours, take one of a block of permutations drawn at once
+            permutations = self._permutations.get(n)
+            if not permutations:
+                permutations = np.argsort(self.rng.random((self.block_size // max(n, 1), n)), axis=1).tolist()
+                self._permutations[n] = permutations
+            permutation = permutations.pop()
+        x[:] = [x[i] for i in permutation]
+
+class CounterBasedRandom():
+    '''Counter-based random numbers keyed on (run seed, time unit, purpose, index) with numpy's Philox.
+
+    The Philox key is the run seed and its counter starts at (0, 0, purpose, time unit), so every (time unit,
+    purpose) pair owns a separate block of uniforms. Entry `index` of the block is the draw of host `index`, or of
+    edge position `index` for the purposes in `edge_purposes`. A host's draws therefore do not depend on the order
+    hosts are stepped in, on the engine or on the process that steps them.
+
+    A block is generated in chunks of `chunk_size` entries, only the chunks holding the entries read are generated.
+    Chunk `c` is the stream of the block with its counter started `c * chunk_size / 4` later (Philox gives 4 words per
+    counter), so its entries are those of the whole block whichever chunks are generated.'''
+    purposes = ['static_attributes', 'edge_weight', 'activation_order', 'shuffle_behaviour', 'spread_virus',
+                'infection_credit', 'recover', 'recovered_complication', 'gain_immunity_from_recovery', 'kill_host',
+                'change_infectious_symptom', 'change_recovered_complication', 'complication_waiting_time',
+                'testing_suitability', 'test_result', 'vaccine_suitability', 'use_drugX', 'use_hospital_bed',
+                'use_icu_bed', 'use_ventilator', 'spread_virus_skip']
+    edge_purposes = ['spread_virus', 'infection_credit', 'spread_virus_skip']
+    purpose_widths = {'shuffle_behaviour': 10} # Draws per host, host `i` owns entries `i*width` to `(i+1)*width-1`
+    chunk_size = 256 # Entries of a block generated together, a multiple of 4
+
+    def __init__(self, seed, num_hosts, num_edge_positions):
+        self.seed = seed
+        self.num_hosts = num_hosts
+        self.num_edge_positions = num_edge_positions
+        self._time = None
+        self._blocks = {} # Purpose: (uniforms, mask of the generated chunks) for the latest time unit
+
+    def generator(self, time, purpose, chunk=0):
+        return np.random.Generator(np.random.Philox(key=self.seed, counter=[
+            chunk * self.chunk_size // 4, 0, self.purposes.index(purpose), time]))
+
+    def block_size(self, purpose):
+        if purpose in self.edge_purposes:
+            return self.num_edge_positions
+        return self.num_hosts * self.purpose_widths.get(purpose, 1)
+
+    def get_block(self, time, purpose):
+        '''Uniforms of the block of (time unit, purpose) and the mask of its chunks generated so far, only the blocks
+        of the latest time unit are kept.'''
+        if time != self._time:
+            self._time = time
+            self._blocks = {}
+        block = self._blocks.get(purpose)
+        if block is None:
+            num_chunks = -(-self.block_size(purpose) // self.chunk_size)
+            # Memory of `np.empty()` is only committed once written, chunks never read cost nothing
+            block = (np.empty(num_chunks * self.chunk_size), np.zeros(num_chunks, dtype=bool))
+            self._blocks[purpose] = block
+        return block
+
+    def generate_chunks(self, time, purpose, chunk):
+        '''Generate the chunks in `chunk`, sorted and not generated yet, one stream per run of consecutive chunks.'''
+        uniforms, is_generated = self.get_block(time, purpose)
+        run_start = np.flatnonzero(np.diff(chunk, prepend=chunk[0] - 2) != 1)
+        run_end = np.append(run_start[1:], chunk.size) - 1
+        for first, last in zip(chunk[run_start].tolist(), chunk[run_end].tolist()):
+            uniforms[first * self.chunk_size:(last + 1) * self.chunk_size] = self.generator(
+                time, purpose, first).random((last + 1 - first) * self.chunk_size)
+        is_generated[chunk] = True
+
+    def uniforms(self, time, purpose):
+        '''Whole block of uniforms for (time unit, purpose).'''
+        uniforms, is_generated = self.get_block(time, purpose)
+        if not is_generated.all():
+            self.generate_chunks(time, purpose, np.flatnonzero(~is_generated))
+        return uniforms[:self.block_size(purpose)]
+
+    def uniforms_at(self, time, purpose, index):
+        '''Entries `index` of the block of (time unit, purpose).'''
+        index = np.asarray(index, dtype=np.int64)
+        uniforms, is_generated = self.get_block(time, purpose)
+        missing = np.zeros(is_generated.size, dtype=bool)
+        missing[index // self.chunk_size] = True
+        missing &= ~is_generated
+        if missing.any():
+            self.generate_chunks(time, purpose, np.flatnonzero(missing))
+        return uniforms[index]
+
+    def uniforms_between(self, time, purpose, start, stop):
+        '''Entries `start` to `stop - 1` of the block of (time unit, purpose).'''
+        uniforms, is_generated = self.get_block(time, purpose)
+        chunk = np.arange(start // self.chunk_size, (stop - 1) // self.chunk_size + 1)
+        chunk = chunk[~is_generated[chunk]]
+        if chunk.size > 0:
+            self.generate_chunks(time, purpose, chunk)
+        return uniforms[start:stop]
+
+    def uniform(self, time, purpose, index):
+        uniforms, is_generated = self.get_block(time, purpose)
+        chunk = index // self.chunk_size
+        if not is_generated[chunk]:
+            self.generate_chunks(time, purpose, np.array([chunk]))
+        return float(uniforms[index])
+
 def probability_rescaler(*args):
     '''Rescale probabilities to sum to 1.0'''
     factor = 10000000
@@ -329,4 +510,27 @@ def probability_rescaler(*args):
         sum += prob * factor
     for prob in args:
         result = result + ((prob * factor)/sum,)
-    return result
\ No newline at end of file
+    return result
+
+class ProbabilityMemo():
+    '''Bounded table of probability vectors that drops the least recently used entry when full, with hit and miss
+    counters.'''
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.table = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.table.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.table.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.table[key] = value
+        if len(self.table) > self.max_size:
+            self.table.popitem(last=False)
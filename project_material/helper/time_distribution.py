@@ -1,4 +1,5 @@
 import logging
+import numpy as np
 from scipy.stats import gamma
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -17,6 +18,39 @@ class GammaProbabilityGenerator():
         self.loc = loc
         self.magnitude_multiplier = magnitude_multiplier
         self.gamma_dist = gamma(a=self.shape, scale=self.scale, loc=self.loc)
+        self.pdf_table = None
+        self.cdf_table = None
+
+    # Tabulated mode
+    def tabulate(self, max_x):
+        '''Evaluate the PDF and CDF once for x = 0..`max_x`, so integer x values are then served by array index.'''
+        x_values = np.arange(max_x+1)
+        self.pdf_table = self.gamma_dist.pdf(x_values)*self.magnitude_multiplier
+        self.cdf_table = self.gamma_dist.cdf(x_values)*self.magnitude_multiplier
+
+    def get_pdf_prob(self, x):
+        '''PDF probability at `x` (a number or an array of them); unlike `get_pdf_prob_by_x()` it leaves `self.x` alone.'''
+        return self._lookup(x, self.pdf_table, self.gamma_dist.pdf)
+
+    def get_cdf_prob(self, x):
+        '''CDF probability at `x` (a number or an array of them); unlike `get_cdf_prob_by_x()` it leaves `self.x` alone.'''
+        return self._lookup(x, self.cdf_table, self.gamma_dist.cdf)
+
+    def _lookup(self, x, table, dist_function):
+        if x is None:
+            return 0
+        x = np.asarray(x)
+        if (table is None) or (x.dtype.kind not in 'iu'):
+            result = dist_function(x)*self.magnitude_multiplier
+            return result if result.ndim else result.item()
+
+        inside = (x >= 0) & (x < table.size)
+        if x.ndim == 0:
+            return table[x].item() if inside else (dist_function(x)*self.magnitude_multiplier).item()
+        result = table[np.where(inside, x, 0)]
+        if not inside.all():
+            result[~inside] = dist_function(x[~inside])*self.magnitude_multiplier
+        return result
 
     # PDF
     def get_pdf_prob_by_x(self):
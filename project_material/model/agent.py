@@ -1,7 +1,15 @@
 import sys
 import logging
+import math
 import random
+import heapq
+import bisect
+import itertools
+import operator
 from mesa import Agent
+from ..model.population import NONE_STATE
+from ..model.symptom import SYMPTOM_SAMPLING_ORDER, SYMPTOM_TRANSITION_ATTRIBUTES, NO_SYMPTOM, MILD_SYMPTOM, \
+    SEVERE_SYMPTOM, CRITICAL_SYMPTOM
 from ..model.state import DiseaseHealthState, RecoveredImmunityState, VaccineImmunityState, InfectiousSymptomState, \
     RecoveredComplicationState, UseHospitalBedState, UseICUBedState, UseVentilatorState, UseDrugXState, TestResultState
 from ..helper.probability import age_generator, comorbidity_generator, probability_rescaler
@@ -9,7 +17,109 @@ from ..helper.probability import age_generator, comorbidity_generator, probabili
 logger = logging.getLogger('Logging for `agent.py`')
 logger.setLevel(logging.WARNING) # Setting: Logging level
 
-class HostAgent(Agent):
+def tracked_state(attribute):
+    '''Agent attribute that reports every change to `model.state_counter` once the agent has been counted.'''
+    private_attribute = '_' + attribute
+
+    def setter(agent, state):
+        if agent._is_counted_by_state_counter:
+            agent.model.state_counter.update(agent, attribute, state)
+        setattr(agent, private_attribute, state)
+
+    return property(operator.attrgetter(private_attribute), setter)
+
+def coded_state(attribute, enum_class, is_tracked=True):
+    '''Enum attribute stored as its integer value, `NONE_STATE` for `None`, and read back as the enum member.'''
+    private_attribute = '_' + attribute
+    member_by_code = {state.value: state for state in enum_class}
+    member_by_code[NONE_STATE] = None
+
+    def getter(agent):
+        return member_by_code[getattr(agent, private_attribute)]
+
+    def setter(agent, state):
+        if is_tracked and agent._is_counted_by_state_counter:
+            agent.model.state_counter.update(agent, attribute, state)
+        setattr(agent, private_attribute, NONE_STATE if state is None else state.value)
+
+    return property(getter, setter)
+
+def scratch_probability(attribute):
+    '''Transient daily probability held once per model in `model.agent_scratch` rather than on every agent.'''
+    def setter(agent, prob):
+        setattr(agent.model.agent_scratch, attribute, prob)
+
+    return property(operator.attrgetter('model.agent_scratch.' + attribute), setter)
+
+DAILY_PROBABILITY_ATTRIBUTES = ('prob_spread_virus', 'prob_recover', 'prob_virus_kill_host',
+    'prob_infectious_no_symptom_maintained', 'prob_infectious_no_to_mild_symptom',
+    'prob_infectious_no_to_severe_symptom', 'prob_infectious_no_to_critical_symptom',
+    'prob_infectious_mild_symptom_maintained', 'prob_infectious_mild_to_no_symptom',
+    'prob_infectious_mild_to_severe_symptom', 'prob_infectious_mild_to_critical_symptom',
+    'prob_infectious_severe_symptom_maintained', 'prob_infectious_severe_to_no_symptom',
+    'prob_infectious_severe_to_mild_symptom', 'prob_infectious_severe_to_critical_symptom',
+    'prob_infectious_critical_symptom_maintained', 'prob_infectious_critical_to_no_symptom',
+    'prob_infectious_critical_to_mild_symptom', 'prob_infectious_critical_to_severe_symptom')
+get_daily_probabilities = operator.attrgetter(*DAILY_PROBABILITY_ATTRIBUTES)
+
+def history_track(track):
+    '''Read-only list of the time units of a `HostHistory` track for the agent, rebuilt from `model.history`.'''
+    def getter(agent):
+        return agent.model.history.time_units(track, agent.unique_id)
+
+    return property(getter)
+
+def time_between(start_time, end_time, current_time):
+    '''Number of time units from `start_time` to `end_time`, or to `current_time` while `end_time` is `None`.'''
+    if start_time is None:
+        return None
+    return (current_time if end_time is None else end_time) - start_time
+
+class HostAgentScratch():
+    '''Probabilities rebuilt by `CompactHostAgent` at the start of every step and only used within that step.
+    Agents are stepped one at a time, so a single instance per model is shared by all of them.'''
+    __slots__ = DAILY_PROBABILITY_ATTRIBUTES
+
+    def __init__(self):
+        for attribute in self.__slots__:
+            setattr(self, attribute, None)
+
+class SlottedAgent():
+    '''Same interface as `mesa.Agent`, without a per-instance `__dict__`.'''
+    __slots__ = ('unique_id', 'model', 'pos')
+
+    def __init__(self, unique_id, model):
+        self.unique_id = unique_id
+        self.model = model
+        self.pos = None
+
+    def step(self):
+        pass
+
+    def advance(self):
+        pass
+
+    @property
+    def random(self):
+        return self.model.random
+
+class HostAgentBehaviour():
+    '''Daily behaviours of a host, shared by `HostAgent` and `CompactHostAgent`.'''
+    __slots__ = ()
+
+    time_units_being_susceptible = history_track('being_susceptible')
+    time_units_being_infectious = history_track('being_infectious')
+    time_units_being_recovered = history_track('being_recovered')
+    time_units_being_dead = history_track('being_dead')
+    time_units_when_tested = history_track('when_tested')
+    time_units_when_successfully_gaining_immunity_from_vaccine = history_track(
+        'when_successfully_gaining_immunity_from_vaccine')
+    time_units_when_symptoms_are_severe_or_critical = history_track('when_symptoms_are_severe_or_critical')
+    time_units_using_hospital_bed = history_track('using_hospital_bed')
+    time_units_using_icu_bed = history_track('using_icu_bed')
+    time_units_using_ventilator = history_track('using_ventilator')
+    time_units_using_drugX = history_track('using_drugX')
+
     def __init__(self, unique_id, model,
                     initial_disease_health_state,
                     initial_recovered_immunity_state,
@@ -23,26 +133,47 @@ class HostAgent(Agent):
                     clinical_resource, social_distancing, vaccine, testing,
                  ):
         super().__init__(unique_id, model)
+        self._is_counted_by_state_counter = False # Set once `model.state_counter.add()` has counted this agent
         self._stop_timer = None # Setting: If not `None`, simulation will stop at specified time
-        self._current_timer = 0
+        self._time_of_last_step = 0 # Last time unit this agent was stepped or caught up for
         self._shuffle_behaviour_switch = True
         self._edge_weight_threshold_to_infect = 0.00 # the higher the harder to transmit virus; default at 0.00
 
-        self.age = age_generator() # Setting: Currently using the AB age distribution from Census 2016
-        self.sex = random.choice(['M', 'F']) # Setting: Simply assume probability to be M or F is 50:50
-        self.comorbid_hypertension = comorbidity_generator('hypertension', self.age, self.sex)
-        self.comorbid_diabetes = comorbidity_generator('diabetes', self.age, self.sex)
-        self.comorbid_ihd = comorbidity_generator('ischemic heart disease', self.age, self.sex)
-        self.comorbid_asthma = comorbidity_generator('asthma', self.age, self.sex)
-        self.comorbid_cancer = comorbidity_generator('cancer', self.age, self.sex)
+        if model.host_attributes is not None:
+            # Drawn by the model from `CounterBasedRandom`, the same arrays as the vectorized engine
+            host_attributes = model.host_attributes
+            self.age = int(host_attributes['age'][unique_id])
+            self.sex = 'M' if host_attributes['is_male'][unique_id] else 'F'
+            self.comorbid_hypertension = 'Y' if host_attributes['comorbid_hypertension'][unique_id] else 'N'
+            self.comorbid_diabetes = 'Y' if host_attributes['comorbid_diabetes'][unique_id] else 'N'
+            self.comorbid_ihd = 'Y' if host_attributes['comorbid_ihd'][unique_id] else 'N'
+            self.comorbid_asthma = 'Y' if host_attributes['comorbid_asthma'][unique_id] else 'N'
+            self.comorbid_cancer = 'Y' if host_attributes['comorbid_cancer'][unique_id] else 'N'
+        else:
+            self.age = age_generator() # Setting: Currently using the AB age distribution from Census 2016
+            self.sex = random.choice(['M', 'F']) # Setting: Simply assume probability to be M or F is 50:50
+            self.comorbid_hypertension = comorbidity_generator('hypertension', self.age, self.sex)
+            self.comorbid_diabetes = comorbidity_generator('diabetes', self.age, self.sex)
+            self.comorbid_ihd = comorbidity_generator('ischemic heart disease', self.age, self.sex)
+            self.comorbid_asthma = comorbidity_generator('asthma', self.age, self.sex)
+            self.comorbid_cancer = comorbidity_generator('cancer', self.age, self.sex)
+
+        # Comorbidity and age modifiers are combined once, see `HostNetwork.get_static_risk_multipliers()`
+        static_recover_multiplier, static_onset_multiplier = model.get_static_risk_multipliers(
+            [self.comorbid_hypertension == 'Y', self.comorbid_diabetes == 'Y', self.comorbid_ihd == 'Y',
+             self.comorbid_asthma == 'Y', self.comorbid_cancer == 'Y'], self.age)
+        self.static_recover_multiplier = float(static_recover_multiplier)
+        self.static_onset_multiplier = float(static_onset_multiplier)
 
         self.disease_health_state = initial_disease_health_state
         self.initial_recovered_immunity_state = initial_recovered_immunity_state
         self.new_infection_tracker = {} # Track days and who an infectious host infect others
-        self._timer_since_beginning_of_last_infection = None # Track number of days since the first day of the current/last infection
-        self._timer_since_beginning_of_any_infection = 0  # Track number of days since the first day of any infection
-        self._timer_since_beginning_of_last_onset_of_mild_symptom = None
-        self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom = None
+        self._time_of_last_infection = None # Time unit of the first day of the current/last infection
+        self._time_of_last_onset_of_mild_symptom = None
+        self._time_of_end_of_last_mild_symptom = None # `None` while the mild symptom lasts
+        self._time_of_last_onset_of_severe_or_critical_symptom = None
+        self._time_of_end_of_last_severe_or_critical_symptom = None # `None` while the severe or critical symptom lasts
+        self._time_of_next_complication_change = None # Used when `model._use_complication_event_queue` is on
 
         self.test_result_on_disease_health_state = None
         self.new_test_done_over_current_time_unit = None
@@ -51,25 +182,11 @@ class HostAgent(Agent):
         self.recovered_immunity_state = RecoveredImmunityState.WITHOUT_IMMUNITY
         self.vaccine_immunity_state = VaccineImmunityState.WITHOUT_IMMUNITY
 
-        self.time_units_being_susceptible = []
-        self.time_units_being_infectious = []
-        self.time_units_being_recovered = []
-        self.time_units_being_dead = []
-
-        self.time_units_when_tested = []
-        self.time_units_when_successfully_gaining_immunity_from_vaccine = []
-        self.time_units_when_symptoms_are_severe_or_critical = []
-
         self.infectious_hospital_bed_state = None
         self.infectious_icu_bed_state = None
         self.infectious_ventilator_state = None
         self.recovered_drugX_state = None
 
-        self.time_units_using_hospital_bed = []
-        self.time_units_using_icu_bed = []
-        self.time_units_using_ventilator = []
-        self.time_units_using_drugX = []
-
         self.prob_spread_virus = None
         self.prob_recover = None
         self.prob_virus_kill_host = None
@@ -115,6 +232,58 @@ class HostAgent(Agent):
         self.vaccine = vaccine
         self.testing = testing
 
+    @property
+    def _current_timer(self):
+        return self.model._current_timer
+
+    @property
+    def _timer_since_beginning_of_last_infection(self):
+        '''Number of days since the first day of the current/last infection.'''
+        return time_between(self._time_of_last_infection, None, self._current_timer)
+
+    @property
+    def _timer_since_beginning_of_any_infection(self):
+        '''Number of days spent infectious, recovered or dead.'''
+        history = self.model.history
+        return history.count('being_infectious', self.unique_id) + history.count('being_recovered', self.unique_id) + \
+            history.count('being_dead', self.unique_id)
+
+    @property
+    def _timer_since_beginning_of_last_onset_of_mild_symptom(self):
+        return time_between(self._time_of_last_onset_of_mild_symptom, self._time_of_end_of_last_mild_symptom,
+                            self._current_timer)
+
+    @property
+    def _timer_since_beginning_of_last_onset_of_severe_or_critical_symptom(self):
+        return time_between(self._time_of_last_onset_of_severe_or_critical_symptom,
+                            self._time_of_end_of_last_severe_or_critical_symptom, self._current_timer)
+
+    def draw_uniform(self, purpose, index=None):
+        '''Uniform draw for `purpose`, keyed on (time unit, purpose, host id or edge position `index`) when
+        `model.counter_random` is set, otherwise the next number of `model.random_stream`.'''
+        if self.model.counter_random is None:
+            return self.model.random_stream.random()
+        return self.model.counter_random.uniform(self._current_timer, purpose,
+                                                 self.unique_id if index is None else index)
+
+    def draw_choice(self, purpose, population, weights):
+        if self.model.counter_random is None:
+            return self.model.random_stream.choices(population, weights, k=1)[0]
+        cum_weights = list(itertools.accumulate(weights))
+        return population[bisect.bisect(cum_weights, self.draw_uniform(purpose) * cum_weights[-1],
+                                        0, len(population)-1)]
+
+    def behaviour_permutation(self):
+        '''Order of the `STEP_BEHAVIOURS` indices for the current time unit.'''
+        if self.model.counter_random is None:
+            permutation = list(range(len(STEP_BEHAVIOURS)))
+            self.model.random_stream.shuffle(permutation)
+            return permutation
+        width = self.model.counter_random.purpose_widths['shuffle_behaviour']
+        keys = self.model.counter_random.uniforms_between(self._current_timer, 'shuffle_behaviour',
+            self.unique_id * width, self.unique_id * width + len(STEP_BEHAVIOURS))
+        return keys.argsort().tolist()
+
     def try_social_distancing(self):
         self.social_distancing.current_time = self._current_timer
         if self.social_distancing.check_timing():
@@ -131,8 +300,19 @@ class HostAgent(Agent):
 
     def try_infect_neighbors(self):
         if self.disease_health_state is DiseaseHealthState.INFECTIOUS:
-            neighbors_nodes = self.model.grid.get_neighbors(self.pos, include_center=False)
-            candidate_neighbors = [agent for agent in self.model.grid.get_cell_list_contents(neighbors_nodes) if
+            if self.model.adjacency is not None:
+                # Only neighbors over the edge weight threshold can be infected, filter them on the CSR arrays first
+                neighbors_nodes, positions = self.model.adjacency.neighbors_over(
+                    self.pos, self._edge_weight_threshold_to_infect)
+                neighbor_agents = [self.model.host_agents[node] for node in neighbors_nodes.tolist()]
+                positions = positions.tolist()
+            else:
+                neighbors_nodes = self.model.grid.get_neighbors(self.pos, include_center=False)
+                neighbor_agents = [agent for agent in self.model.grid.get_cell_list_contents(neighbors_nodes) if
+                                   self.model.G[self.pos][agent.pos]['weight'] > self._edge_weight_threshold_to_infect]
+                positions = [None] * len(neighbor_agents)
+            candidate_neighbors = [(agent, position) for agent, position in zip(neighbor_agents, positions) if
+                                   (agent is None) or # Susceptible host still in `model.cohort`
                                    (((agent.disease_health_state is DiseaseHealthState.SUSCEPTIBLE) and (
                                        agent.vaccine_immunity_state is not VaccineImmunityState.WITH_IMMUNITY
                                    )) or (
@@ -140,22 +320,79 @@ class HostAgent(Agent):
                                        (agent.recovered_immunity_state is not RecoveredImmunityState.WITH_IMMUNITY) and
                                        (agent.vaccine_immunity_state is not VaccineImmunityState.WITH_IMMUNITY))
                                    )]
-            newly_infected_neighbor_counter = 0
-
-            for neighbor_agent in candidate_neighbors:
-                if self.model.G[self.pos][neighbor_agent.pos]['weight'] > self._edge_weight_threshold_to_infect:
-                    if self.random.random() < self.prob_spread_virus:
-                        self.model.cumulative_infectious_cases += 1
-
-                        newly_infected_neighbor_counter += 1
-                        neighbor_agent.disease_health_state = DiseaseHealthState.INFECTIOUS
-                        neighbor_agent._timer_since_beginning_of_last_infection = 0
-                        neighbor_agent.infectious_symptom_state = InfectiousSymptomState.NO_SYMPTOM
-                        neighbor_agent.recovered_complication_state = None
+            if self.model._use_geometric_skip_transmission:
+                if self.model.adjacency is not None:
+                    # Draws follow the edge positions, so the hits do not depend on how the row is sorted
+                    candidate_neighbors.sort(key=lambda pair: pair[1])
+                infected_neighbors = [candidate_neighbors[i] for i in
+                                      self.draw_transmission_hits(len(candidate_neighbors))]
+            else:
+                infected_neighbors = [(agent, position) for agent, position in candidate_neighbors if
+                                      self.draw_uniform('spread_virus', position) < self.prob_spread_virus]
+            if (self.model.cohort is not None) and infected_neighbors:
+                # Hosts still in `model.cohort` are `None` in `model.host_agents` until infected
+                node_by_position = dict(zip(positions, neighbors_nodes.tolist()))
+                infected_neighbors = [(agent if agent is not None else self.model.cohort.materialize(
+                    node_by_position[position]), position) for agent, position in infected_neighbors]
+
+            if self.model._use_synchronous_update:
+                # Neighbors are infected by `advance()`, a neighbor reached by several spreaders is credited to the
+                # one with the lowest draw whatever order they are stepped in
+                for neighbor_agent, position in infected_neighbors:
+                    self.model.schedule.buffer_infection(neighbor_agent, self,
+                                                         self.draw_uniform('infection_credit', position))
+                return
+
+            for neighbor_agent, position in infected_neighbors:
+                neighbor_agent.set_infected()
+
+            if infected_neighbors:
+                self.model.cumulative_infectious_cases += len(infected_neighbors)
+                self.new_infection_tracker.update({self._current_timer: len(infected_neighbors)})
+                self.model.all_agents_new_infection_tracker.update({self.pos: self.new_infection_tracker})
+
+    def set_infected(self):
+        self.catch_up_time_units(self._current_timer)
+        if self.model._use_active_set_scheduler:
+            self.model.schedule.activate(self)
+
+        self.disease_health_state = DiseaseHealthState.INFECTIOUS
+        self._time_of_last_infection = self._current_timer
+        self.infectious_symptom_state = InfectiousSymptomState.NO_SYMPTOM
+        self.recovered_complication_state = None
 
-                if newly_infected_neighbor_counter >= 1:
-                    self.new_infection_tracker.update({self._current_timer: newly_infected_neighbor_counter})
-                    self.model.all_agents_new_infection_tracker.update({self.pos: self.new_infection_tracker})
+    def take_buffered_infection(self):
+        '''Infect this agent if a spreader reached it in the first phase of `SynchronousActivation`.'''
+        spreader = self.model.schedule.pop_infection(self)
+        if spreader is not None:
+            self.set_infected()
+            self.model.cumulative_infectious_cases += 1
+            spreader.new_infection_tracker[self._current_timer] = \
+                spreader.new_infection_tracker.get(self._current_timer, 0) + 1
+            self.model.all_agents_new_infection_tracker.update({spreader.pos: spreader.new_infection_tracker})
+
+    def draw_transmission_hits(self, num_candidates):
+        '''Indices of the candidate neighbors infected today, each with probability `prob_spread_virus`. The gaps
+        between infections are geometric, so there is one draw per infection plus one to end the list instead of one
+        per neighbor. Draw `r` is keyed on the `r`-th edge position of this host's row, at most one per neighbor, and the
+        candidates are expected in edge position order.'''
+        if (num_candidates == 0) or (self.prob_spread_virus <= 0):
+            return []
+        if self.prob_spread_virus >= 1:
+            return list(range(num_candidates))
+
+        log_prob_miss = math.log1p(-self.prob_spread_virus)
+        if log_prob_miss == 0:
+            return [] # Too small to miss, as in `transmission_hit_kernel()`
+        row_start = int(self.model.adjacency.offsets[self.pos]) if self.model.adjacency is not None else 0
+        hits = []
+        index = -1
+        while index < num_candidates - 1:
+            random_num = self.draw_uniform('spread_virus_skip', row_start + len(hits))
+            index += 1 + int(math.log1p(-random_num) / log_prob_miss)
+            if index < num_candidates:
+                hits.append(index)
+        return hits
 
     def try_recover_from_infection(self):
         prob_recover_with_no_complication = 0.70 # Setting: Assumed
@@ -166,86 +403,100 @@ class HostAgent(Agent):
             'ValueError: `prob_recover_with_{}_complication` not sum to 1.00.'
 
         if self.disease_health_state is DiseaseHealthState.INFECTIOUS:
-            if self.random.random() < self.prob_recover:
+            if self.draw_uniform('recover') < self.prob_recover:
                 self.disease_health_state = DiseaseHealthState.RECOVERED
-                self.infectious_symptom_state = None
-                self.recovered_complication_state = random.choices(
+                self.set_infectious_symptom_state(None)
+                self.recovered_complication_state = self.draw_choice(
+                    'recovered_complication',
                     [RecoveredComplicationState.NO_COMPLICATION,
                      RecoveredComplicationState.MILD_COMPLICATION,
                      RecoveredComplicationState.SEVERE_COMPLICATION],
                     [prob_recover_with_no_complication,
                      prob_recover_with_mild_complication,
-                     prob_recover_with_severe_complication], k=1
-                )[0]
+                     prob_recover_with_severe_complication]
+                )
                 self.try_gain_immunity_from_recovery()
+                if self.model._use_complication_event_queue:
+                    self.schedule_recovered_complication_change()
 
     def try_gain_immunity_from_recovery(self):
-        if self.random.random() < self.prob_gain_immunity:
+        if self.draw_uniform('gain_immunity_from_recovery') < self.prob_gain_immunity:
             self.recovered_immunity_state = RecoveredImmunityState.WITH_IMMUNITY
-            self.infectious_symptom_state = None
+            self.set_infectious_symptom_state(None)
 
     def try_change_infectious_symptom_state(self):
-        random_num = self.random.random()
+        if self.model.symptom_transitions is not None:
+            # Sampled for all infectious hosts at once by `HostNetwork.presample_symptom_transitions()`
+            transition = self.model.symptom_transitions.get(self.unique_id)
+            if (transition is not None) and (self.disease_health_state is DiseaseHealthState.INFECTIOUS):
+                self.set_infectious_symptom_state(*transition)
+            return
 
-        if self.disease_health_state is DiseaseHealthState.INFECTIOUS:
-            if self.infectious_symptom_state is InfectiousSymptomState.NO_SYMPTOM:
-                if (random_num >=0) & (random_num < self.prob_infectious_no_to_mild_symptom):
-                    self.infectious_symptom_state = InfectiousSymptomState.MILD_SYMPTOM
-                    self._timer_since_beginning_of_last_onset_of_mild_symptom = 0
-                elif ((random_num >= self.prob_infectious_no_to_mild_symptom) and
-                      (random_num < (self.prob_infectious_no_to_mild_symptom + self.prob_infectious_no_to_severe_symptom))):
-                    self.infectious_symptom_state = InfectiousSymptomState.SEVERE_SYMPTOM
-                    self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom = 0
-                elif ((random_num >= (self.prob_infectious_no_to_mild_symptom + self.prob_infectious_no_to_severe_symptom)) and
-                      (random_num < (self.prob_infectious_no_to_mild_symptom + self.prob_infectious_no_to_severe_symptom +
-                                                self.prob_infectious_no_to_critical_symptom))):
-                    self.infectious_symptom_state = InfectiousSymptomState.CRITICAL_SYMPTOM
-                    self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom = 0
-
-            elif self.infectious_symptom_state is InfectiousSymptomState.MILD_SYMPTOM:
-                if (random_num >= 0) & (random_num < self.prob_infectious_mild_to_no_symptom):
-                    self.infectious_symptom_state = InfectiousSymptomState.NO_SYMPTOM
-                elif ((random_num >= self.prob_infectious_mild_to_no_symptom) and
-                      (random_num < (self.prob_infectious_mild_to_no_symptom + self.prob_infectious_mild_to_severe_symptom))):
-                    self.infectious_symptom_state = InfectiousSymptomState.SEVERE_SYMPTOM
-                    self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom = 0
-                elif ((random_num >= (self.prob_infectious_mild_to_no_symptom + self.prob_infectious_mild_to_severe_symptom)) and
-                      (random_num < (self.prob_infectious_mild_to_no_symptom + self.prob_infectious_mild_to_severe_symptom +
-                                                self.prob_infectious_mild_to_critical_symptom))):
-                    self.infectious_symptom_state = InfectiousSymptomState.CRITICAL_SYMPTOM
-                    self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom = 0
-
-            elif self.infectious_symptom_state is InfectiousSymptomState.SEVERE_SYMPTOM:
-                if (random_num >= 0) & (random_num < self.prob_infectious_severe_to_no_symptom):
-                    self.infectious_symptom_state = InfectiousSymptomState.NO_SYMPTOM
-                elif ((random_num >= self.prob_infectious_severe_to_no_symptom) and
-                      (random_num < (
-                              self.prob_infectious_severe_to_no_symptom + self.prob_infectious_severe_to_mild_symptom))):
-                    self.infectious_symptom_state = InfectiousSymptomState.MILD_SYMPTOM
-                    self._timer_since_beginning_of_last_onset_of_mild_symptom = 0
-                elif ((random_num >= (self.prob_infectious_severe_to_no_symptom + self.prob_infectious_severe_to_mild_symptom)) and
-                    (random_num < (self.prob_infectious_severe_to_no_symptom + self.prob_infectious_severe_to_mild_symptom +
-                                              self.prob_infectious_mild_to_critical_symptom))):
-                    self.infectious_symptom_state = InfectiousSymptomState.CRITICAL_SYMPTOM
-
-            elif self.infectious_symptom_state is InfectiousSymptomState.CRITICAL_SYMPTOM:
-                if (random_num >= 0) & (random_num < self.prob_infectious_critical_to_no_symptom):
-                    self.infectious_symptom_state = InfectiousSymptomState.NO_SYMPTOM
-                elif ((random_num >= self.prob_infectious_critical_to_no_symptom) and
-                      (random_num < (
-                              self.prob_infectious_critical_to_no_symptom + self.prob_infectious_critical_to_mild_symptom))):
-                    self.infectious_symptom_state = InfectiousSymptomState.MILD_SYMPTOM
-                    self._timer_since_beginning_of_last_onset_of_mild_symptom = 0
-                elif ((random_num >= (self.prob_infectious_critical_to_no_symptom + self.prob_infectious_critical_to_mild_symptom)) and
-                    (random_num < (self.prob_infectious_critical_to_no_symptom + self.prob_infectious_critical_to_mild_symptom +
-                                              self.prob_infectious_critical_to_severe_symptom))):
-                    self.infectious_symptom_state = InfectiousSymptomState.SEVERE_SYMPTOM
+        random_num = self.draw_uniform('change_infectious_symptom')
 
-            else:
+        if self.disease_health_state is DiseaseHealthState.INFECTIOUS:
+            if self.infectious_symptom_state is None:
                 raise Exception('`self.infectious_symptom_state` for the infectious host is missing')
 
+            # Scalar pass over the same 4x4 kernel as `sample_symptom_transitions()`
+            symptom = self.infectious_symptom_state.value
+            upper = 0
+            for new_symptom, attribute in zip(SYMPTOM_SAMPLING_ORDER[symptom], SYMPTOM_TRANSITION_ATTRIBUTES[symptom]):
+                upper = upper + getattr(self, attribute)
+                if random_num < upper:
+                    self.set_infectious_symptom_state(
+                        new_symptom, new_symptom == MILD_SYMPTOM,
+                        (symptom in (NO_SYMPTOM, MILD_SYMPTOM)) and (new_symptom in (SEVERE_SYMPTOM, CRITICAL_SYMPTOM)))
+                    break
+
+    def set_infectious_symptom_state(self, new_symptom, onset_mild=False, onset_severe_or_critical=False):
+        '''Set the symptom state from its value, or to `None`, and stamp the onset and end of mild and of severe or
+        critical symptoms with the current time unit. The days since an onset stop counting when the symptom ends.'''
+        severe_or_critical = (InfectiousSymptomState.SEVERE_SYMPTOM, InfectiousSymptomState.CRITICAL_SYMPTOM)
+        if (self.infectious_symptom_state is InfectiousSymptomState.MILD_SYMPTOM) and (new_symptom != MILD_SYMPTOM):
+            self._time_of_end_of_last_mild_symptom = self._current_timer
+        if (self.infectious_symptom_state in severe_or_critical) and (new_symptom not in (SEVERE_SYMPTOM, CRITICAL_SYMPTOM)):
+            self._time_of_end_of_last_severe_or_critical_symptom = self._current_timer
+
+        self.infectious_symptom_state = InfectiousSymptomState(new_symptom) if new_symptom is not None else None
+        if onset_mild:
+            self._time_of_last_onset_of_mild_symptom = self._current_timer
+            self._time_of_end_of_last_mild_symptom = None
+        if onset_severe_or_critical:
+            self._time_of_last_onset_of_severe_or_critical_symptom = self._current_timer
+            self._time_of_end_of_last_severe_or_critical_symptom = None
+
+    def get_prob_recovered_complication_change(self):
+        if self.recovered_complication_state is RecoveredComplicationState.NO_COMPLICATION:
+            return self.prob_recovered_no_to_mild_complication + self.prob_recovered_no_to_severe_complication
+        elif self.recovered_complication_state is RecoveredComplicationState.MILD_COMPLICATION:
+            return self.prob_recovered_mild_to_no_complication + self.prob_recovered_mild_to_severe_complication
+        elif self.recovered_complication_state is RecoveredComplicationState.SEVERE_COMPLICATION:
+            return self.prob_recovered_severe_to_no_complication + self.prob_recovered_severe_to_mild_complication
+        return 0
+
+    def schedule_recovered_complication_change(self):
+        '''Draw the geometric waiting time to the next complication change and queue it on the model.'''
+        prob_change = self.get_prob_recovered_complication_change()
+        if prob_change <= 0:
+            self._time_of_next_complication_change = None
+            return
+
+        waiting_time = 1
+        if prob_change < 1:
+            waiting_time += int(math.log(1 - self.draw_uniform('complication_waiting_time')) / math.log(1 - prob_change))
+        self._time_of_next_complication_change = self._current_timer + waiting_time
+        heapq.heappush(self.model.complication_event_queue, (self._time_of_next_complication_change, self.unique_id))
+
     def try_change_recovered_complication_state(self):
-        random_num = self.random.random()
+        random_num = self.draw_uniform('change_recovered_complication')
+
+        if self.model._use_complication_event_queue:
+            # A change is certain on the scheduled day, pick which one in proportion to the daily probabilities
+            if ((self.disease_health_state is not DiseaseHealthState.RECOVERED) or
+                    (self._time_of_next_complication_change != self._current_timer)):
+                return
+            random_num = random_num * self.get_prob_recovered_complication_change()
 
         if self.disease_health_state is DiseaseHealthState.RECOVERED:
             if self.recovered_complication_state is RecoveredComplicationState.NO_COMPLICATION:
@@ -274,15 +525,16 @@ class HostAgent(Agent):
             else:
                 raise Exception('`self.recovered_complication_state` for the recovered host is missing')
 
+            if self.model._use_complication_event_queue:
+                self.schedule_recovered_complication_change()
+
     def try_use_drugX(self):
         if (self.disease_health_state is DiseaseHealthState.RECOVERED) & (self.recovered_complication_state is
             RecoveredComplicationState.SEVERE_COMPLICATION):
-            if self.clinical_resource.check_available_drugX() is True:
-                if self.recovered_drugX_state is not UseDrugXState.YES:
-                    self.model.cumulative_drugX_use_in_new_host_counts += 1
-                self.recovered_drugX_state = UseDrugXState.YES
-                self.clinical_resource.drugX_use_day_tracker += 1
-                self.model.cumulative_drugX_use_in_days += 1
+            if self.model._use_synchronous_update:
+                self.model.schedule.request_resource('drugX', self)
+            elif self.clinical_resource.check_available_drugX() is True:
+                self.start_drugX()
             else:
                 self.recovered_drugX_state = UseDrugXState.NO
 
@@ -291,8 +543,15 @@ class HostAgent(Agent):
                 self.recovered_drugX_state = UseDrugXState.NO
                 self.clinical_resource.drugX_current_load -= 1
 
+    def start_drugX(self):
+        if self.recovered_drugX_state is not UseDrugXState.YES:
+            self.model.cumulative_drugX_use_in_new_host_counts += 1
+        self.recovered_drugX_state = UseDrugXState.YES
+        self.clinical_resource.drugX_use_day_tracker += 1
+        self.model.cumulative_drugX_use_in_days += 1
+
     def try_kill_host(self):
-        if self.random.random() < self.prob_virus_kill_host:
+        if self.draw_uniform('kill_host') < self.prob_virus_kill_host:
             self.disease_health_state = DiseaseHealthState.DEAD
             self.model.cumulative_dead_cases += 1
             if self.test_result_on_disease_health_state is TestResultState.TP:
@@ -307,22 +566,19 @@ class HostAgent(Agent):
         self.testing.current_time = self._current_timer
         self.testing.assign_test_result_if_applicable()
 
-        if self.pos not in self.model.all_agents_new_tested_as_true_positive:
+        if not self.model.history.test_confirmed[self.unique_id]:
             if self.test_result_on_disease_health_state is TestResultState.TP:
                 if self.disease_health_state is DiseaseHealthState.INFECTIOUS:
                     self.model.cumulative_infectious_test_confirmed_cases += 1
-                    self.model.all_agents_new_tested_as_true_positive.append(self.pos)
+                    self.model.history.test_confirmed[self.unique_id] = 1
 
     def try_use_hospital_bed(self):
         if (self.infectious_symptom_state is InfectiousSymptomState.SEVERE_SYMPTOM) & (
                 self.infectious_hospital_bed_state is not UseHospitalBedState.YES):
-            if self.clinical_resource.check_available_hospital_bed() is True:
-                self.infectious_hospital_bed_state = UseHospitalBedState.YES
-                self.clinical_resource.hospital_bed_current_load += 1
-                self.model.cumulative_hospital_bed_use_in_new_host_counts += 1
-                if self.infectious_icu_bed_state is UseICUBedState.YES:
-                    self.infectious_icu_bed_state = UseICUBedState.NO
-                    self.clinical_resource.icu_bed_current_load -= 1
+            if self.model._use_synchronous_update:
+                self.model.schedule.request_resource('hospital_bed', self)
+            elif self.clinical_resource.check_available_hospital_bed() is True:
+                self.admit_to_hospital_bed()
 
         if (self.infectious_hospital_bed_state is UseHospitalBedState.YES) & ((
                 self.disease_health_state is not DiseaseHealthState.INFECTIOUS) | (
@@ -331,19 +587,27 @@ class HostAgent(Agent):
             self.clinical_resource.hospital_bed_current_load -= 1
 
         if self.infectious_hospital_bed_state is UseHospitalBedState.YES:
-            self.clinical_resource.hospital_bed_use_day_tracker += 1
-            self.model.cumulative_hospital_bed_use_in_days += 1
+            self.count_hospital_bed_day()
+
+    def admit_to_hospital_bed(self):
+        self.infectious_hospital_bed_state = UseHospitalBedState.YES
+        self.clinical_resource.hospital_bed_current_load += 1
+        self.model.cumulative_hospital_bed_use_in_new_host_counts += 1
+        if self.infectious_icu_bed_state is UseICUBedState.YES:
+            self.infectious_icu_bed_state = UseICUBedState.NO
+            self.clinical_resource.icu_bed_current_load -= 1
+
+    def count_hospital_bed_day(self):
+        self.clinical_resource.hospital_bed_use_day_tracker += 1
+        self.model.cumulative_hospital_bed_use_in_days += 1
 
     def try_use_icu_bed(self):
         if (self.infectious_symptom_state is InfectiousSymptomState.CRITICAL_SYMPTOM) & (
                 self.infectious_icu_bed_state is not UseICUBedState.YES):
-            if self.clinical_resource.check_available_icu_bed() is True:
-                self.infectious_icu_bed_state = UseICUBedState.YES
-                self.clinical_resource.icu_bed_current_load += 1
-                self.model.cumulative_icu_bed_use_in_new_host_counts += 1
-                if self.infectious_hospital_bed_state is UseHospitalBedState.YES:
-                    self.infectious_hospital_bed_state = UseHospitalBedState.NO
-                    self.clinical_resource.hospital_bed_current_load -= 1
+            if self.model._use_synchronous_update:
+                self.model.schedule.request_resource('icu_bed', self)
+            elif self.clinical_resource.check_available_icu_bed() is True:
+                self.admit_to_icu_bed()
 
         if (self.infectious_icu_bed_state is UseICUBedState.YES) & ((
                 self.disease_health_state is not DiseaseHealthState.INFECTIOUS) | (
@@ -352,17 +616,28 @@ class HostAgent(Agent):
             self.clinical_resource.icu_bed_current_load -= 1
 
         if self.infectious_icu_bed_state is UseICUBedState.YES:
-            self.clinical_resource.icu_bed_use_day_tracker += 1
-            self.model.cumulative_icu_bed_use_in_days += 1
+            self.count_icu_bed_day()
+
+    def admit_to_icu_bed(self):
+        self.infectious_icu_bed_state = UseICUBedState.YES
+        self.clinical_resource.icu_bed_current_load += 1
+        self.model.cumulative_icu_bed_use_in_new_host_counts += 1
+        if self.infectious_hospital_bed_state is UseHospitalBedState.YES:
+            self.infectious_hospital_bed_state = UseHospitalBedState.NO
+            self.clinical_resource.hospital_bed_current_load -= 1
+
+    def count_icu_bed_day(self):
+        self.clinical_resource.icu_bed_use_day_tracker += 1
+        self.model.cumulative_icu_bed_use_in_days += 1
 
     def try_use_ventilator(self):
         if (self.infectious_symptom_state in [InfectiousSymptomState.CRITICAL_SYMPTOM,
                 InfectiousSymptomState.SEVERE_SYMPTOM]) & (self.infectious_ventilator_state
                 is not UseVentilatorState.YES):
-            if self.clinical_resource.check_available_ventilator() is True:
-                self.infectious_ventilator_state = UseVentilatorState.YES
-                self.clinical_resource.ventilator_current_load += 1
-                self.model.cumulative_ventilator_use_in_new_host_counts += 1
+            if self.model._use_synchronous_update:
+                self.model.schedule.request_resource('ventilator', self)
+            elif self.clinical_resource.check_available_ventilator() is True:
+                self.put_on_ventilator()
 
         if (self.infectious_ventilator_state is UseVentilatorState.YES) & ((
                 self.disease_health_state is not DiseaseHealthState.INFECTIOUS) | (
@@ -372,76 +647,70 @@ class HostAgent(Agent):
             self.clinical_resource.ventilator_current_load -= 1
 
         if self.infectious_ventilator_state is UseVentilatorState.YES:
-            self.clinical_resource.ventilator_use_day_tracker += 1
-            self.model.cumulative_ventilator_use_in_days += 1
+            self.count_ventilator_day()
+
+    def put_on_ventilator(self):
+        self.infectious_ventilator_state = UseVentilatorState.YES
+        self.clinical_resource.ventilator_current_load += 1
+        self.model.cumulative_ventilator_use_in_new_host_counts += 1
 
-    def track_time_unit_by_state(self):
+    def count_ventilator_day(self):
+        self.clinical_resource.ventilator_use_day_tracker += 1
+        self.model.cumulative_ventilator_use_in_days += 1
+
+    def track_time_unit_by_state(self, time=None):
+        time = self._current_timer if time is None else time
+        record = self.model.history.record
         if self.disease_health_state is DiseaseHealthState.SUSCEPTIBLE:
-            self.time_units_being_susceptible.append(self._current_timer)
+            record('being_susceptible', self.unique_id, time)
         elif self.disease_health_state is DiseaseHealthState.INFECTIOUS:
-            self.time_units_being_infectious.append(self._current_timer)
+            record('being_infectious', self.unique_id, time)
         elif self.disease_health_state is DiseaseHealthState.RECOVERED:
-            self.time_units_being_recovered.append(self._current_timer)
+            record('being_recovered', self.unique_id, time)
         elif self.disease_health_state is DiseaseHealthState.DEAD:
-            self.time_units_being_dead.append(self._current_timer)
+            record('being_dead', self.unique_id, time)
 
         if self.infectious_hospital_bed_state is UseHospitalBedState.YES:
-            self.time_units_using_hospital_bed.append(self._current_timer)
+            record('using_hospital_bed', self.unique_id, time)
 
         if self.infectious_icu_bed_state is UseICUBedState.YES:
-            self.time_units_using_icu_bed.append(self._current_timer)
+            record('using_icu_bed', self.unique_id, time)
 
         if self.infectious_ventilator_state is UseVentilatorState.YES:
-            self.time_units_using_ventilator.append(self._current_timer)
+            record('using_ventilator', self.unique_id, time)
 
         if self.recovered_drugX_state is UseDrugXState.YES:
-            self.time_units_using_drugX.append(self._current_timer)
+            record('using_drugX', self.unique_id, time)
 
         if ((self.infectious_symptom_state is InfectiousSymptomState.SEVERE_SYMPTOM) |
                 (self.infectious_symptom_state is InfectiousSymptomState.CRITICAL_SYMPTOM)):
-            self.time_units_when_symptoms_are_severe_or_critical.append(self._current_timer)
+            record('when_symptoms_are_severe_or_critical', self.unique_id, time)
 
     def construct_base_probability(self):
         if self._timer_since_beginning_of_last_infection:
-            self.model.prob_spread_virus_dist.x = self._timer_since_beginning_of_last_infection
-            self.model.prob_recover_dist.x = self._timer_since_beginning_of_last_infection
-            self.model.prob_virus_kill_host_dist.x = self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom
-
-            self.prob_spread_virus = self.model.prob_spread_virus_dist.get_pdf_prob_by_x()
-            self.prob_recover = self.model.prob_recover_dist.get_pdf_prob_by_x()
-            self.prob_virus_kill_host = self.model.prob_virus_kill_host_dist.get_cdf_prob_by_x()
-
-            self.model.prob_infectious_no_to_mild_symptom_dist.x = self._timer_since_beginning_of_last_infection
-            self.model.prob_infectious_no_to_severe_symptom_dist.x = self._timer_since_beginning_of_last_infection
-            self.model.prob_infectious_no_to_critical_symptom_dist.x = self._timer_since_beginning_of_last_infection
+            timer = self._timer_since_beginning_of_last_infection
+            model = self.model
 
-            self.prob_infectious_no_to_mild_symptom = self.model.prob_infectious_no_to_mild_symptom_dist.get_pdf_prob_by_x()
-            self.prob_infectious_no_to_severe_symptom = self.model.prob_infectious_no_to_severe_symptom_dist.get_pdf_prob_by_x()
-            self.prob_infectious_no_to_critical_symptom = self.model.prob_infectious_no_to_critical_symptom_dist.get_pdf_prob_by_x()
+            self.prob_spread_virus = model.prob_spread_virus_dist.get_pdf_prob(timer)
+            self.prob_recover = model.prob_recover_dist.get_pdf_prob(timer)
+            self.prob_virus_kill_host = model.prob_virus_kill_host_dist.get_cdf_prob(
+                self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom)
 
-            self.model.prob_infectious_mild_to_no_symptom_dist.x = self._timer_since_beginning_of_last_infection
-            self.model.prob_infectious_mild_to_severe_symptom_dist.x = self._timer_since_beginning_of_last_infection
-            self.model.prob_infectious_mild_to_critical_symptom_dist.x = self._timer_since_beginning_of_last_infection
+            self.prob_infectious_no_to_mild_symptom = model.prob_infectious_no_to_mild_symptom_dist.get_pdf_prob(timer)
+            self.prob_infectious_no_to_severe_symptom = model.prob_infectious_no_to_severe_symptom_dist.get_pdf_prob(timer)
+            self.prob_infectious_no_to_critical_symptom = model.prob_infectious_no_to_critical_symptom_dist.get_pdf_prob(timer)
 
-            self.prob_infectious_mild_to_no_symptom = self.model.prob_infectious_mild_to_no_symptom_dist.get_pdf_prob_by_x()
-            self.prob_infectious_mild_to_severe_symptom = self.model.prob_infectious_mild_to_severe_symptom_dist.get_pdf_prob_by_x()
-            self.prob_infectious_mild_to_critical_symptom = self.model.prob_infectious_mild_to_critical_symptom_dist.get_pdf_prob_by_x()
+            self.prob_infectious_mild_to_no_symptom = model.prob_infectious_mild_to_no_symptom_dist.get_pdf_prob(timer)
+            self.prob_infectious_mild_to_severe_symptom = model.prob_infectious_mild_to_severe_symptom_dist.get_pdf_prob(timer)
+            self.prob_infectious_mild_to_critical_symptom = model.prob_infectious_mild_to_critical_symptom_dist.get_pdf_prob(timer)
 
-            self.model.prob_infectious_severe_to_no_symptom_dist.x = self._timer_since_beginning_of_last_infection
-            self.model.prob_infectious_severe_to_mild_symptom_dist.x = self._timer_since_beginning_of_last_infection
-            self.model.prob_infectious_severe_to_critical_symptom_dist.x = self._timer_since_beginning_of_last_infection
+            self.prob_infectious_severe_to_no_symptom = model.prob_infectious_severe_to_no_symptom_dist.get_pdf_prob(timer)
+            self.prob_infectious_severe_to_mild_symptom = model.prob_infectious_severe_to_mild_symptom_dist.get_pdf_prob(timer)
+            self.prob_infectious_severe_to_critical_symptom = model.prob_infectious_severe_to_critical_symptom_dist.get_pdf_prob(timer)
 
-            self.prob_infectious_severe_to_no_symptom = self.model.prob_infectious_severe_to_no_symptom_dist.get_pdf_prob_by_x()
-            self.prob_infectious_severe_to_mild_symptom = self.model.prob_infectious_severe_to_mild_symptom_dist.get_pdf_prob_by_x()
-            self.prob_infectious_severe_to_critical_symptom = self.model.prob_infectious_severe_to_critical_symptom_dist.get_pdf_prob_by_x()
-
-            self.model.prob_infectious_critical_to_no_symptom_dist.x = self._timer_since_beginning_of_last_infection
-            self.model.prob_infectious_critical_to_mild_symptom_dist.x = self._timer_since_beginning_of_last_infection
-            self.model.prob_infectious_critical_to_severe_symptom_dist.x = self._timer_since_beginning_of_last_infection
-
-            self.prob_infectious_critical_to_no_symptom = self.model.prob_infectious_critical_to_no_symptom_dist.get_pdf_prob_by_x()
-            self.prob_infectious_critical_to_mild_symptom = self.model.prob_infectious_critical_to_mild_symptom_dist.get_pdf_prob_by_x()
-            self.prob_infectious_critical_to_severe_symptom = self.model.prob_infectious_critical_to_severe_symptom_dist.get_pdf_prob_by_x()
+            self.prob_infectious_critical_to_no_symptom = model.prob_infectious_critical_to_no_symptom_dist.get_pdf_prob(timer)
+            self.prob_infectious_critical_to_mild_symptom = model.prob_infectious_critical_to_mild_symptom_dist.get_pdf_prob(timer)
+            self.prob_infectious_critical_to_severe_symptom = model.prob_infectious_critical_to_severe_symptom_dist.get_pdf_prob(timer)
 
         else:
             self.prob_spread_virus = 0
@@ -461,46 +730,14 @@ class HostAgent(Agent):
             self.prob_infectious_critical_to_severe_symptom = 0
 
     def update_probability_by_special_condition(self):
-        modifier_from_hypertension = 0.05 # Setting: Assumed
-        modifier_from_diabetes = 0.05  # Setting: Assumed
-        modifier_from_ihd = 0.05  # Setting: Assumed
-        modifier_from_asthma = 0.05  # Setting: Assumed
-        modifier_from_cancer = 0.05  # Setting: Assumed
-        modifier_from_old_age = 0.05 # Setting: Assumed
-        modifier_from_severe_symptom = 0.05  # Setting: Assumed
-        modifier_from_critical_symptom = 0.05  # Setting: Assumed
-        modifier_from_critical_symptom_extra = 0.05/2  # Setting: Assumed
-        modifier_from_absence_of_adequate_care = 0.05 # Setting: Assumed
-
-        if self.comorbid_hypertension:
-            self.prob_recover = self.prob_recover * (1-modifier_from_hypertension)
-            self.prob_infectious_no_to_severe_symptom = self.prob_infectious_no_to_severe_symptom * (1+modifier_from_hypertension)
-            self.prob_infectious_no_to_critical_symptom = self.prob_infectious_no_to_critical_symptom * (1+modifier_from_hypertension)
-
-        if self.comorbid_diabetes:
-            self.prob_recover = self.prob_recover * (1-modifier_from_diabetes)
-            self.prob_infectious_no_to_severe_symptom = self.prob_infectious_no_to_severe_symptom * (1+modifier_from_diabetes)
-            self.prob_infectious_no_to_critical_symptom = self.prob_infectious_no_to_critical_symptom * (1+modifier_from_diabetes)
-
-        if self.comorbid_ihd:
-            self.prob_recover = self.prob_recover * (1-modifier_from_ihd)
-            self.prob_infectious_no_to_severe_symptom = self.prob_infectious_no_to_severe_symptom * (1+modifier_from_ihd)
-            self.prob_infectious_no_to_critical_symptom = self.prob_infectious_no_to_critical_symptom * (1+modifier_from_ihd)
-
-        if self.comorbid_asthma:
-            self.prob_recover = self.prob_recover * (1-modifier_from_asthma)
-            self.prob_infectious_no_to_severe_symptom = self.prob_infectious_no_to_severe_symptom * (1+modifier_from_asthma)
-            self.prob_infectious_no_to_critical_symptom = self.prob_infectious_no_to_critical_symptom * (1+modifier_from_asthma)
-
-        if self.comorbid_cancer:
-            self.prob_recover = self.prob_recover * (1-modifier_from_cancer)
-            self.prob_infectious_no_to_severe_symptom = self.prob_infectious_no_to_severe_symptom * (1+modifier_from_cancer)
-            self.prob_infectious_no_to_critical_symptom = self.prob_infectious_no_to_critical_symptom * (1+modifier_from_cancer)
-
-        if self.age >= 60:
-            self.prob_recover = self.prob_recover * (1-modifier_from_old_age)
-            self.prob_infectious_no_to_severe_symptom = self.prob_infectious_no_to_severe_symptom * (1+modifier_from_old_age)
-            self.prob_infectious_no_to_critical_symptom = self.prob_infectious_no_to_critical_symptom * (1+modifier_from_old_age)
+        modifier_from_severe_symptom = self.model.modifier_from_severe_symptom
+        modifier_from_critical_symptom = self.model.modifier_from_critical_symptom
+        modifier_from_critical_symptom_extra = self.model.modifier_from_critical_symptom_extra
+        modifier_from_absence_of_adequate_care = self.model.modifier_from_absence_of_adequate_care
+
+        self.prob_recover = self.prob_recover * self.static_recover_multiplier
+        self.prob_infectious_no_to_severe_symptom = self.prob_infectious_no_to_severe_symptom * self.static_onset_multiplier
+        self.prob_infectious_no_to_critical_symptom = self.prob_infectious_no_to_critical_symptom * self.static_onset_multiplier
 
         if self.infectious_symptom_state is InfectiousSymptomState.SEVERE_SYMPTOM:
             self.prob_recover = self.prob_recover * (1-modifier_from_severe_symptom)
@@ -582,8 +819,7 @@ class HostAgent(Agent):
 
         # Rescale if `prob_infectious_{}_symptom_maintained` is less than 0
         if self.prob_infectious_no_symptom_maintained < 0:
-            logger.warning('WARNING:`prob_infectious_no_symptom_maintained` for agent {} is less than 0, rescaling applied.'.format(
-                    self.pos))
+            self.model.probability_rescale_count += 1
             self.prob_infectious_no_symptom_maintained = 0
             self.prob_infectious_no_to_mild_symptom, self.prob_infectious_no_to_severe_symptom, \
             self.prob_infectious_no_to_critical_symptom = \
@@ -592,8 +828,7 @@ class HostAgent(Agent):
                                      self.prob_infectious_no_to_critical_symptom)
 
         if self.prob_infectious_mild_symptom_maintained < 0:
-            logger.warning('WARNING:`prob_infectious_mild_symptom_maintained` for agent {} is less than 0, rescaling applied.'.format(
-                    self.pos))
+            self.model.probability_rescale_count += 1
             self.prob_infectious_mild_symptom_maintained = 0
             self.prob_infectious_mild_to_no_symptom, self.prob_infectious_mild_to_severe_symptom, \
             self.prob_infectious_mild_to_critical_symptom = \
@@ -602,8 +837,7 @@ class HostAgent(Agent):
                                      self.prob_infectious_mild_to_critical_symptom)
 
         if self.prob_infectious_severe_symptom_maintained < 0:
-            logger.warning('WARNING:`prob_infectious_severe_symptom_maintained` for agent {} is less than 0, rescaling applied.'.format(
-                    self.pos))
+            self.model.probability_rescale_count += 1
             self.prob_infectious_severe_symptom_maintained = 0
             self.prob_infectious_severe_to_no_symptom, self.prob_infectious_severe_to_mild_symptom, \
             self.prob_infectious_severe_to_critical_symptom = \
@@ -612,8 +846,7 @@ class HostAgent(Agent):
                                      self.prob_infectious_severe_to_critical_symptom)
 
         if self.prob_infectious_critical_symptom_maintained < 0:
-            logger.warning('WARNING:`prob_infectious_critical_symptom_maintained` for agent {} is less than 0, rescaling applied.'.format(
-                    self.pos))
+            self.model.probability_rescale_count += 1
             self.prob_infectious_critical_symptom_maintained = 0
             self.prob_infectious_critical_to_no_symptom, self.prob_infectious_critical_to_mild_symptom, \
             self.prob_infectious_critical_to_severe_symptom = \
@@ -637,20 +870,58 @@ class HostAgent(Agent):
         assert self.prob_recovered_severe_complication_maintained >= 0, 'ValueError: `prob_recovered_severe_complication_maintained`' \
                                                                 'is less than 0.'
 
-    def update_time_variable(self):
-        if self.disease_health_state is not DiseaseHealthState.SUSCEPTIBLE:
-            self._timer_since_beginning_of_last_infection += 1
-            self._timer_since_beginning_of_any_infection += 1
-
-            if ((self.infectious_symptom_state is InfectiousSymptomState.SEVERE_SYMPTOM) |
-                    (self.infectious_symptom_state is InfectiousSymptomState.CRITICAL_SYMPTOM)):
-                self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom += 1
-
-            if self.infectious_symptom_state is InfectiousSymptomState.MILD_SYMPTOM:
-                self._timer_since_beginning_of_last_onset_of_mild_symptom += 1
-
+    def construct_daily_probability(self):
+        if self.model.prepared_probabilities is not None:
+            probabilities = self.model.prepared_probabilities.pop(self.unique_id, None)
+            if probabilities is not None:
+                # Built, counted and validated earlier in the day by `HostNetwork.presample_symptom_transitions()`
+                for attribute, prob in zip(DAILY_PROBABILITY_ATTRIBUTES, probabilities):
+                    setattr(self, attribute, prob)
+                return
+
+        if self.model.probability_memo is not None:
+            self.construct_probability_from_memo()
         else:
-            self._timer_since_beginning_of_last_infection = None
+            self.construct_base_probability()
+            self.update_probability_by_special_condition()
+            self.final_probability_update()
+            if self.model.validate_probability_today:
+                self.validate_probability_setting()
+
+    def construct_probability_from_memo(self):
+        '''Same probabilities as `construct_base_probability()` to `validate_probability_setting()`, reused from
+        `model.probability_memo` when a host in the same condition has already built them. An entry also keeps the
+        number of rescalings they needed, so `model.probability_rescale_count` does not depend on the memo, and whether
+        they were validated: an entry built on a day without validation is validated the first time it is read on a
+        validation day. The memo belongs to one model, so a key never mixes parameter sets.'''
+        key = (self._timer_since_beginning_of_last_infection,
+               self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom,
+               self.static_recover_multiplier, self.static_onset_multiplier, self.infectious_symptom_state,
+               self.infectious_hospital_bed_state, self.infectious_icu_bed_state, self.infectious_ventilator_state)
+        entry = self.model.probability_memo.get(key)
+        if entry is None:
+            rescale_count = self.model.probability_rescale_count
+            self.construct_base_probability()
+            self.update_probability_by_special_condition()
+            self.final_probability_update()
+            if self.model.validate_probability_today:
+                self.validate_probability_setting()
+            self.model.probability_memo.put(key, (get_daily_probabilities(self),
+                self.model.probability_rescale_count - rescale_count, self.model.validate_probability_today))
+        else:
+            probabilities, rescale_count, is_validated = entry
+            for attribute, prob in zip(DAILY_PROBABILITY_ATTRIBUTES, probabilities):
+                setattr(self, attribute, prob)
+            self.model.probability_rescale_count += rescale_count
+            if self.model.validate_probability_today and not is_validated:
+                self.validate_probability_setting()
+                self.model.probability_memo.put(key, (probabilities, rescale_count, True))
+
+    def catch_up_time_units(self, current_time):
+        '''Replay the time-keeping of the time units before `current_time` that this agent was not stepped for.'''
+        for time in range(self._time_of_last_step + 1, current_time):
+            self.track_time_unit_by_state(time)
+        self._time_of_last_step = max(self._time_of_last_step, current_time - 1)
 
     def initial_variable_reset(self):
         self.new_test_done_over_current_time_unit = None
@@ -659,50 +930,53 @@ class HostAgent(Agent):
         pass
 
     def step(self):
-        self._current_timer += 1
+        self._time_of_last_step = self._current_timer
 
         if self._stop_timer:
             if (self._current_timer > self._stop_timer):
                 logger.info('INFO: Execution ended when the `_unit_timer_stopper` has reached the specified time.')
                 sys.exit()
 
-        initial_function_list = [
-            self.initial_variable_reset,
-            self.construct_base_probability,
-            self.update_probability_by_special_condition,
-            self.final_probability_update,
-            self.validate_probability_setting,
-            self.try_social_distancing,
-            self.try_test_disease_status,
-        ]
-
-        function_list = [
-            self.try_infect_neighbors,
-            self.try_recover_from_infection,
-            self.try_check_death,
-            self.try_change_infectious_symptom_state,
-            self.try_change_recovered_complication_state,
-            self.try_use_drugX,
-            self.try_use_hospital_bed,
-            self.try_use_icu_bed,
-            self.try_use_ventilator,
-            self.try_gain_immunity_from_vaccine,
-        ]
-
-        end_function_list = [
-            self.track_time_unit_by_state,
-            self.update_time_variable,
-            self.end_variable_reset,
-        ]
-
-        if self._shuffle_behaviour_switch:
-            random.shuffle(function_list)
-
-        full_function_list = initial_function_list + function_list + end_function_list
-        [f() for f in full_function_list]
+        if self.model._use_synchronous_update:
+            # First phase of `SynchronousActivation`, only reads the neighbors and buffers their infections
+            if self.disease_health_state is DiseaseHealthState.INFECTIOUS:
+                self.construct_daily_probability()
+                self.model.schedule.buffer_probabilities(self, get_daily_probabilities(self))
+                self.try_social_distancing()
+                self.try_infect_neighbors()
+            return
+
+        self.run_behaviours(STEP_DISPATCH)
 
     def advance(self):
-        self.step()
+        '''Second phase of `SynchronousActivation`, the buffered infection then the behaviours other than
+        `try_infect_neighbors()`.'''
+        probabilities = self.model.schedule.pop_probabilities(self)
+        self.take_buffered_infection()
+        if probabilities is None:
+            self.run_behaviours(SYNCHRONOUS_STEP_DISPATCH)
+            return
+
+        # Built in `step()` from states that cannot have changed since, `CompactHostAgent` keeps them in the shared
+        # `model.agent_scratch` so they are set again
+        for attribute, prob in zip(DAILY_PROBABILITY_ATTRIBUTES, probabilities):
+            setattr(self, attribute, prob)
+        self.run_behaviours(PREPARED_SYNCHRONOUS_STEP_DISPATCH)
+
+    def run_behaviours(self, dispatch):
+        initial_function_list, behaviour_mask = dispatch[self.disease_health_state]
+        for f in initial_function_list:
+            f(self)
+
+        # Behaviours that cannot change a host in its current state are skipped, the others keep their place in
+        # the permutation of all `STEP_BEHAVIOURS`
+        order = self.behaviour_permutation() if self._shuffle_behaviour_switch else range(len(STEP_BEHAVIOURS))
+        for index in order:
+            if behaviour_mask[index]:
+                STEP_BEHAVIOURS[index](self)
+
+        self.track_time_unit_by_state()
+        self.end_variable_reset()
 
     ### Class helper functions ###
     def describe_agent_profile(self, show_prob_infectious_symptom_state_change=False):
@@ -731,3 +1005,120 @@ class HostAgent(Agent):
 
         print('/////////////////////////////')
         print('/////////////////////////////'+'\n')
+
+# Behaviours run in a random order by `HostAgentBehaviour.step()`
+STEP_BEHAVIOURS = (
+    HostAgentBehaviour.try_infect_neighbors,
+    HostAgentBehaviour.try_recover_from_infection,
+    HostAgentBehaviour.try_check_death,
+    HostAgentBehaviour.try_change_infectious_symptom_state,
+    HostAgentBehaviour.try_change_recovered_complication_state,
+    HostAgentBehaviour.try_use_drugX,
+    HostAgentBehaviour.try_use_hospital_bed,
+    HostAgentBehaviour.try_use_icu_bed,
+    HostAgentBehaviour.try_use_ventilator,
+    HostAgentBehaviour.try_gain_immunity_from_vaccine,
+)
+
+def step_dispatch(initial_function_list, behaviours):
+    return initial_function_list, tuple(f in behaviours for f in STEP_BEHAVIOURS)
+
+# Disease health state at the start of a step: (behaviours run first in order, mask over `STEP_BEHAVIOURS`).
+# An infectious host can recover, develop a complication or free a clinical resource within its step, so it runs
+# every behaviour whatever its symptom state. Recovered and dead hosts still release the resources they hold.
+STEP_DISPATCH = {
+    DiseaseHealthState.SUSCEPTIBLE: step_dispatch(
+        (HostAgentBehaviour.initial_variable_reset, HostAgentBehaviour.try_test_disease_status),
+        {HostAgentBehaviour.try_gain_immunity_from_vaccine}),
+    DiseaseHealthState.INFECTIOUS: step_dispatch(
+        (HostAgentBehaviour.initial_variable_reset, HostAgentBehaviour.construct_daily_probability,
+         HostAgentBehaviour.try_social_distancing, HostAgentBehaviour.try_test_disease_status),
+        set(STEP_BEHAVIOURS)),
+    DiseaseHealthState.RECOVERED: step_dispatch(
+        (HostAgentBehaviour.initial_variable_reset, HostAgentBehaviour.try_test_disease_status),
+        {HostAgentBehaviour.try_change_recovered_complication_state, HostAgentBehaviour.try_use_drugX,
+         HostAgentBehaviour.try_use_hospital_bed, HostAgentBehaviour.try_use_icu_bed,
+         HostAgentBehaviour.try_use_ventilator, HostAgentBehaviour.try_gain_immunity_from_vaccine}),
+    DiseaseHealthState.DEAD: step_dispatch(
+        (HostAgentBehaviour.initial_variable_reset,),
+        {HostAgentBehaviour.try_use_drugX, HostAgentBehaviour.try_use_hospital_bed,
+         HostAgentBehaviour.try_use_icu_bed, HostAgentBehaviour.try_use_ventilator}),
+}
+
+# Same as `STEP_DISPATCH` for `HostAgentBehaviour.advance()`, neighbors are infected in the first phase
+SYNCHRONOUS_STEP_DISPATCH = {state: (initial_function_list, tuple(
+    is_run and (f is not HostAgentBehaviour.try_infect_neighbors) for f, is_run in zip(STEP_BEHAVIOURS, behaviour_mask)))
+    for state, (initial_function_list, behaviour_mask) in STEP_DISPATCH.items()}
+
+# Same as `SYNCHRONOUS_STEP_DISPATCH` for a host already infectious in the first phase, its daily probabilities and
+# edge threshold were set by `HostAgentBehaviour.step()`
+PREPARED_SYNCHRONOUS_STEP_DISPATCH = dict(SYNCHRONOUS_STEP_DISPATCH)
+PREPARED_SYNCHRONOUS_STEP_DISPATCH[DiseaseHealthState.INFECTIOUS] = (tuple(
+    f for f in SYNCHRONOUS_STEP_DISPATCH[DiseaseHealthState.INFECTIOUS][0] if f not in (
+        HostAgentBehaviour.construct_daily_probability, HostAgentBehaviour.try_social_distancing)),
+    SYNCHRONOUS_STEP_DISPATCH[DiseaseHealthState.INFECTIOUS][1])
+
+class HostAgent(HostAgentBehaviour, Agent):
+    disease_health_state = tracked_state('disease_health_state')
+    infectious_symptom_state = tracked_state('infectious_symptom_state')
+    recovered_complication_state = tracked_state('recovered_complication_state')
+    recovered_immunity_state = tracked_state('recovered_immunity_state')
+    infectious_hospital_bed_state = tracked_state('infectious_hospital_bed_state')
+    infectious_icu_bed_state = tracked_state('infectious_icu_bed_state')
+    infectious_ventilator_state = tracked_state('infectious_ventilator_state')
+    recovered_drugX_state = tracked_state('recovered_drugX_state')
+    test_result_on_disease_health_state = tracked_state('test_result_on_disease_health_state')
+    new_test_done_over_current_time_unit = tracked_state('new_test_done_over_current_time_unit')
+
+class CompactHostAgent(HostAgentBehaviour, SlottedAgent):
+    '''`HostAgent` with fixed `__slots__`, states stored as their integer codes and the transient daily
+    probabilities moved to `model.agent_scratch`. Reading a state still returns the enum member.'''
+    __slots__ = ('_is_counted_by_state_counter', '_stop_timer', '_time_of_last_step', '_shuffle_behaviour_switch',
+                 '_edge_weight_threshold_to_infect', 'age', 'sex', 'comorbid_hypertension', 'comorbid_diabetes',
+                 'comorbid_ihd', 'comorbid_asthma', 'comorbid_cancer', 'static_recover_multiplier',
+                 'static_onset_multiplier', '_disease_health_state',
+                 '_infectious_symptom_state', '_recovered_complication_state', '_recovered_immunity_state',
+                 '_infectious_hospital_bed_state', '_infectious_icu_bed_state', '_infectious_ventilator_state',
+                 '_recovered_drugX_state', '_test_result_on_disease_health_state', '_vaccine_immunity_state',
+                 '_new_test_done_over_current_time_unit', 'initial_recovered_immunity_state',
+                 'new_infection_tracker', '_time_of_last_infection', '_time_of_last_onset_of_mild_symptom',
+                 '_time_of_end_of_last_mild_symptom', '_time_of_last_onset_of_severe_or_critical_symptom',
+                 '_time_of_end_of_last_severe_or_critical_symptom',
+                 '_time_of_next_complication_change', 'prob_gain_immunity', 'prob_recovered_no_to_mild_complication',
+                 'prob_recovered_no_to_severe_complication', 'prob_recovered_no_complication_maintained',
+                 'prob_recovered_mild_to_no_complication', 'prob_recovered_mild_to_severe_complication',
+                 'prob_recovered_mild_complication_maintained', 'prob_recovered_severe_to_no_complication',
+                 'prob_recovered_severe_to_mild_complication', 'prob_recovered_severe_complication_maintained',
+                 'clinical_resource', 'social_distancing', 'vaccine', 'testing')
+
+    disease_health_state = coded_state('disease_health_state', DiseaseHealthState)
+    infectious_symptom_state = coded_state('infectious_symptom_state', InfectiousSymptomState)
+    recovered_complication_state = coded_state('recovered_complication_state', RecoveredComplicationState)
+    recovered_immunity_state = coded_state('recovered_immunity_state', RecoveredImmunityState)
+    infectious_hospital_bed_state = coded_state('infectious_hospital_bed_state', UseHospitalBedState)
+    infectious_icu_bed_state = coded_state('infectious_icu_bed_state', UseICUBedState)
+    infectious_ventilator_state = coded_state('infectious_ventilator_state', UseVentilatorState)
+    recovered_drugX_state = coded_state('recovered_drugX_state', UseDrugXState)
+    test_result_on_disease_health_state = coded_state('test_result_on_disease_health_state', TestResultState)
+    vaccine_immunity_state = coded_state('vaccine_immunity_state', VaccineImmunityState, is_tracked=False)
+    new_test_done_over_current_time_unit = tracked_state('new_test_done_over_current_time_unit')
+
+    prob_spread_virus = scratch_probability('prob_spread_virus')
+    prob_recover = scratch_probability('prob_recover')
+    prob_virus_kill_host = scratch_probability('prob_virus_kill_host')
+    prob_infectious_no_symptom_maintained = scratch_probability('prob_infectious_no_symptom_maintained')
+    prob_infectious_no_to_mild_symptom = scratch_probability('prob_infectious_no_to_mild_symptom')
+    prob_infectious_no_to_severe_symptom = scratch_probability('prob_infectious_no_to_severe_symptom')
+    prob_infectious_no_to_critical_symptom = scratch_probability('prob_infectious_no_to_critical_symptom')
+    prob_infectious_mild_symptom_maintained = scratch_probability('prob_infectious_mild_symptom_maintained')
+    prob_infectious_mild_to_no_symptom = scratch_probability('prob_infectious_mild_to_no_symptom')
+    prob_infectious_mild_to_severe_symptom = scratch_probability('prob_infectious_mild_to_severe_symptom')
+    prob_infectious_mild_to_critical_symptom = scratch_probability('prob_infectious_mild_to_critical_symptom')
+    prob_infectious_severe_symptom_maintained = scratch_probability('prob_infectious_severe_symptom_maintained')
+    prob_infectious_severe_to_no_symptom = scratch_probability('prob_infectious_severe_to_no_symptom')
+    prob_infectious_severe_to_mild_symptom = scratch_probability('prob_infectious_severe_to_mild_symptom')
+    prob_infectious_severe_to_critical_symptom = scratch_probability('prob_infectious_severe_to_critical_symptom')
+    prob_infectious_critical_symptom_maintained = scratch_probability('prob_infectious_critical_symptom_maintained')
+    prob_infectious_critical_to_no_symptom = scratch_probability('prob_infectious_critical_to_no_symptom')
+    prob_infectious_critical_to_mild_symptom = scratch_probability('prob_infectious_critical_to_mild_symptom')
+    prob_infectious_critical_to_severe_symptom = scratch_probability('prob_infectious_critical_to_severe_symptom')
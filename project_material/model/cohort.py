@@ -0,0 +1,110 @@
+import numpy as np
+from ..model.state import DiseaseHealthState, RecoveredImmunityState
+
+NUM_AGE_BANDS = 10 # Setting: 10-year age bands, the last one open-ended
+COMORBIDITIES = ['comorbid_hypertension', 'comorbid_diabetes', 'comorbid_ihd', 'comorbid_asthma', 'comorbid_cancer']
+NUM_SIGNATURES = NUM_AGE_BANDS * 2 * 2**len(COMORBIDITIES)
+
+def attribute_signature(host_attributes):
+    '''Bucket of each host by age band, sex and comorbidity mask, as one integer below `NUM_SIGNATURES`.'''
+    signature = np.minimum(host_attributes['age'] // 10, NUM_AGE_BANDS - 1).astype(np.int64)
+    signature = signature * 2 + host_attributes['is_male']
+    for comorbidity in COMORBIDITIES:
+        signature = signature * 2 + host_attributes[comorbidity]
+    return signature
+
+class CohortLayer():
+    '''Susceptible hosts that no infection, test or vaccine has reached yet, used by the agent engine when
+    `model._use_cohort_layer` is on.
+
+    Such hosts all hold the initial state of a `HostAgent` and a day without a network event changes nothing but
+    their time-keeping, so they are kept as counts per attribute signature (see `attribute_signature()`) instead of
+    agents. A host is materialized into its `HostAgent` when it is infected, or when its draws pick it for a test or
+    a vaccine on an intervention day. Its static attributes come from `model.host_attributes`, its draws from
+    `model.counter_random` and the days it missed are replayed by `HostAgent.catch_up_time_units()`, so it then
+    runs as it would have from the start.'''
+    def __init__(self, model, host_agent_class):
+        self.model = model
+        self.host_agent_class = host_agent_class
+        self.signature = attribute_signature(model.host_attributes)
+        self.counts = np.bincount(self.signature, minlength=NUM_SIGNATURES) # Hosts per signature still in the layer
+        self.in_layer = np.ones(model.num_nodes, dtype=bool)
+        self.template = self.new_agent(0) # Initial state of every host in the layer, for `StateCounter`
+
+    @property
+    def num_hosts(self):
+        return int(self.counts.sum())
+
+    def hosts(self):
+        return np.flatnonzero(self.in_layer)
+
+    def new_agent(self, node):
+        model = self.model
+        return self.host_agent_class(node, model, DiseaseHealthState.SUSCEPTIBLE, RecoveredImmunityState.TBD,
+                                     model.prob_recovered_no_to_mild_complication,
+                                     model.prob_recovered_no_to_severe_complication,
+                                     model.prob_recovered_mild_to_no_complication,
+                                     model.prob_recovered_mild_to_severe_complication,
+                                     model.prob_recovered_severe_to_no_complication,
+                                     model.prob_recovered_severe_to_mild_complication,
+                                     model.prob_gain_immunity,
+                                     model.clinical_resource, model.social_distancing,
+                                     model.vaccine, model.testing,
+                                     )
+
+    def add_to_state_counter(self, state_counter):
+        '''Count the hosts in the layer, they keep being counted by `state_counter` once materialized.'''
+        state_counter.add(self.template, value=self.num_hosts)
+
+    def materialize(self, node):
+        '''`HostAgent` of `node`, taken out of the layer if it is still there.'''
+        agent = self.model.host_agents[node]
+        if agent is not None:
+            return agent
+
+        # The constructor resets the daily probabilities in `model.agent_scratch`, they belong to the agent being stepped
+        scratch = self.model.agent_scratch
+        probabilities = [getattr(scratch, attribute) for attribute in scratch.__slots__] if scratch is not None else []
+        agent = self.new_agent(node)
+        for attribute, prob in zip(scratch.__slots__ if scratch is not None else [], probabilities):
+            setattr(scratch, attribute, prob)
+
+        self.in_layer[node] = False
+        self.counts[self.signature[node]] -= 1
+        self.model.schedule.add(agent)
+        self.model.host_agents[node] = agent
+        agent._is_counted_by_state_counter = self.model.state_counter is not None
+        self.model.grid.place_agent(agent, node)
+        return agent
+
+    def materialize_intervention_hosts(self, time):
+        '''Materialize the hosts of the layer that the testing or vaccine draws of `time` pick, with the checks of
+        `Testing.check_suitability()` and `Vaccine.check_suitability()` for a susceptible host never tested nor
+        vaccinated.'''
+        hosts = self.hosts()
+        picked = np.zeros(hosts.size, dtype=bool)
+        counter_random = self.model.counter_random
+
+        testing = self.model.testing
+        testing.current_time = time
+        if testing.check_timing():
+            picked |= counter_random.uniforms_at(time, 'testing_suitability', hosts) < \
+                testing.prob_tested_for_no_symptom[testing._list_slot_counter]
+
+        vaccine = self.model.vaccine
+        vaccine.current_time = time
+        if vaccine.check_timing():
+            picked |= counter_random.uniforms_at(time, 'vaccine_suitability', hosts) < \
+                vaccine.prob_vaccinated[vaccine._list_slot_counter] * \
+                vaccine.vaccine_success_rate[vaccine._list_slot_counter]
+
+        for node in hosts[picked].tolist():
+            self.materialize(node)
+
+    def count_by_signature(self):
+        '''Hosts in the layer per signature, a copy of `self.counts`.'''
+        return self.counts.copy()
+
+    def sum_attribute(self, attribute):
+        '''Sum of the static attribute `attribute` of `model.host_attributes` over the hosts in the layer.'''
+        return self.model.host_attributes[attribute][self.in_layer].sum()
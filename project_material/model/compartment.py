@@ -0,0 +1,270 @@
+from enum import Enum
+import numpy as np
+from ..model.state import TestResultState
+from ..model.population import HostPopulation, NONE_STATE, SUSCEPTIBLE, INFECTIOUS, RECOVERED, DEAD, \
+    NO_COMPLICATION, MILD_COMPLICATION, SEVERE_COMPLICATION
+from ..model.symptom import symptom_transition_rows, apply_symptom_choice
+
+# `HostPopulation` arrays held per compartment, a compartment being the hosts of one stratum with equal values
+STATE_COLUMNS = ['disease_health_state', 'infectious_symptom_state', 'recovered_complication_state',
+                 'recovered_immunity_state', 'vaccine_immunity_state', 'test_result_on_disease_health_state',
+                 'new_test_done_over_current_time_unit', 'infectious_hospital_bed_state', 'infectious_icu_bed_state',
+                 'infectious_ventilator_state', 'recovered_drugX_state', 'test_confirmed',
+                 '_timer_since_beginning_of_last_infection', '_timer_since_beginning_of_last_onset_of_mild_symptom',
+                 '_timer_since_beginning_of_last_onset_of_severe_or_critical_symptom', 'time_last_tested']
+COMPARTMENT_COLUMNS = ['stratum'] + STATE_COLUMNS
+
+# Order in which the hosts of a stratum take back the compartments, by disease state when they left
+DISEASE_RANK = np.zeros(max(SUSCEPTIBLE, INFECTIOUS, RECOVERED, DEAD) + 1, dtype=np.int64)
+DISEASE_RANK[[DEAD, RECOVERED, INFECTIOUS, SUSCEPTIBLE]] = np.arange(4)
+
+def multinomial_counts(rng, count, prob):
+    '''Hosts of each row of `count` falling in each column of `prob` (rows summing to 1), drawn as binomials of the
+    hosts left over the probability left.'''
+    moved = np.zeros(prob.shape, dtype=np.int64)
+    remaining = np.asarray(count, dtype=np.int64).copy()
+    left = np.ones(prob.shape[0])
+    for column in range(prob.shape[1] - 1):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            conditional = np.clip(np.where(left > 0, prob[:, column] / left, 1.0), 0.0, 1.0)
+        moved[:, column] = rng.binomial(remaining, conditional)
+        remaining -= moved[:, column]
+        left = left - prob[:, column]
+    moved[:, -1] = remaining
+    return moved
+
+class CompartmentPopulation(HostPopulation):
+    '''Aggregate engine for the hybrid mode of `HostNetwork`, see `model._hybrid_prevalence_threshold`.
+
+    Rows are compartments: a `count` of hosts of one stratum sharing the value of every array of `STATE_COLUMNS`.
+    A stratum gathers the hosts with the same static risk multipliers and sex, so that all hosts of a row get the
+    same daily probabilities. The phases of `HostPopulation` run on the rows unchanged, with `select()`, `choose()`
+    and `allocate()` splitting a row into binomial (or multinomial, hypergeometric) shares instead of picking
+    hosts, and the rows that end up equal are merged at the end of the day. Transmission is mean-field: a candidate
+    meets every other host with the mean number of contact edges over the day's threshold.
+
+    The individual `HostPopulation` is kept in `self.population` and `to_population()` hands the compartments back
+    to its hosts, within each stratum.'''
+    def __init__(self, population):
+        self.population = population
+        self.model = population.model
+        self.rng = population.rng
+        self.num_hosts = population.num_hosts
+        self.steps = population.steps
+        self.time = population.time
+        self.adjacency = population.adjacency
+        self.new_infection_tracker = population.new_infection_tracker
+        self.infectious_index = np.empty(0, dtype=np.int64)
+        self.prob = {}
+        self.prob_position = np.empty(0, dtype=np.int64) # Entry of each row in `self.prob`, -1 for none
+        self._mean_contacts = {} # Edge weight threshold: mean number of edges over it per host
+
+        strata, self.host_stratum = np.unique(np.stack([
+            population.static_recover_multiplier, population.static_onset_multiplier, population.is_male], axis=1),
+            axis=0, return_inverse=True)
+        self.stratum_recover_multiplier = strata[:, 0]
+        self.stratum_onset_multiplier = strata[:, 1]
+        self.stratum_is_male = strata[:, 2]
+        self.stratum_age = np.bincount(self.host_stratum, weights=population.age) / np.bincount(self.host_stratum)
+
+        self.stratum = self.host_stratum.copy()
+        for column in STATE_COLUMNS:
+            setattr(self, column, getattr(population, column).copy())
+        self.count = np.ones(self.num_hosts, dtype=np.int64)
+        self.merge()
+
+    @property
+    def all_hosts(self):
+        return np.arange(self.count.size)
+
+    @property
+    def static_recover_multiplier(self):
+        return self.stratum_recover_multiplier[self.stratum]
+
+    @property
+    def static_onset_multiplier(self):
+        return self.stratum_onset_multiplier[self.stratum]
+
+    @property
+    def age(self):
+        return self.stratum_age[self.stratum]
+
+    @property
+    def is_male(self):
+        return self.stratum_is_male[self.stratum]
+
+    def split(self, rows, moved):
+        '''Move `moved[i]` hosts of row `rows[i]` to a new row with the same values, returns the new rows. A row
+        with daily probabilities passes them on.'''
+        keep = moved > 0
+        rows, moved = rows[keep], np.asarray(moved, dtype=np.int64)[keep]
+        new_rows = np.arange(self.count.size, self.count.size + rows.size)
+        for column in COMPARTMENT_COLUMNS:
+            values = getattr(self, column)
+            setattr(self, column, np.concatenate([values, values[rows]]))
+        self.count[rows] -= moved
+        self.count = np.concatenate([self.count, moved])
+
+        position = self.prob_position[rows]
+        with_prob = position >= 0
+        self.prob_position = np.concatenate([self.prob_position, np.where(
+            with_prob, self.infectious_index.size + np.cumsum(with_prob) - 1, -1)])
+        if with_prob.any():
+            self.infectious_index = np.concatenate([self.infectious_index, new_rows[with_prob]])
+            self.prob = {key: np.concatenate([value, value[position[with_prob]]]) for key, value in self.prob.items()}
+        return new_rows
+
+    def select(self, purpose, index, prob):
+        '''Binomial share of the hosts of each row of `index`, moved to new rows.'''
+        prob = np.broadcast_to(np.clip(prob, 0.0, 1.0), index.shape)
+        return self.split(index, self.rng.binomial(self.count[index], prob))
+
+    def choose(self, purpose, index, cumulative_prob):
+        '''Multinomial shares of the hosts of each row of `index` over the categories, category `0` staying in the
+        row and the others moved to new rows.'''
+        cumulative_prob = np.broadcast_to(np.clip(cumulative_prob, 0.0, 1.0),
+                                          (index.size, np.shape(cumulative_prob)[-1]))
+        prob = np.diff(cumulative_prob, axis=1, prepend=0.0, append=1.0)
+        moved = multinomial_counts(self.rng, self.count[index], prob)
+        rows, categories = [index], [np.zeros(index.size, dtype=np.int64)]
+        for category in range(1, prob.shape[1]):
+            new_rows = self.split(index, moved[:, category])
+            rows.append(new_rows)
+            categories.append(np.full(new_rows.size, category))
+        return np.concatenate(rows), np.concatenate(categories)
+
+    def allocate(self, candidates, available, purpose):
+        '''Hand out `available` units of a resource among the hosts of the `candidates` rows at random.'''
+        count = self.count[candidates]
+        taken = min(max(int(available), 0), int(count.sum()))
+        moved = self.rng.multivariate_hypergeometric(count, taken) if taken > 0 else np.zeros(count.size, np.int64)
+        return self.split(candidates, moved)
+
+    def count_hosts(self, index):
+        return int(self.count[index].sum())
+
+    def count_mask(self, mask):
+        return int(self.count[mask].sum())
+
+    def construct_base_probability(self):
+        super().construct_base_probability()
+        self.prob_position = np.full(self.count.size, -1, dtype=np.int64)
+        self.prob_position[self.infectious_index] = np.arange(self.infectious_index.size)
+
+    def get_mean_contacts(self, threshold):
+        if threshold not in self._mean_contacts:
+            self._mean_contacts[threshold] = np.count_nonzero(self.adjacency.weights > threshold) / self.num_hosts
+        return self._mean_contacts[threshold]
+
+    def try_infect_neighbors(self):
+        index = self.infectious_index
+        spreading = (self.disease_health_state[index] == INFECTIOUS) & (self.count[index] > 0)
+        spreaders = self.count[index[spreading]]
+        prob_spread_virus = np.clip(self.prob['prob_spread_virus'][spreading], 0.0, np.nextafter(1.0, 0.0))
+
+        # Each candidate meets each other host on the mean number of contact edges a host has
+        contacts = self.get_mean_contacts(self._edge_weight_threshold_to_infect) / max(self.num_hosts - 1, 1)
+        hazard = -np.log1p(-prob_spread_virus)
+        infected = self.select('spread_virus', np.flatnonzero(self.get_candidate()),
+                               -np.expm1(-contacts * (spreaders * hazard).sum()))
+        self.infect(infected)
+        new_infections = self.count_hosts(infected)
+        if new_infections > 0:
+            self.model.cumulative_infectious_cases += new_infections
+            # Each new case is credited to a spreader drawn in proportion to its hazard
+            share = hazard / (spreaders * hazard).sum()
+            credited = self.rng.binomial(spreaders, -np.expm1(new_infections * np.log1p(-share))).sum()
+            self.new_infection_tracker[self.time] = [max(int(credited), 1), new_infections]
+
+    def try_change_infectious_symptom_state(self):
+        still_infectious = self.disease_health_state[self.infectious_index] == INFECTIOUS
+        index = self.infectious_index[still_infectious]
+        prob = {key: value[still_infectious] for key, value in self.prob.items()}
+        cumulative_prob = np.cumsum(symptom_transition_rows(self.infectious_symptom_state[index], prob)[:, :3], axis=1)
+        index, choice = self.choose('change_infectious_symptom', index, cumulative_prob)
+        new_symptom, onset_mild, onset_severe_or_critical = apply_symptom_choice(
+            self.infectious_symptom_state[index], choice)
+        self.infectious_symptom_state[index] = new_symptom
+        self._timer_since_beginning_of_last_onset_of_mild_symptom[index[onset_mild]] = 0
+        self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom[index[onset_severe_or_critical]] = 0
+
+    def try_change_recovered_complication_state(self):
+        index = np.flatnonzero(self.disease_health_state == RECOVERED)
+        # Rows in complication code order, see `HostPopulation.try_change_recovered_complication_state()`
+        to_state = np.array([[MILD_COMPLICATION, SEVERE_COMPLICATION], [NO_COMPLICATION, SEVERE_COMPLICATION],
+                             [NO_COMPLICATION, MILD_COMPLICATION]])
+        to_prob = np.array([
+            [self.model.prob_recovered_no_to_mild_complication, self.model.prob_recovered_no_to_severe_complication],
+            [self.model.prob_recovered_mild_to_no_complication, self.model.prob_recovered_mild_to_severe_complication],
+            [self.model.prob_recovered_severe_to_no_complication, self.model.prob_recovered_severe_to_mild_complication]])
+        index, choice = self.choose('change_recovered_complication', index,
+                                    np.cumsum(to_prob[self.recovered_complication_state[index]], axis=1))
+        moved = choice < 2
+        complication = self.recovered_complication_state[index[moved]]
+        self.recovered_complication_state[index[moved]] = to_state[complication, choice[moved]]
+
+    def merge(self):
+        '''Drop the values no transition reads any more and merge the rows that end up equal.'''
+        # The infection timer restarts on the next infection, the severe onset timer is kept for it as by `HostAgent`,
+        # and the mild onset timer is never read
+        settled = (self.disease_health_state == RECOVERED) | (self.disease_health_state == DEAD)
+        self._timer_since_beginning_of_last_infection[settled] = 0
+        self._timer_since_beginning_of_last_onset_of_mild_symptom[:] = NONE_STATE
+        self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom[
+            self.disease_health_state == DEAD] = NONE_STATE
+        self.time_last_tested[self.time - self.time_last_tested >= self.model.testing._min_days_between_two_tests] = \
+            NONE_STATE
+
+        # Columns packed into one integer key while their value ranges allow it
+        columns = [getattr(self, column).astype(np.int64) for column in COMPARTMENT_COLUMNS]
+        low = [values.min(initial=0) for values in columns]
+        radix = [values.max(initial=0) - values_low + 1 for values, values_low in zip(columns, low)]
+        if np.prod(np.array(radix, dtype=np.float64)) < 2**62:
+            key = np.zeros(self.count.size, dtype=np.int64)
+            for values, values_low, values_radix in zip(columns, low, radix):
+                key = key * values_radix + (values - values_low)
+            _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+        else:
+            _, first, inverse = np.unique(np.stack(columns, axis=1), axis=0, return_index=True, return_inverse=True)
+        count = np.bincount(inverse, weights=self.count).astype(np.int64)
+        keep = count > 0
+        for column in COMPARTMENT_COLUMNS:
+            setattr(self, column, getattr(self, column)[first[keep]])
+        self.count = count[keep]
+        self.infectious_index = np.empty(0, dtype=np.int64)
+        self.prob = {}
+        self.prob_position = np.full(self.count.size, -1, dtype=np.int64)
+
+    def step(self):
+        super().step()
+        self.merge()
+
+    def to_population(self):
+        '''`self.population` with the compartments handed back to its hosts. Within a stratum, hosts are matched to
+        the compartments in the order of `DISEASE_RANK` of their state when they left and of the compartment, so the
+        hosts still alive or susceptible mostly stay so, at random otherwise.'''
+        population = self.population
+        host_order = np.lexsort((self.rng.random(population.num_hosts),
+                                 DISEASE_RANK[population.disease_health_state], self.host_stratum))
+        row_order = np.lexsort((DISEASE_RANK[self.disease_health_state], self.stratum))
+        row_of_host = np.repeat(row_order, self.count[row_order])
+        for column in STATE_COLUMNS:
+            getattr(population, column)[host_order] = getattr(self, column)[row_of_host]
+        population.steps = self.steps
+        population.time = self.time
+        return population
+
+    ### Class helper functions ###
+    def get_agent_count(self):
+        return self.num_hosts
+
+    def count_state(self, attribute, state, exclude_dead=False):
+        value = state.value if isinstance(state, Enum) else state
+        match = getattr(self, attribute) == value
+        if exclude_dead:
+            match &= self.disease_health_state != DEAD
+        return self.count_mask(match)
+
+    def count_state_test_confirmed(self, state):
+        return self.count_mask((self.disease_health_state == state.value) & (
+            self.test_result_on_disease_health_state == TestResultState.TP.value))
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+from ..model.network import HostNetwork
+from ..model.population import HostPopulation
+from ..model.partition import MODEL_COUNTERS, RESOURCE_COUNTERS, RESOURCE_FLAGS, RESOURCE_AVAILABLE
+from ..helper.graph import ReplicatedAdjacency
+
+class ReplicateAttributes():
+    '''Stands in for the same object of every replicate. Attributes named in `per_replicate` are read as an array over
+    the replicates and written back one entry per replicate, other attributes are read from the first replicate.'''
+    def __init__(self, objects, per_replicate, **shared):
+        self.__dict__.update(shared)
+        self.__dict__['_objects'] = objects
+        self.__dict__['_per_replicate'] = set(per_replicate)
+
+    def __getattr__(self, name):
+        if name in self._per_replicate:
+            return np.array([getattr(replicate, name) for replicate in self._objects])
+        return getattr(self._objects[0], name)
+
+    def __setattr__(self, name, value):
+        values = np.broadcast_to(value, len(self._objects))
+        for replicate, replicate_value in zip(self._objects, values):
+            setattr(replicate, name, replicate_value.item())
+
+class EnsemblePopulation(HostPopulation):
+    '''`HostPopulation` arrays of the replicates of one vectorized `HostNetwork`, stepped at once as a population of
+    `num_replicates*num_hosts_per_replicate` hosts on a `ReplicatedAdjacency`.
+
+    Host `i` of replicate `k` is host `k*num_hosts_per_replicate + i`, so the hosts of a replicate are a contiguous
+    slice of every array. Each replicate draws from its own `CounterBasedRandom`, and keeps its own counters and
+    clinical resources, read and written through `ReplicateAttributes`. Replicate `k` therefore runs as its
+    `HostNetwork` would on its own with push transmission.'''
+    def __init__(self, models):
+        populations = [model.population for model in models]
+        num_hosts = populations[0].num_hosts
+        for name, value in vars(populations[0]).items():
+            if isinstance(value, np.ndarray) and (value.shape[:1] == (num_hosts,)):
+                value = np.concatenate([getattr(population, name) for population in populations])
+            setattr(self, name, value)
+
+        self.num_replicates = len(models)
+        self.num_hosts_per_replicate = num_hosts
+        self.num_hosts = num_hosts * self.num_replicates
+        self.all_hosts = np.arange(self.num_hosts)
+        self.adjacency = ReplicatedAdjacency(models[0].adjacency, self.num_replicates)
+        self.counter_randoms = [model.counter_random for model in models]
+
+        resource_attributes = RESOURCE_COUNTERS + RESOURCE_FLAGS + [total for total, _ in RESOURCE_AVAILABLE.values()]
+        self.model = ReplicateAttributes(models, MODEL_COUNTERS, clinical_resource=ReplicateAttributes(
+            [model.clinical_resource for model in models], resource_attributes))
+        self.replicates = [ReplicatePopulation(self, replicate) for replicate in range(self.num_replicates)]
+
+    def draw_uniform(self, purpose, index):
+        '''Uniforms for the hosts (or edge positions) in `index`, each from the stream of its replicate.'''
+        index = np.asarray(index, dtype=np.int64)
+        replicate, local_index = np.divmod(index, self.counter_randoms[0].block_size(purpose))
+        random_num = np.empty(index.shape)
+        for r, counter_random in enumerate(self.counter_randoms):
+            in_replicate = replicate == r
+            random_num[in_replicate] = counter_random.uniforms_at(self.time, purpose, local_index[in_replicate])
+        return random_num
+
+    def count_hosts(self, index):
+        return np.bincount(np.asarray(index) // self.num_hosts_per_replicate, minlength=self.num_replicates)
+
+    def count_mask(self, mask):
+        return np.count_nonzero(mask.reshape(self.num_replicates, -1), axis=1)
+
+    def check_pull_direction(self, spreader, candidate):
+        '''Push only, the direction would be picked for all replicates at once.'''
+        return False
+
+    def try_infect_neighbors(self):
+        source, target = self.take_infections(*self.find_infections())
+        new_infections = self.count_hosts(target)
+        spreaders = self.count_hosts(np.unique(source))
+        for replicate in np.flatnonzero(new_infections):
+            self.replicates[replicate].new_infection_tracker[self.time] = [int(spreaders[replicate]),
+                                                                           int(new_infections[replicate])]
+
+    def allocate(self, candidates, available, purpose):
+        '''Hand out `available[k]` units to the candidates of replicate `k`, in random order within each replicate.'''
+        keys = self.draw_uniform(purpose, candidates)
+        replicate = candidates // self.num_hosts_per_replicate
+        order = np.lexsort((keys, replicate))
+        candidates, replicate = candidates[order], replicate[order]
+        rank = np.arange(candidates.size) - np.searchsorted(replicate, replicate)
+        return candidates[rank < np.maximum(np.asarray(available, dtype=np.int64), 0)[replicate]]
+
+class ReplicatePopulation(HostPopulation):
+    '''One replicate of an `EnsemblePopulation`, as the `population` of its `HostNetwork` for the reporters. Host
+    arrays are read as the replicate's slice of the ensemble arrays.'''
+    def __init__(self, ensemble, replicate):
+        self.ensemble = ensemble
+        self.num_hosts = ensemble.num_hosts_per_replicate
+        self.rows = slice(replicate * self.num_hosts, (replicate + 1) * self.num_hosts)
+        self.new_infection_tracker = {}
+
+    def __getattr__(self, name):
+        if name == 'ensemble':
+            raise AttributeError(name)
+        value = getattr(self.ensemble, name)
+        if isinstance(value, np.ndarray) and (value.shape[:1] == (self.ensemble.num_hosts,)):
+            return value[self.rows]
+        return value
+
+    def step(self):
+        raise ValueError('Replicates of a `HostNetworkEnsemble` are stepped together by `HostNetworkEnsemble.step()`.')
+
+class HostNetworkEnsemble():
+    '''`num_replicates` runs of a vectorized `HostNetwork` with the same parameters and contact graph, advanced
+    together by one `EnsemblePopulation`. Replicate `k` is the `HostNetwork` in `models[k]`, with run seed
+    `seeds[k]` (a random run seed if `seeds` is not given), its own counters and its own `DataCollector`. The graph
+    is drawn once and shared by all replicates.'''
+    def __init__(self, num_replicates, seeds=None, **network_kwargs):
+        seeds = list(seeds) if seeds is not None else [None] * num_replicates
+        assert len(seeds) == num_replicates, 'ValueError: `seeds` must have one run seed per replicate.'
+        network_kwargs['engine'] = 'vectorized'
+
+        self.models = []
+        for seed in seeds:
+            adjacency = self.models[0].adjacency if self.models else None
+            self.models.append(HostNetwork(seed=seed, adjacency=adjacency, **network_kwargs))
+        assert self.models[0].counter_random is not None, \
+            'ValueError: `HostNetworkEnsemble` needs `_use_counter_based_random` to give each replicate its own stream.'
+        assert self.models[0]._num_partitions == 1, \
+            'ValueError: `HostNetworkEnsemble` steps the replicates in one process, `_num_partitions` must be 1.'
+        assert self.models[0]._hybrid_prevalence_threshold is None, \
+            'ValueError: `HostNetworkEnsemble` steps every replicate as individual hosts.'
+
+        self.population = EnsemblePopulation(self.models)
+        for model, replicate in zip(self.models, self.population.replicates):
+            model.population = model.schedule = replicate
+            model.host_attributes = None # Held by the ensemble arrays
+
+    def step(self):
+        for model in self.models:
+            model._current_timer += 1
+            model.validate_probability_today = model.check_validation_day()
+        self.population.step()
+        for model in self.models:
+            model.datacollector.collect(model)
+
+    def run_model(self, n):
+        for i in range(n):
+            self.step()
+
+    def get_model_vars_dataframe(self):
+        '''Reporter values of all replicates, indexed by replicate and step.'''
+        return pd.concat([model.datacollector.get_model_vars_dataframe() for model in self.models],
+                         keys=range(len(self.models)), names=['Replicate', 'Step'])
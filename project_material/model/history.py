@@ -0,0 +1,65 @@
+from array import array
+from ..model.population import NONE_STATE
+
+class HostHistory():
+    '''Time units each host spent in a tracked state, stored by `HostNetwork` for all `HostAgent` at once.
+
+    A host's days in a track are kept as run-length intervals. The open interval of every host sits in two arrays
+    indexed by host id. An interval is appended to the closed log of its track only when a gap ends it. The total
+    and last day of each host are O(1) lookups, and the full list of days is only rebuilt on request. `test_confirmed`
+    flags the hosts already counted as test-confirmed infectious.'''
+    tracks = ['being_susceptible', 'being_infectious', 'being_recovered', 'being_dead', 'when_tested',
+              'when_successfully_gaining_immunity_from_vaccine', 'when_symptoms_are_severe_or_critical',
+              'using_hospital_bed', 'using_icu_bed', 'using_ventilator', 'using_drugX']
+
+    def __init__(self, num_hosts):
+        self.num_hosts = num_hosts
+        self._open_start = {track: array('i', [NONE_STATE]) * num_hosts for track in self.tracks}
+        self._open_end = {track: array('i', [NONE_STATE]) * num_hosts for track in self.tracks}
+        self._closed_days = {track: array('i', [0]) * num_hosts for track in self.tracks}
+        self._closed_intervals = {track: array('i') for track in self.tracks} # Flat (host, start, end) triples
+        self.test_confirmed = bytearray(num_hosts)
+
+    def record(self, track, host, time):
+        '''Add time unit `time` to the track of `host`, time units are recorded in increasing order.'''
+        open_start = self._open_start[track]
+        open_end = self._open_end[track]
+        end = open_end[host]
+        if end == NONE_STATE:
+            open_start[host] = time
+            open_end[host] = time
+        elif end == time - 1:
+            open_end[host] = time
+        elif end != time:
+            start = open_start[host]
+            self._closed_intervals[track].extend((host, start, end))
+            self._closed_days[track][host] += end - start + 1
+            open_start[host] = time
+            open_end[host] = time
+
+    def count(self, track, host):
+        '''Number of time units recorded for `host`.'''
+        end = self._open_end[track][host]
+        open_days = end - self._open_start[track][host] + 1 if end != NONE_STATE else 0
+        return self._closed_days[track][host] + open_days
+
+    def last(self, track, host):
+        '''Latest time unit recorded for `host`, `None` if there is none.'''
+        end = self._open_end[track][host]
+        return end if end != NONE_STATE else None
+
+    def check_if_occurred_in_last_n_time_unit(self, track, host, last_n_time_unit, current_time):
+        last = self.last(track, host)
+        return (last is not None) and (current_time - last_n_time_unit < last <= current_time)
+
+    def time_units(self, track, host):
+        '''All time units recorded for `host`, in increasing order.'''
+        result = []
+        closed = self._closed_intervals[track]
+        for i in range(0, len(closed), 3):
+            if closed[i] == host:
+                result.extend(range(closed[i+1], closed[i+2] + 1))
+        end = self._open_end[track][host]
+        if end != NONE_STATE:
+            result.extend(range(self._open_start[track][host], end + 1))
+        return result
@@ -1,5 +1,4 @@
 from typing import List
-import random
 from mesa import Agent
 from ..model.state import DiseaseHealthState, VaccineImmunityState, InfectiousSymptomState, TestResultState
 
@@ -52,7 +51,7 @@ class Vaccine(Agent):
 
     def check_suitability(self):
         true_holder = False
-        random_num = random.uniform(0, 1)
+        random_num = self.agent.draw_uniform('vaccine_suitability')
         if self.on_switch:
             if ((self.agent.disease_health_state is not DiseaseHealthState.DEAD) & (
                     self.agent.disease_health_state is not DiseaseHealthState.INFECTIOUS)):
@@ -64,7 +63,8 @@ class Vaccine(Agent):
 
     def assign_immune_state(self):
         self.agent.vaccine_immunity_state = VaccineImmunityState.WITH_IMMUNITY
-        self.agent.time_units_when_successfully_gaining_immunity_from_vaccine.append(self.current_time)
+        self.agent.model.history.record('when_successfully_gaining_immunity_from_vaccine', self.agent.unique_id,
+                                        self.current_time)
 
 class Testing(Agent):
     def __init__(self, unique_id, model, agent,
@@ -101,6 +101,12 @@ class Testing(Agent):
         last_n_time_list = [t for t in range(current_time, current_time-last_n_time_unit, -1)]
         return any(i in occurrence for i in last_n_time_list)
 
+    def check_if_tested_in_last_n_time_unit(self, last_n_time_unit: int, current_time: int):
+        '''Same as `check_if_occurred_in_last_n_time_unit()` on the test days of `self.agent`, from the last test day
+        kept in `model.history`.'''
+        return self.agent.model.history.check_if_occurred_in_last_n_time_unit(
+            'when_tested', self.agent.unique_id, last_n_time_unit, current_time)
+
     def check_timing(self):
         true_holder = False
         if self.on_switch:
@@ -112,7 +118,7 @@ class Testing(Agent):
 
     def check_suitability(self):
         true_holder = False
-        random_num = random.uniform(0, 1)
+        random_num = self.agent.draw_uniform('testing_suitability')
 
         if self.on_switch:
             if ((self.agent.disease_health_state is DiseaseHealthState.SUSCEPTIBLE) |
@@ -120,8 +126,7 @@ class Testing(Agent):
                 ((self.agent.disease_health_state is DiseaseHealthState.INFECTIOUS) &
                 (self.agent.infectious_symptom_state is InfectiousSymptomState.NO_SYMPTOM))):
                 if random_num < self.prob_tested_for_no_symptom[self._list_slot_counter]:
-                    if self.check_if_occurred_in_last_n_time_unit(
-                            occurrence=self.agent.time_units_when_tested,
+                    if self.check_if_tested_in_last_n_time_unit(
                             last_n_time_unit=self._min_days_between_two_tests,
                             current_time=self.current_time,
                     ) == False:
@@ -129,8 +134,7 @@ class Testing(Agent):
             elif ((self.agent.disease_health_state is DiseaseHealthState.INFECTIOUS) &
                 (self.agent.infectious_symptom_state is InfectiousSymptomState.MILD_SYMPTOM)):
                 if random_num < self.prob_tested_for_mild_symptom[self._list_slot_counter]:
-                    if self.check_if_occurred_in_last_n_time_unit(
-                            occurrence=self.agent.time_units_when_tested,
+                    if self.check_if_tested_in_last_n_time_unit(
                             last_n_time_unit=self._min_days_between_two_tests,
                             current_time=self.current_time,
                     ) == False:
@@ -138,8 +142,7 @@ class Testing(Agent):
             elif ((self.agent.disease_health_state is DiseaseHealthState.INFECTIOUS) &
                 (self.agent.infectious_symptom_state is InfectiousSymptomState.SEVERE_SYMPTOM)):
                 if random_num < self.prob_tested_for_severe_symptom[self._list_slot_counter]:
-                    if self.check_if_occurred_in_last_n_time_unit(
-                            occurrence=self.agent.time_units_when_tested,
+                    if self.check_if_tested_in_last_n_time_unit(
                             last_n_time_unit=self._min_days_between_two_tests,
                             current_time=self.current_time,
                     ) == False:
@@ -147,8 +150,7 @@ class Testing(Agent):
             elif ((self.agent.disease_health_state is DiseaseHealthState.INFECTIOUS) &
                 (self.agent.infectious_symptom_state is InfectiousSymptomState.CRITICAL_SYMPTOM)):
                 if random_num < self.prob_tested_for_critical_symptom[self._list_slot_counter]:
-                    if self.check_if_occurred_in_last_n_time_unit(
-                            occurrence=self.agent.time_units_when_tested,
+                    if self.check_if_tested_in_last_n_time_unit(
                             last_n_time_unit=self._min_days_between_two_tests,
                             current_time=self.current_time,
                     ) == False:
@@ -156,11 +158,11 @@ class Testing(Agent):
             return true_holder
 
     def assign_test_result_if_applicable(self):
-        random_num = random.uniform(0, 1)
+        random_num = self.agent.draw_uniform('test_result')
 
         if self.check_timing():
             if self.check_suitability():
-                self.agent.time_units_when_tested.append(self.current_time)
+                self.agent.model.history.record('when_tested', self.agent.unique_id, self.current_time)
                 self.agent.new_test_done_over_current_time_unit = 1
                 self.agent.model.cumulative_test_done += 1
 
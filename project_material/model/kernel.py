@@ -0,0 +1,91 @@
+import math
+import numpy as np
+from ..model.state import InfectiousSymptomState
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+
+MILD_SYMPTOM = InfectiousSymptomState.MILD_SYMPTOM.value
+SEVERE_SYMPTOM = InfectiousSymptomState.SEVERE_SYMPTOM.value
+
+def compile_kernel(function):
+    '''`function` compiled by numba, or left as Python when numba is not installed. Callers only pick the kernels
+    when `NUMBA_AVAILABLE` is true and keep their NumPy version otherwise, since these loops are slow in Python.'''
+    return numba.njit(cache=True)(function) if NUMBA_AVAILABLE else function
+
+@compile_kernel
+def symptom_transition_kernel(symptom, moves, random_num, sampling_order, new_symptom, onset_mild,
+                              onset_severe_or_critical):
+    '''Loop form of `sample_symptom_transitions()`. `moves` holds the 12 probability arrays of
+    `SYMPTOM_TRANSITION_ATTRIBUTES` row by row, and the three outputs are filled in place.'''
+    for i in range(symptom.size):
+        state = symptom[i]
+        cumulative = 0.0
+        choice = 3
+        for j in range(3):
+            cumulative += moves[3*state + j][i]
+            if random_num[i] < cumulative:
+                choice = j
+                break
+        new_state = sampling_order[state, choice]
+        new_symptom[i] = new_state
+        changed = new_state != state
+        onset_mild[i] = changed and (new_state == MILD_SYMPTOM)
+        onset_severe_or_critical[i] = changed and (state < SEVERE_SYMPTOM) and (new_state >= SEVERE_SYMPTOM)
+
+@compile_kernel
+def rescale_transition_kernel(prob_a, prob_b, prob_c, maintained, rescale):
+    '''Loop form of one row of `HostPopulation.final_probability_update()`: probabilities of the three moves out of a
+    state that sum over 1 are divided by their sum in place. Fills `maintained` and the mask `rescale`, returns the
+    number rescaled.'''
+    count = 0
+    for i in range(prob_a.size):
+        total = prob_a[i] + prob_b[i] + prob_c[i]
+        rescale[i] = 1 - total < 0
+        if rescale[i]:
+            count += 1
+            maintained[i] = 0.0
+            prob_a[i] = prob_a[i] / total
+            prob_b[i] = prob_b[i] / total
+            prob_c[i] = prob_c[i] / total
+        else:
+            maintained[i] = 1 - total
+    return count
+
+@compile_kernel
+def complication_transition_kernel(complication, random_num, to_state, to_prob, new_complication):
+    '''Loop form of `HostPopulation.try_change_recovered_complication_state()`. Row `c` of `to_state` and `to_prob`
+    lists the two moves out of complication code `c` in sampling order.'''
+    for i in range(complication.size):
+        state = complication[i]
+        new_complication[i] = state
+        if state < 0:
+            continue
+        lower = 0.0
+        for j in range(2):
+            upper = lower + to_prob[state, j]
+            if (random_num[i] >= lower) and (random_num[i] < upper):
+                new_complication[i] = to_state[state, j]
+            lower = upper
+
+@compile_kernel
+def transmission_hit_kernel(group_start, count, random_num, prob, hit):
+    '''Loop form of `HostPopulation.draw_transmission_hits()` over groups of exposed edges: draw `r` of a group moves
+    past the gap to its next infected edge, until the end of the group.'''
+    for group in range(group_start.size):
+        start = group_start[group]
+        size = count[group]
+        log_miss = math.log1p(-prob[start]) if prob[start] < 1 else -np.inf
+        index = -1
+        draw = 0
+        while True:
+            gap = math.floor(min(math.log1p(-random_num[start + draw]) / log_miss, size)) if log_miss < 0 else size
+            index += 1 + gap
+            if index >= size:
+                break
+            hit[start + index] = True
+            draw += 1
@@ -1,13 +1,15 @@
 import itertools
+import operator
 import random
 import math
+import numpy as np
 import networkx as nx
 from mesa import Model
 from mesa.time import RandomActivation
 from mesa.datacollection import DataCollector
 from mesa.space import NetworkGrid
 
-from ..model.state import DiseaseHealthState, InfectiousSymptomState, RecoveredImmunityState, number_susceptible, number_infectious, \
+from ..model.state import StateCounter, DiseaseHealthState, InfectiousSymptomState, RecoveredImmunityState, number_susceptible, number_infectious, \
     number_recovered, number_disease_health_state, number_dead, number_infectious_no_symptom, number_infectious_mild_symptom, \
     number_infectious_severe_symptom, number_infectious_critical_symptom, number_recovered_no_complication, number_recovered_mild_complication, \
     number_recovered_severe_complication, number_infectious_using_hospital_bed, number_infectious_using_icu_bed, \
@@ -16,11 +18,21 @@ from ..model.state import DiseaseHealthState, InfectiousSymptomState, RecoveredI
 from ..helper.generic import mean_r0, return_time, return_total_n, cumulative_total_infectious, cumulative_total_dead, \
     cumulative_total_test_done, rate_cumulative_infectious, rate_cumulative_dead, rate_cumulative_infectious_test_confirmed, \
     rate_cumulative_dead_test_confirmed, rate_cumulative_test_done, cumulative_total_infectious_test_confirmed, \
-    cumulative_total_dead_test_confirmed
-from ..model.agent import HostAgent
+    cumulative_total_dead_test_confirmed, probability_memo_hits, probability_memo_misses, probability_rescale_count
+from ..model.agent import HostAgent, CompactHostAgent, HostAgentScratch, get_daily_probabilities
+from ..model.population import HostPopulation
+from ..model.partition import PartitionedPopulation
+from ..model.compartment import CompartmentPopulation
+from ..model.schedule import ActiveSetActivation, SynchronousActivation
+from ..model.cohort import CohortLayer
+from ..model.history import HostHistory
+from ..model.symptom import SYMPTOM_TRANSITION_ATTRIBUTES, sample_symptom_transitions
 from ..model.clinical_resource import ClinicalResource
+from ..model.kernel import NUMBA_AVAILABLE
 from ..model.intervention import SocialDistancing, Vaccine, Testing
 from ..helper.time_distribution import GammaProbabilityGenerator
+from ..helper.graph import erdos_renyi_edges, CSRAdjacency
+from ..helper.probability import RandomBlock, CounterBasedRandom, ProbabilityMemo, host_attribute_arrays
 
 class HostNetwork(Model):
     # id generator to track run number in batch run data
@@ -123,6 +135,23 @@ class HostNetwork(Model):
 
                     drugX_capacity_as_percent_of_population,
                     drugX_cost_per_day,
+
+                    modifier_from_hypertension=0.05,
+                    modifier_from_diabetes=0.05,
+                    modifier_from_ihd=0.05,
+                    modifier_from_asthma=0.05,
+                    modifier_from_cancer=0.05,
+                    modifier_from_old_age=0.05,
+                    modifier_from_severe_symptom=0.05,
+                    modifier_from_critical_symptom=0.05,
+                    modifier_from_critical_symptom_extra=0.05/2,
+                    modifier_from_absence_of_adequate_care=0.05,
+
+                    engine='agent',
+                    seed=None,
+                    adjacency=None,
+                    validation_level='full',
+                    validation_sample_rate=0.05,
                  ):
 
         self.uid = next(self.id_gen)
@@ -131,15 +160,85 @@ class HostNetwork(Model):
 
         self._current_timer = 0
         self._last_n_time_unit_for_mean_r0 = 10 # SETTING: Smoothing mean R0
+        self._max_steps_for_probability_table = 999 # Setting: Gamma probabilities are tabulated for days 0 to this
+        self._use_csr_adjacency = True # Setting: Transmission reads the contact graph from CSR arrays instead of `self.G`
+        self._use_geometric_skip_transmission = True # Setting: Draw the gaps between infected neighbors instead of one uniform per neighbor
+        self._transmission_direction = 'auto' # Setting: Vectorized engine, 'push' from the spreaders, 'pull' from the candidates, 'auto' for the side with fewer edges each day, same results in all three
+        self._num_partitions = 1 # Setting: Vectorized engine, steps parts of the contact graph in this many worker processes, see `PartitionedPopulation`
+        self._hybrid_prevalence_threshold = None # Setting: Vectorized engine, hosts are stepped as `CompartmentPopulation` counts while the infectious exceed this fraction of the living hosts, None to stay individual
+        self._hybrid_switch_back_ratio = 0.5 # Setting: Back to individual hosts once the infectious fall under this ratio of `_hybrid_prevalence_threshold`
+        self._sort_neighbors_by_weight = True # Setting: CSR rows sorted by edge weight, edges over a threshold found by binary search
+        self._use_active_set_scheduler = True # Setting: Only step agents that can change state, see `ActiveSetActivation`
+        self._use_synchronous_update = False # Setting: Agent engine, agents read today's states and write tomorrow's, see `SynchronousActivation`
+        self._use_complication_event_queue = True # Setting: Recovered complication changes are drawn as geometric waiting times
+        self._use_numpy_random_block = True # Setting: Agents draw from `RandomBlock` instead of the Python `random` module
+        self._use_counter_based_random = True # Setting: Draws keyed on (run seed, time unit, purpose, host), see `CounterBasedRandom`
+        self._use_state_counter = True # Setting: Reporters read counts kept by `StateCounter` instead of scanning agents
+        self._cross_check_state_counter = False # Setting: Debug, compare `StateCounter` with a full scan every step
+        self._use_compact_host_agent = True # Setting: Agents are `CompactHostAgent`, with slots and integer state codes
+        self._use_cohort_layer = False # Setting: Agent engine, susceptible hosts are counts per attribute signature until an event reaches them, see `CohortLayer`
+        self._probability_memo_size = 4096 # Setting: Daily probabilities kept in `ProbabilityMemo`, 0 to rebuild them for every agent
+        self._use_numba_kernels = NUMBA_AVAILABLE # Setting: Run the loops of `kernel.py` compiled by numba, only when numba is installed
+        self._use_symptom_kernel_prepass = False # Setting: Sample symptom changes of all infectious agents at once, see `presample_symptom_transitions()`
+        assert validation_level in ['full', 'sampled', 'off'], \
+            'ValueError: `validation_level` must be one of \'full\', \'sampled\' or \'off\'.'
+        assert 0 <= validation_sample_rate <= 1, 'ValueError: `validation_sample_rate` must be between 0 and 1.'
+        self.validation_level = validation_level # 'full' validates the daily probabilities every day, 'sampled' on a random fraction of days, 'off' never
+        self._validation_sample_rate = validation_sample_rate # Fraction of days validated when `validation_level` is 'sampled'
+        self.engine = engine # 'agent' for one `HostAgent` per node, 'vectorized' for the `HostPopulation` arrays
+        self.random_stream = RandomBlock(np.random.default_rng(self.random.getrandbits(64))) if \
+            self._use_numpy_random_block else self.random
         self.num_nodes = num_nodes
+
+        # `seed` also seeds `self.random` through `mesa.Model`, a run without it still gets a run seed
+        self.run_seed = seed if seed is not None else self.random.getrandbits(64)
+        self.validation_random = random.Random(self.run_seed) # Own stream, sampling validation days draws nothing else
+        self.validate_probability_today = True
+        if self._use_counter_based_random:
+            assert self._use_csr_adjacency or (engine == 'vectorized'), \
+                'ValueError: `_use_counter_based_random` keys transmission draws on the edge positions of `self.adjacency`.'
+            self.counter_random = CounterBasedRandom(self.run_seed, num_hosts=self.num_nodes, num_edge_positions=None)
+            self.host_attributes = host_attribute_arrays(self.num_nodes,
+                                                         self.counter_random.generator(0, 'static_attributes'))
+        else:
+            self.counter_random = None
+            self.host_attributes = None
+
         self.avg_node_degree = avg_node_degree
         prob = self.avg_node_degree / self.num_nodes
-        self.G = nx.erdos_renyi_graph(n=self.num_nodes, p=prob, seed=self.set_network_seed)
-        self.grid = NetworkGrid(self.G)
-        self.schedule = RandomActivation(self)
+        assert (adjacency is None) or (engine == 'vectorized'), 'ValueError: `adjacency` is only read by the vectorized engine.'
+        if self.engine == 'agent':
+            self.G = nx.erdos_renyi_graph(n=self.num_nodes, p=prob, seed=self.set_network_seed)
+            self.grid = NetworkGrid(self.G)
+            if self._use_synchronous_update:
+                self._use_active_set_scheduler = False # Every agent is stepped on every day
+                self.schedule = SynchronousActivation(self)
+            else:
+                if self.counter_random is None:
+                    self._use_active_set_scheduler = False # `ActiveSetActivation` reads the keyed intervention draws
+                self.schedule = ActiveSetActivation(self) if self._use_active_set_scheduler else RandomActivation(self)
+            if self._use_cohort_layer:
+                assert self._use_active_set_scheduler and self._use_csr_adjacency and \
+                    (self.counter_random is not None), 'ValueError: `_use_cohort_layer` needs ' \
+                    '`_use_active_set_scheduler`, `_use_csr_adjacency` and `_use_counter_based_random`.'
+        elif self.engine == 'vectorized':
+            self.G = None
+            self.grid = None
+            if self._num_partitions > 1:
+                self._transmission_direction = 'push' # Parts only read the rows of the spreaders they own, same results as 'auto'
+            assert (self._hybrid_prevalence_threshold is None) or (self._num_partitions == 1), \
+                'ValueError: `_hybrid_prevalence_threshold` needs `_num_partitions` to be 1.'
+        else:
+            raise ValueError('Wrong input for `engine` parameter.')
+        assert (self._hybrid_prevalence_threshold is None) or (self.engine == 'vectorized'), \
+            'ValueError: `_hybrid_prevalence_threshold` is only read by the vectorized engine.'
+        self.hybrid_switches = [] # (time unit, 'aggregate' or 'individual') of each switch of the hybrid mode
         self.initial_outbreak_size = initial_outbreak_size if initial_outbreak_size <= num_nodes else num_nodes
         self.all_agents_new_infection_tracker = {}
-        self.all_agents_new_tested_as_true_positive = []
+        self.complication_event_queue = [] # Heap of (time unit, agent unique_id) for recovered complication changes
+        self.symptom_transitions = None # Agent unique_id: next symptom state and onsets, for the changes of the day
+        self.prepared_probabilities = None # Agent unique_id: daily probabilities built before its step, see `presample_symptom_transitions()`
+        self.probability_rescale_count = 0 # Daily probability sets whose symptom transitions were rescaled to sum to 1
 
         self.cumulative_infectious_cases = self.initial_outbreak_size
         self.cumulative_dead_cases = 0
@@ -323,6 +422,17 @@ class HostNetwork(Model):
             magnitude_multiplier = self.prob_infectious_critical_to_severe_symptom_gamma_magnitude_multiplier,
         )
 
+        # Evaluate each gamma distribution once, timers then look up their probability by day
+        for dist in [self.prob_spread_virus_dist, self.prob_recover_dist, self.prob_virus_kill_host_dist,
+                     self.prob_infectious_no_to_mild_symptom_dist, self.prob_infectious_no_to_severe_symptom_dist,
+                     self.prob_infectious_no_to_critical_symptom_dist, self.prob_infectious_mild_to_no_symptom_dist,
+                     self.prob_infectious_mild_to_severe_symptom_dist, self.prob_infectious_mild_to_critical_symptom_dist,
+                     self.prob_infectious_severe_to_no_symptom_dist, self.prob_infectious_severe_to_mild_symptom_dist,
+                     self.prob_infectious_severe_to_critical_symptom_dist,
+                     self.prob_infectious_critical_to_no_symptom_dist, self.prob_infectious_critical_to_mild_symptom_dist,
+                     self.prob_infectious_critical_to_severe_symptom_dist]:
+            dist.tabulate(self._max_steps_for_probability_table)
+
         self.prob_recovered_no_to_mild_complication = prob_recovered_no_to_mild_complication
         self.prob_recovered_no_to_severe_complication = prob_recovered_no_to_severe_complication
         self.prob_recovered_mild_to_no_complication = prob_recovered_mild_to_no_complication
@@ -331,6 +441,18 @@ class HostNetwork(Model):
         self.prob_recovered_severe_to_mild_complication = prob_recovered_severe_to_mild_complication
         self.prob_gain_immunity = prob_gain_immunity
 
+        # Multipliers of the recover, death and symptom onset probabilities, e.g. (1-modifier) on `prob_recover`
+        self.modifier_from_hypertension = modifier_from_hypertension
+        self.modifier_from_diabetes = modifier_from_diabetes
+        self.modifier_from_ihd = modifier_from_ihd
+        self.modifier_from_asthma = modifier_from_asthma
+        self.modifier_from_cancer = modifier_from_cancer
+        self.modifier_from_old_age = modifier_from_old_age
+        self.modifier_from_severe_symptom = modifier_from_severe_symptom
+        self.modifier_from_critical_symptom = modifier_from_critical_symptom
+        self.modifier_from_critical_symptom_extra = modifier_from_critical_symptom_extra
+        self.modifier_from_absence_of_adequate_care = modifier_from_absence_of_adequate_care
+
         self.hospital_bed_capacity_as_percent_of_population = hospital_bed_capacity_as_percent_of_population
         self.hospital_bed_cost_per_day = hospital_bed_cost_per_day
         self.hospital_bed_current_load = 0
@@ -410,45 +532,123 @@ class HostNetwork(Model):
                                 'Recovered-severe complication': number_recovered_severe_complication,
                                 'Recovered using DrugX': number_recovered_using_drugX,
                                 'Mean R0': mean_r0,
+                                'Probability memo hits': probability_memo_hits,
+                                'Probability memo misses': probability_memo_misses,
+                                'Probability rescale count': probability_rescale_count,
         }
         self.datacollector = DataCollector(model_reporters=self.model_reporters_dict)
 
-        # Create agents
-        for i, node in enumerate(self.G.nodes()):
-            agent = HostAgent(i, self, DiseaseHealthState.SUSCEPTIBLE, RecoveredImmunityState.TBD,
-                                self.prob_recovered_no_to_mild_complication,
-                                self.prob_recovered_no_to_severe_complication,
-                                self.prob_recovered_mild_to_no_complication,
-                                self.prob_recovered_mild_to_severe_complication,
-                                self.prob_recovered_severe_to_no_complication,
-                                self.prob_recovered_severe_to_mild_complication,
-                                self.prob_gain_immunity,
-                                self.clinical_resource, self.social_distancing,
-                                self.vaccine, self.testing,
-                              )
-            self.schedule.add(agent)
-            # Add the agent to the node
-            self.grid.place_agent(agent, node)
-
-        # Assign random weights (float: 0 to 1) to each connection
-        for u, v in self.G.edges():
-            self.G[u][v]['weight'] = random.random()
+        if self.engine == 'vectorized':
+            # Create the population arrays, the graph is drawn straight into CSR arrays with random weights (float: 0 to 1)
+            if adjacency is None:
+                network_rng = np.random.default_rng(self.set_network_seed)
+                edge_u, edge_v = erdos_renyi_edges(self.num_nodes, prob, network_rng)
+                adjacency = CSRAdjacency(self.num_nodes, edge_u, edge_v, network_rng.random(edge_u.size),
+                                         sort_by_weight=self._sort_neighbors_by_weight)
+            self.adjacency = adjacency # Can be shared with other runs, e.g. the replicates of `HostNetworkEnsemble`
+            if self.counter_random is not None:
+                self.counter_random.num_edge_positions = self.adjacency.indices.size
+            self.host_agents = None
+            self.cohort = None
+            self.history = None
+            self.state_counter = None
+            self.probability_memo = None
+            self.population = HostPopulation(self, self.adjacency,
+                                             rng=np.random.default_rng(self.random.getrandbits(64)))
+            self.schedule = self.population
+
+        else:
+            self.population = None
+            self.host_agents = [] # Node id to `HostAgent`
+            self.history = HostHistory(self.num_nodes)
+            self.state_counter = StateCounter() if self._use_state_counter else None
+            self.agent_scratch = HostAgentScratch() if self._use_compact_host_agent else None
+            self.probability_memo = ProbabilityMemo(self._probability_memo_size) if self._probability_memo_size > 0 else None
+            host_agent_class = CompactHostAgent if self._use_compact_host_agent else HostAgent
+
+            # Create agents, or only count them in the cohort layer
+            if self._use_cohort_layer:
+                self.host_agents = [None] * self.num_nodes
+                self.cohort = CohortLayer(self, host_agent_class)
+                if self.state_counter is not None:
+                    self.cohort.add_to_state_counter(self.state_counter)
+            else:
+                self.cohort = None
+                for i, node in enumerate(self.G.nodes()):
+                    agent = host_agent_class(i, self, DiseaseHealthState.SUSCEPTIBLE, RecoveredImmunityState.TBD,
+                                        self.prob_recovered_no_to_mild_complication,
+                                        self.prob_recovered_no_to_severe_complication,
+                                        self.prob_recovered_mild_to_no_complication,
+                                        self.prob_recovered_mild_to_severe_complication,
+                                        self.prob_recovered_severe_to_no_complication,
+                                        self.prob_recovered_severe_to_mild_complication,
+                                        self.prob_gain_immunity,
+                                        self.clinical_resource, self.social_distancing,
+                                        self.vaccine, self.testing,
+                                      )
+                    self.schedule.add(agent)
+                    self.host_agents.append(agent)
+                    if self.state_counter is not None:
+                        self.state_counter.add(agent)
+                        agent._is_counted_by_state_counter = True
+                    # Add the agent to the node
+                    self.grid.place_agent(agent, node)
+
+            # Assign random weights (float: 0 to 1) to each connection
+            if self.counter_random is not None:
+                weights = self.counter_random.generator(0, 'edge_weight').random(self.G.number_of_edges()).tolist()
+                for (u, v), weight in zip(self.G.edges(), weights):
+                    self.G[u][v]['weight'] = weight
+            else:
+                for u, v in self.G.edges():
+                    self.G[u][v]['weight'] = random.random()
+
+            self.adjacency = CSRAdjacency.from_networkx(self.G, sort_by_weight=self._sort_neighbors_by_weight) if \
+                self._use_csr_adjacency else None
+            if self.counter_random is not None:
+                self.counter_random.num_edge_positions = self.adjacency.indices.size
 
         # Infect some nodes
         if self.set_initial_infectious_node_seed:
             self.random.seed(self.set_initial_infectious_node_seed)
-        infectious_nodes = self.random.sample(self.G.nodes(), self.initial_outbreak_size)
 
-        for agent in self.grid.get_cell_list_contents(infectious_nodes):
-            agent.disease_health_state = DiseaseHealthState.INFECTIOUS
-            agent._timer_since_beginning_of_last_infection = 0
+        if self.population is not None:
+            infectious_nodes = self.random.sample(range(self.num_nodes), self.initial_outbreak_size)
+            self.population.infect(np.array(infectious_nodes, dtype=np.int64))
+            if self._num_partitions > 1:
+                self.population = PartitionedPopulation(self, self.population, self._num_partitions)
+                self.schedule = self.population
+
+        else:
+            infectious_nodes = self.random.sample(list(self.G.nodes()), self.initial_outbreak_size)
+            if self.cohort is not None:
+                for node in infectious_nodes:
+                    self.cohort.materialize(node)
+
+            for agent in self.grid.get_cell_list_contents(infectious_nodes):
+                agent.disease_health_state = DiseaseHealthState.INFECTIOUS
+                agent._time_of_last_infection = self._current_timer + 1 # Zero days since infection on the first step
 
-            if agent.disease_health_state is DiseaseHealthState.INFECTIOUS:
-                agent.infectious_symptom_state = InfectiousSymptomState.NO_SYMPTOM
+                if agent.disease_health_state is DiseaseHealthState.INFECTIOUS:
+                    agent.infectious_symptom_state = InfectiousSymptomState.NO_SYMPTOM
 
         self.running = True
         self.datacollector.collect(self)
 
+    def get_static_risk_multipliers(self, comorbidities, age):
+        '''Multipliers on `prob_recover` and on the onset of severe and critical symptoms from the hypertension,
+        diabetes, IHD, asthma and cancer flags in `comorbidities` and from `age`, none of which change after a host
+        is created. Takes booleans for one agent or arrays for the whole population.'''
+        recover_multiplier = 1.0
+        onset_multiplier = 1.0
+        for condition, modifier in zip(list(comorbidities) + [age >= 60],
+                                       [self.modifier_from_hypertension, self.modifier_from_diabetes,
+                                        self.modifier_from_ihd, self.modifier_from_asthma,
+                                        self.modifier_from_cancer, self.modifier_from_old_age]):
+            recover_multiplier = np.where(condition, recover_multiplier * (1-modifier), recover_multiplier)
+            onset_multiplier = np.where(condition, onset_multiplier * (1+modifier), onset_multiplier)
+        return recover_multiplier, onset_multiplier
+
     def ratio_infectious_susceptible(self):
         try:
             return number_disease_health_state(self, DiseaseHealthState.INFECTIOUS) / number_disease_health_state(
@@ -594,8 +794,14 @@ class HostNetwork(Model):
             return math.inf
 
     def mean_age(self):
-        count = 0
-        total_age = 0
+        if self.population is not None:
+            living = self.population.disease_health_state != DiseaseHealthState.DEAD.value
+            count = getattr(self.population, 'count', None) # Hosts per row of a `CompartmentPopulation`
+            return np.average(self.population.age[living], weights=count[living] if count is not None else None) \
+                if living.any() else math.inf
+
+        count = self.cohort.num_hosts if self.cohort is not None else 0
+        total_age = int(self.cohort.sum_attribute('age')) if self.cohort is not None else 0
         for agent in self.grid.get_cell_list_contents(self.G.nodes()):
             if agent.disease_health_state is not DiseaseHealthState.DEAD:
                 count += 1
@@ -606,9 +812,18 @@ class HostNetwork(Model):
             return math.inf
 
     def proportion_sex(self):
-        count = 0
-        total_male = 0
-        total_female = 0
+        if self.population is not None:
+            living = self.population.disease_health_state != DiseaseHealthState.DEAD.value
+            if not living.any():
+                return {'M': math.inf, 'F': math.inf}
+            count = getattr(self.population, 'count', None)
+            proportion_male = np.average(self.population.is_male[living],
+                                         weights=count[living] if count is not None else None)
+            return {'M': proportion_male, 'F': 1 - proportion_male}
+
+        count = self.cohort.num_hosts if self.cohort is not None else 0
+        total_male = int(self.cohort.sum_attribute('is_male')) if self.cohort is not None else 0
+        total_female = count - total_male
         for agent in self.grid.get_cell_list_contents(self.G.nodes()):
             if agent.disease_health_state is not DiseaseHealthState.DEAD:
                 count += 1
@@ -626,6 +841,15 @@ class HostNetwork(Model):
         number_new_infection_in_last_n_time_units = 0
         last_n_time_unit = self._last_n_time_unit_for_mean_r0
 
+        if self.population is not None:
+            # Tracked per day rather than per host: {day: [hosts who infected others, new infections]}
+            for time_of_new_infection, (number_of_infecting_host, number_of_new_infection) in \
+                    self.population.new_infection_tracker.items():
+                initial_time = self._current_timer - last_n_time_unit
+                if (initial_time < 0) or (int(time_of_new_infection) in range(initial_time, self._current_timer)):
+                    number_infectious_active_in_last_n_time_units += number_of_infecting_host
+                    number_new_infection_in_last_n_time_units += number_of_new_infection
+
         for agent, content in self.all_agents_new_infection_tracker.items():
             for time_of_new_infection, number_of_new_infection in content.items():
                 initial_time = self._current_timer - last_n_time_unit
@@ -644,9 +868,71 @@ class HostNetwork(Model):
 
     def step(self):
         self._current_timer += 1
+        self.validate_probability_today = self.check_validation_day()
+        if (self.population is None) and self._use_symptom_kernel_prepass:
+            self.presample_symptom_transitions()
+        if self._hybrid_prevalence_threshold is not None:
+            self.switch_hybrid_engine()
         self.schedule.step()
+        if (self.state_counter is not None) and self._cross_check_state_counter:
+            self.state_counter.cross_check(self.schedule.agents, self.cohort)
         self.datacollector.collect(self)
 
+    def switch_hybrid_engine(self):
+        '''Step the hosts as `CompartmentPopulation` counts once the infectious exceed `_hybrid_prevalence_threshold`
+        of the living hosts, and as individual hosts again once they fall under `_hybrid_switch_back_ratio` of it.
+        Reporters read either through `self.population`.'''
+        try:
+            prevalence = number_infectious(self) / self.count_total_living_host()
+        except ZeroDivisionError:
+            prevalence = 0.0
+        aggregate = isinstance(self.population, CompartmentPopulation)
+        if (not aggregate) and (prevalence > self._hybrid_prevalence_threshold):
+            self.population = self.schedule = CompartmentPopulation(self.population)
+            self.hybrid_switches.append((self._current_timer, 'aggregate'))
+        elif aggregate and (prevalence < self._hybrid_prevalence_threshold * self._hybrid_switch_back_ratio):
+            self.population = self.schedule = self.population.to_population()
+            self.hybrid_switches.append((self._current_timer, 'individual'))
+
+    def check_validation_day(self):
+        '''True if the daily probabilities built on the current day are validated, see `validation_level`.'''
+        if self.validation_level == 'full':
+            return True
+        if self.validation_level == 'sampled':
+            return self.validation_random.random() < self._validation_sample_rate
+        return False
+
+    def presample_symptom_transitions(self):
+        '''Build the daily probabilities of every infectious agent before `schedule.step()` and sample their symptom
+        changes with one `sample_symptom_transitions()` pass. The probabilities only depend on states that an agent
+        changes itself, so its own step takes them from `prepared_probabilities` instead of building them again. Agents
+        infected later in the day have zero probability of a symptom change on that day.'''
+        candidates = self.schedule.get_active_agents() if self._use_active_set_scheduler else self.schedule.agents
+        agents = [agent for agent in candidates if agent.disease_health_state is DiseaseHealthState.INFECTIOUS]
+        attributes = [attribute for row in SYMPTOM_TRANSITION_ATTRIBUTES for attribute in row]
+        get_transition_probabilities = operator.attrgetter(*attributes)
+
+        values = []
+        self.prepared_probabilities = {}
+        for agent in agents:
+            agent.construct_daily_probability()
+            self.prepared_probabilities[agent.unique_id] = get_daily_probabilities(agent)
+            values.append(get_transition_probabilities(agent))
+        values = np.array(values, dtype=np.float64).reshape(len(agents), len(attributes))
+        prob = {attribute: values[:, i] for i, attribute in enumerate(attributes)}
+        symptom = np.array([agent.infectious_symptom_state.value for agent in agents], dtype=np.int64)
+        unique_ids = np.array([agent.unique_id for agent in agents], dtype=np.int64)
+        if self.counter_random is not None:
+            random_num = self.counter_random.uniforms_at(self._current_timer, 'change_infectious_symptom', unique_ids)
+        else:
+            random_num = np.array([self.random_stream.random() for agent in agents])
+
+        new_symptom, onset_mild, onset_severe_or_critical = sample_symptom_transitions(
+            symptom, prob, random_num, use_kernel=self._use_numba_kernels)
+        changed = np.flatnonzero(new_symptom != symptom)
+        self.symptom_transitions = dict(zip(unique_ids[changed].tolist(), zip(
+            new_symptom[changed].tolist(), onset_mild[changed].tolist(), onset_severe_or_critical[changed].tolist())))
+
     def run_model(self, n):
         for i in range(n):
             self.step()
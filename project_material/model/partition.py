@@ -0,0 +1,330 @@
+import logging
+import multiprocessing
+import traceback
+from enum import Enum
+import numpy as np
+from ..model.population import HostPopulation, DEAD, NONE_STATE
+from ..model.state import TestResultState
+from ..helper.graph import partition_graph
+
+logger = logging.getLogger('Logging for `partition.py`')
+logger.setLevel(logging.WARNING) # Setting: Logging level
+
+# Counters that the hosts of every part add to, sent to the coordinator as differences
+MODEL_COUNTERS = ['cumulative_infectious_cases', 'cumulative_dead_cases', 'cumulative_test_done',
+                  'cumulative_infectious_test_confirmed_cases', 'cumulative_dead_test_confirmed_cases',
+                  'cumulative_hospital_bed_use_in_new_host_counts', 'cumulative_icu_bed_use_in_new_host_counts',
+                  'cumulative_ventilator_use_in_new_host_counts', 'cumulative_drugX_use_in_new_host_counts',
+                  'cumulative_hospital_bed_use_in_days', 'cumulative_icu_bed_use_in_days',
+                  'cumulative_ventilator_use_in_days', 'cumulative_drugX_use_in_days', 'probability_rescale_count']
+RESOURCE_COUNTERS = ['hospital_bed_current_load', 'icu_bed_current_load', 'ventilator_current_load',
+                     'hospital_bed_use_day_tracker', 'icu_bed_use_day_tracker', 'ventilator_use_day_tracker',
+                     'drugX_use_day_tracker']
+RESOURCE_FLAGS = ['drugX_maxed_out', 'hospital_bed_maxed_out', 'icu_bed_maxed_out', 'ventilator_maxed_out']
+
+# Units of a resource left to hand out in `HostPopulation.allocate()`: (total, in use)
+RESOURCE_AVAILABLE = {'use_drugX': ('total_drugX', 'drugX_use_day_tracker'),
+                      'use_hospital_bed': ('total_hospital_bed', 'hospital_bed_current_load'),
+                      'use_icu_bed': ('total_icu_bed', 'icu_bed_current_load'),
+                      'use_ventilator': ('total_ventilator', 'ventilator_current_load')}
+
+# State arrays counted by the reporters, codes are shifted by 1 so that `NONE_STATE` is bin 0
+COUNTED_ATTRIBUTES = ['disease_health_state', 'infectious_symptom_state', 'recovered_complication_state',
+                      'recovered_immunity_state', 'vaccine_immunity_state', 'test_result_on_disease_health_state',
+                      'new_test_done_over_current_time_unit', 'infectious_hospital_bed_state',
+                      'infectious_icu_bed_state', 'infectious_ventilator_state', 'recovered_drugX_state']
+NUM_STATE_BINS = 16
+
+def read_counters(model):
+    return np.array([getattr(model, name) for name in MODEL_COUNTERS] +
+                    [getattr(model.clinical_resource, name) for name in RESOURCE_COUNTERS], dtype=np.int64)
+
+def add_counters(model, difference):
+    for name, value in zip(MODEL_COUNTERS, difference[:len(MODEL_COUNTERS)]):
+        setattr(model, name, getattr(model, name) + int(value))
+    for name, value in zip(RESOURCE_COUNTERS, difference[len(MODEL_COUNTERS):]):
+        setattr(model.clinical_resource, name, getattr(model.clinical_resource, name) + int(value))
+
+def count_states(population):
+    '''Host counts per state code of every array in `COUNTED_ATTRIBUTES`: {attribute: [all hosts, living hosts]},
+    and per disease health state of the hosts with a true positive test under 'test_confirmed'.'''
+    living = population.disease_health_state != DEAD
+    counts = {}
+    for attribute in COUNTED_ATTRIBUTES:
+        code = getattr(population, attribute).astype(np.int64) - NONE_STATE
+        counts[attribute] = np.stack([np.bincount(code, minlength=NUM_STATE_BINS),
+                                      np.bincount(code[living], minlength=NUM_STATE_BINS)])
+    confirmed = population.test_result_on_disease_health_state == TestResultState.TP.value
+    counts['test_confirmed'] = np.bincount(population.disease_health_state[confirmed].astype(np.int64) - NONE_STATE,
+                                           minlength=NUM_STATE_BINS)
+    return counts
+
+class PartitionPopulation(HostPopulation):
+    '''The `HostPopulation` arrays of the hosts in one part, stepped in a worker process of `PartitionedPopulation`.
+
+    Local index `i` is host `global_ids[i]`, and the neighbors outside the part (the halo) follow the owned hosts as
+    local ids `num_hosts` onwards, with the candidate flags of the start of the day in `halo_candidate`. Draws are
+    keyed on the global host ids and edge positions, so a host draws the same numbers as in a single process.
+    Infections of halo hosts and resource requests are sent to the coordinator over `connection`.'''
+    def __init__(self, population, owned, halo, halo_candidate, connection):
+        num_hosts = population.num_hosts
+        for name, value in vars(population).items():
+            if isinstance(value, np.ndarray) and (value.shape[:1] == (num_hosts,)):
+                value = value[owned]
+            setattr(self, name, value)
+
+        node_map = np.full(num_hosts, NONE_STATE, dtype=np.int64)
+        node_map[owned] = np.arange(owned.size)
+        node_map[halo] = owned.size + np.arange(halo.size)
+        self.adjacency = population.adjacency.take_rows(owned, node_map)
+        self.num_hosts = owned.size
+        self.all_hosts = np.arange(owned.size)
+        self.global_ids = owned
+        self.halo_ids = halo
+        self.halo_candidate = halo_candidate
+        self.new_infection_tracker = {}
+        self.connection = connection
+        self._credited_spreaders = np.empty(0, dtype=np.int64)
+        self._counter_baseline = read_counters(self.model)
+
+    def draw_uniform(self, purpose, index):
+        if purpose in self.model.counter_random.edge_purposes:
+            return super().draw_uniform(purpose, index)
+        return super().draw_uniform(purpose, self.global_ids[index])
+
+    def get_candidate(self):
+        return np.concatenate([super().get_candidate(), self.halo_candidate])
+
+    def get_counter_difference(self):
+        '''Change of the counters in `MODEL_COUNTERS` and `RESOURCE_COUNTERS` since the last call.'''
+        counters = read_counters(self.model)
+        difference = counters - self._counter_baseline
+        self._counter_baseline = counters
+        return difference
+
+    def try_infect_neighbors(self):
+        source, target, credit = self.find_infections()
+        halo = target >= self.num_hosts
+        self.connection.send(('infections', self.halo_ids[target[halo] - self.num_hosts],
+                              self.global_ids[source[halo]], credit[halo]))
+        incoming_target, incoming_source, incoming_credit = self.connection.recv()
+
+        local = ~halo
+        source, target = self.take_infections(np.concatenate([self.global_ids[source[local]], incoming_source]),
+                                              np.concatenate([target[local], incoming_target]),
+                                              np.concatenate([credit[local], incoming_credit]))
+        self._credited_spreaders = source
+
+    def allocate(self, candidates, available, purpose):
+        '''Units are handed out by the coordinator over all parts, `available` is recounted there.'''
+        self.connection.send(('allocate', purpose, self.get_counter_difference(), self.global_ids[candidates],
+                              self.draw_uniform(purpose, candidates)))
+        return np.searchsorted(self.global_ids, self.connection.recv())
+
+    def report(self, export):
+        '''End of day message: counter changes, resource flags, credited spreaders, state counts and the candidate
+        flags of the owned hosts at local ids `export`, which are in the halo of other parts.'''
+        clinical_resource = self.model.clinical_resource
+        return ('report', self.get_counter_difference(),
+                [getattr(clinical_resource, name) for name in RESOURCE_FLAGS],
+                self._credited_spreaders, count_states(self), self.get_candidate()[export])
+
+def run_partition_worker(model, population, owned, halo, halo_candidate, export, connection):
+    '''Worker loop of one part, `model` and `population` are the coordinator's copied into the process by fork.'''
+    try:
+        population = PartitionPopulation(population, owned, halo, halo_candidate, connection)
+        model.population = model.schedule = population
+        model.adjacency = population.adjacency
+        while True:
+            message = connection.recv()
+            if message[0] == 'close':
+                break
+            if message[0] == 'gather':
+                connection.send(('gather', getattr(population, message[1])))
+                continue
+            _, model._current_timer, model.validate_probability_today, population.halo_candidate = message
+            population._credited_spreaders = np.empty(0, dtype=np.int64)
+            population.step()
+            connection.send(population.report(export))
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+    finally:
+        connection.close()
+
+class PartitionedPopulation():
+    '''Coordinator of a `HostPopulation` split into `num_parts` parts of the contact graph, each stepped by a
+    `PartitionPopulation` in its own worker process. Stands in for the population and the schedule of `HostNetwork`.
+
+    The parts are cut with `partition_graph()`. Once per day the coordinator sends every part the candidate flags of
+    its halo, passes on the infections of hosts owned by other parts, hands out each clinical resource over all parts
+    in the same keyed random order as `HostPopulation.allocate()`, and sums the counters and state counts that the
+    reporters read. Requires `model.counter_random` and push transmission, then the outputs are those of a single
+    `HostPopulation` on the same seed.
+
+    Workers are forked at the first `step()`, so changes to the model or to `population` made after construction
+    reach them, later ones do not. Fork is not available on every platform nor inside the daemon processes of a
+    `BatchRunnerMP` pool, which cannot have children.'''
+    def __init__(self, model, population, num_parts):
+        assert model.counter_random is not None, \
+            'ValueError: Partitioned stepping needs `_use_counter_based_random` to key draws on global host ids.'
+        assert model._transmission_direction == 'push', \
+            'ValueError: Partitioned stepping reads the rows of owned spreaders, `_transmission_direction` must be \'push\'.'
+        assert 'fork' in multiprocessing.get_all_start_methods(), \
+            'ValueError: Partitioned stepping starts its workers by fork, which this platform does not have.'
+        assert not multiprocessing.current_process().daemon, \
+            'ValueError: Partitioned stepping cannot start workers from a daemon process, such as a `BatchRunnerMP` ' \
+            'pool, set `_num_partitions` to 1 there.'
+        self.model = model
+        self.num_hosts = population.num_hosts
+        self.num_parts = num_parts
+        self.steps = 0
+        self.time = 0
+        self.new_infection_tracker = {}
+        self.population = population # Stands in until the workers are started
+        self.state_counts = None
+        self.age = population.age
+        self.is_male = population.is_male
+
+        adjacency = population.adjacency
+        self.part = partition_graph(adjacency, num_parts)
+        self.owned = [np.flatnonzero(self.part == part) for part in range(num_parts)]
+        self.local_index = np.empty(self.num_hosts, dtype=np.int64)
+        for owned in self.owned:
+            self.local_index[owned] = np.arange(owned.size)
+        row_part = np.repeat(self.part, adjacency.degree())
+        crossing = self.part[adjacency.indices] != row_part
+        logger.info('Edge cut of {} parts: {:.3f}'.format(num_parts, crossing.mean() if crossing.size > 0 else 0.0))
+        self.halo = [np.unique(adjacency.indices[crossing & (row_part == part)]).astype(np.int64)
+                     for part in range(num_parts)]
+        in_halo = np.zeros(self.num_hosts, dtype=bool)
+        for halo in self.halo:
+            in_halo[halo] = True
+        self.export = [owned[in_halo[owned]] for owned in self.owned]
+        self.candidate = None
+        self.connections = []
+        self.workers = []
+
+    def start_workers(self):
+        '''Fork one worker per part with the current model and population, which the parts own from then on.'''
+        population = self.population
+        self.candidate = population.get_candidate()
+        self.state_counts = count_states(population)
+        context = multiprocessing.get_context('fork')
+        for part in range(self.num_parts):
+            connection, worker_connection = context.Pipe()
+            worker = context.Process(target=run_partition_worker, daemon=True, args=(
+                self.model, population, self.owned[part], self.halo[part], self.candidate[self.halo[part]],
+                np.searchsorted(self.owned[part], self.export[part]), worker_connection))
+            worker.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.workers.append(worker)
+        self.population = None
+
+    def receive(self, part, kind):
+        message = self.connections[part].recv()
+        if message[0] == 'error':
+            raise RuntimeError('Worker of part {} failed:\n{}'.format(part, message[1]))
+        assert message[0] == kind, 'ValueError: Expected a \'{}\' message, got \'{}\'.'.format(kind, message[0])
+        return message[1:]
+
+    def exchange_infections(self):
+        '''Pass each infection of a halo host on to the part that owns the host.'''
+        target, source, credit = [np.concatenate(arrays) for arrays in zip(*[
+            self.receive(part, 'infections') for part in range(self.num_parts)])]
+        owner = self.part[target]
+        for part, connection in enumerate(self.connections):
+            incoming = owner == part
+            connection.send((self.local_index[target[incoming]], source[incoming], credit[incoming]))
+
+    def allocate(self):
+        '''Hand out the units left of one resource to the candidates of all parts, lowest keyed draw first.'''
+        requests = [self.receive(part, 'allocate') for part in range(self.num_parts)]
+        for _, difference, _, _ in requests:
+            add_counters(self.model, difference)
+        total, in_use = RESOURCE_AVAILABLE[requests[0][0]]
+        clinical_resource = self.model.clinical_resource
+        available = max(int(getattr(clinical_resource, total) - getattr(clinical_resource, in_use)), 0)
+
+        candidates = np.concatenate([request[2] for request in requests])
+        keys = np.concatenate([request[3] for request in requests])
+        admitted = np.zeros(candidates.size, dtype=bool)
+        admitted[np.argsort(keys)[:available]] = True
+        owner = self.part[candidates]
+        for part, connection in enumerate(self.connections):
+            connection.send(candidates[admitted & (owner == part)])
+
+    def step(self):
+        if self.population is not None:
+            self.start_workers()
+        self.time = self.model._current_timer
+        for part, connection in enumerate(self.connections):
+            connection.send(('step', self.time, self.model.validate_probability_today,
+                             self.candidate[self.halo[part]]))
+
+        self.exchange_infections()
+        for _ in RESOURCE_AVAILABLE:
+            self.allocate()
+
+        reports = [self.receive(part, 'report') for part in range(self.num_parts)]
+        clinical_resource = self.model.clinical_resource
+        for name in RESOURCE_FLAGS:
+            setattr(clinical_resource, name, False)
+        spreaders = []
+        self.state_counts = {key: 0 for key in self.state_counts}
+        for part, (difference, flags, credited, counts, export_candidate) in enumerate(reports):
+            add_counters(self.model, difference)
+            for name, flag in zip(RESOURCE_FLAGS, flags):
+                setattr(clinical_resource, name, getattr(clinical_resource, name) or flag)
+            spreaders.append(credited)
+            for key, value in counts.items():
+                self.state_counts[key] = self.state_counts[key] + value
+            self.candidate[self.export[part]] = export_candidate
+
+        new_infections = sum(credited.size for credited in spreaders) # One credited spreader per new case
+        if new_infections > 0:
+            self.new_infection_tracker[self.time] = [np.unique(np.concatenate(spreaders)).size, new_infections]
+        self.steps += 1
+
+    def gather(self, attribute):
+        '''Whole-population array of a `HostPopulation` attribute, collected from the parts.'''
+        if self.population is not None:
+            return getattr(self.population, attribute)
+        for connection in self.connections:
+            connection.send(('gather', attribute))
+        values = [self.receive(part, 'gather')[0] for part in range(self.num_parts)]
+        result = np.empty(self.num_hosts, dtype=values[0].dtype)
+        for owned, value in zip(self.owned, values):
+            result[owned] = value
+        return result
+
+    @property
+    def disease_health_state(self):
+        return self.gather('disease_health_state')
+
+    def close(self):
+        for connection, worker in zip(self.connections, self.workers):
+            connection.send(('close',))
+            worker.join()
+
+    ### Class helper functions ###
+    def get_agent_count(self):
+        return self.num_hosts
+
+    def count_state(self, attribute, state, exclude_dead=False):
+        if self.population is not None:
+            return self.population.count_state(attribute, state, exclude_dead)
+        value = state.value if isinstance(state, Enum) else state
+        if attribute not in self.state_counts:
+            match = self.gather(attribute) == value
+            if exclude_dead:
+                match &= self.disease_health_state != DEAD
+            return int(np.count_nonzero(match))
+        counts = self.state_counts[attribute][int(exclude_dead)]
+        code = value - NONE_STATE
+        return int(counts[code]) if 0 <= code < counts.size else 0
+
+    def count_state_test_confirmed(self, state):
+        if self.population is not None:
+            return self.population.count_state_test_confirmed(state)
+        return int(self.state_counts['test_confirmed'][state.value - NONE_STATE])
@@ -0,0 +1,621 @@
+import logging
+from enum import Enum
+import numpy as np
+from ..model.state import DiseaseHealthState, RecoveredImmunityState, VaccineImmunityState, InfectiousSymptomState, \
+    RecoveredComplicationState, UseHospitalBedState, UseICUBedState, UseVentilatorState, UseDrugXState, TestResultState
+from ..model.symptom import sample_symptom_transitions
+from ..model.kernel import rescale_transition_kernel, complication_transition_kernel, transmission_hit_kernel
+from ..helper.probability import host_attribute_arrays
+
+logger = logging.getLogger('Logging for `population.py`')
+logger.setLevel(logging.WARNING) # Setting: Logging level
+
+NONE_STATE = -1 # Integer code for a state that is `None` on a `HostAgent`
+
+SUSCEPTIBLE = DiseaseHealthState.SUSCEPTIBLE.value
+INFECTIOUS = DiseaseHealthState.INFECTIOUS.value
+RECOVERED = DiseaseHealthState.RECOVERED.value
+DEAD = DiseaseHealthState.DEAD.value
+
+NO_SYMPTOM = InfectiousSymptomState.NO_SYMPTOM.value
+MILD_SYMPTOM = InfectiousSymptomState.MILD_SYMPTOM.value
+SEVERE_SYMPTOM = InfectiousSymptomState.SEVERE_SYMPTOM.value
+CRITICAL_SYMPTOM = InfectiousSymptomState.CRITICAL_SYMPTOM.value
+
+NO_COMPLICATION = RecoveredComplicationState.NO_COMPLICATION.value
+MILD_COMPLICATION = RecoveredComplicationState.MILD_COMPLICATION.value
+SEVERE_COMPLICATION = RecoveredComplicationState.SEVERE_COMPLICATION.value
+
+YES = UseHospitalBedState.YES.value # All `Use{}State` enums share the same codes
+NO = UseHospitalBedState.NO.value
+
+class HostPopulation():
+    '''Struct-of-arrays engine for `HostNetwork`.
+
+    Every `HostAgent` attribute that drives the daily transitions is held as one NumPy array over the whole
+    population (index = node id) and a day is advanced with whole-array operations. States are stored as the
+    integer `.value` of their enum, with `NONE_STATE` standing in for `None`. The behaviours run in the order
+    of `HostAgent.step()` as population-wide phases instead of a random order per agent.'''
+    def __init__(self, model, adjacency, rng):
+        self.model = model
+        self.rng = rng
+        self.num_hosts = model.num_nodes
+        self.steps = 0
+        self.time = 0
+        n = self.num_hosts
+
+        # Static attributes
+        host_attributes = model.host_attributes if model.host_attributes is not None else \
+            host_attribute_arrays(n, self.rng)
+        self.age = host_attributes['age']
+        self.is_male = host_attributes['is_male']
+        self.comorbid_hypertension = host_attributes['comorbid_hypertension']
+        self.comorbid_diabetes = host_attributes['comorbid_diabetes']
+        self.comorbid_ihd = host_attributes['comorbid_ihd']
+        self.comorbid_asthma = host_attributes['comorbid_asthma']
+        self.comorbid_cancer = host_attributes['comorbid_cancer']
+        self.static_recover_multiplier, self.static_onset_multiplier = model.get_static_risk_multipliers(
+            [self.comorbid_hypertension, self.comorbid_diabetes, self.comorbid_ihd, self.comorbid_asthma,
+             self.comorbid_cancer], self.age)
+        self.all_hosts = np.arange(n)
+
+        # Contact graph as `CSRAdjacency`, with random weights (float: 0 to 1) on each connection
+        self.adjacency = adjacency
+
+        # Dynamic states
+        self.disease_health_state = np.full(n, SUSCEPTIBLE, dtype=np.int8)
+        self.infectious_symptom_state = np.full(n, NONE_STATE, dtype=np.int8)
+        self.recovered_complication_state = np.full(n, NONE_STATE, dtype=np.int8)
+        self.recovered_immunity_state = np.full(n, RecoveredImmunityState.WITHOUT_IMMUNITY.value, dtype=np.int8)
+        self.vaccine_immunity_state = np.full(n, VaccineImmunityState.WITHOUT_IMMUNITY.value, dtype=np.int8)
+        self.test_result_on_disease_health_state = np.full(n, NONE_STATE, dtype=np.int8)
+        self.new_test_done_over_current_time_unit = np.zeros(n, dtype=np.int8)
+        self.infectious_hospital_bed_state = np.full(n, NONE_STATE, dtype=np.int8)
+        self.infectious_icu_bed_state = np.full(n, NONE_STATE, dtype=np.int8)
+        self.infectious_ventilator_state = np.full(n, NONE_STATE, dtype=np.int8)
+        self.recovered_drugX_state = np.full(n, NONE_STATE, dtype=np.int8)
+        self.test_confirmed = np.zeros(n, dtype=bool) # Same as `HostHistory.test_confirmed`
+
+        # Timers, `NONE_STATE` when the `HostAgent` timer is `None`
+        self._timer_since_beginning_of_last_infection = np.full(n, NONE_STATE, dtype=np.int32)
+        self._timer_since_beginning_of_last_onset_of_mild_symptom = np.full(n, NONE_STATE, dtype=np.int32)
+        self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom = np.full(n, NONE_STATE, dtype=np.int32)
+        self.time_last_tested = np.full(n, NONE_STATE, dtype=np.int32)
+
+        # Per-day probabilities, aligned with `self.infectious_index`
+        self.infectious_index = np.empty(0, dtype=np.int64)
+        self.prob = {}
+
+        # Track days and how many hosts infected others, and how many they infected: {day: [spreaders, new cases]}
+        self.new_infection_tracker = {}
+
+        assert self.model.prob_recovered_no_to_mild_complication + self.model.prob_recovered_no_to_severe_complication \
+            <= 1, 'ValueError: `prob_recovered_no_complication_maintained` is less than 0.'
+        assert self.model.prob_recovered_mild_to_no_complication + self.model.prob_recovered_mild_to_severe_complication \
+            <= 1, 'ValueError: `prob_recovered_mild_complication_maintained` is less than 0.'
+        assert self.model.prob_recovered_severe_to_no_complication + self.model.prob_recovered_severe_to_mild_complication \
+            <= 1, 'ValueError: `prob_recovered_severe_complication_maintained` is less than 0.'
+
+    def draw_uniform(self, purpose, index):
+        '''Uniforms for the hosts in `index` (edge positions for edge purposes), keyed on the time unit, purpose and
+        index when `model.counter_random` is set, so that they match the draws of the same hosts as `HostAgent`.'''
+        if self.model.counter_random is not None:
+            return self.model.counter_random.uniforms_at(self.time, purpose, index)
+        return self.rng.random(np.size(index))
+
+    def select(self, purpose, index, prob):
+        '''Hosts of `index` each picked with probability `prob`, from their `purpose` draws.'''
+        return index[self.draw_uniform(purpose, index) < prob]
+
+    def choose(self, purpose, index, cumulative_prob):
+        '''Category of each host of `index`, from their `purpose` draws: the number of cumulative probabilities in
+        `cumulative_prob` (2D, one row per host or one row for all) that its draw reaches. Returns the hosts and their
+        categories.'''
+        return index, (self.draw_uniform(purpose, index)[:, None] >= cumulative_prob).sum(axis=1)
+
+    def count_hosts(self, index):
+        '''Number of hosts in `index`, added to the model counters.'''
+        return index.size
+
+    def count_mask(self, mask):
+        '''Number of hosts in a mask over the whole population, added to the model counters.'''
+        return int(np.count_nonzero(mask))
+
+    def infect(self, index):
+        self.disease_health_state[index] = INFECTIOUS
+        self._timer_since_beginning_of_last_infection[index] = 0
+        self.infectious_symptom_state[index] = NO_SYMPTOM
+        self.recovered_complication_state[index] = NONE_STATE
+
+    def construct_base_probability(self):
+        self.infectious_index = np.flatnonzero(self.disease_health_state == INFECTIOUS)
+        timer = self._timer_since_beginning_of_last_infection[self.infectious_index]
+        onset = self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom[self.infectious_index]
+        started = timer > 0 # Probabilities stay at 0 on the first day of an infection
+
+        def pdf(dist):
+            return np.where(started, dist.get_pdf_prob(timer), 0.0)
+
+        self.prob = {
+            'prob_spread_virus': pdf(self.model.prob_spread_virus_dist),
+            'prob_recover': pdf(self.model.prob_recover_dist),
+            'prob_virus_kill_host': np.where(started & (onset >= 0),
+                                             self.model.prob_virus_kill_host_dist.get_cdf_prob(onset), 0.0),
+            'prob_infectious_no_to_mild_symptom': pdf(self.model.prob_infectious_no_to_mild_symptom_dist),
+            'prob_infectious_no_to_severe_symptom': pdf(self.model.prob_infectious_no_to_severe_symptom_dist),
+            'prob_infectious_no_to_critical_symptom': pdf(self.model.prob_infectious_no_to_critical_symptom_dist),
+            'prob_infectious_mild_to_no_symptom': pdf(self.model.prob_infectious_mild_to_no_symptom_dist),
+            'prob_infectious_mild_to_severe_symptom': pdf(self.model.prob_infectious_mild_to_severe_symptom_dist),
+            'prob_infectious_mild_to_critical_symptom': pdf(self.model.prob_infectious_mild_to_critical_symptom_dist),
+            'prob_infectious_severe_to_no_symptom': pdf(self.model.prob_infectious_severe_to_no_symptom_dist),
+            'prob_infectious_severe_to_mild_symptom': pdf(self.model.prob_infectious_severe_to_mild_symptom_dist),
+            'prob_infectious_severe_to_critical_symptom': pdf(self.model.prob_infectious_severe_to_critical_symptom_dist),
+            'prob_infectious_critical_to_no_symptom': pdf(self.model.prob_infectious_critical_to_no_symptom_dist),
+            'prob_infectious_critical_to_mild_symptom': pdf(self.model.prob_infectious_critical_to_mild_symptom_dist),
+            'prob_infectious_critical_to_severe_symptom': pdf(self.model.prob_infectious_critical_to_severe_symptom_dist),
+        }
+
+    def update_probability_by_special_condition(self):
+        modifier_from_severe_symptom = self.model.modifier_from_severe_symptom
+        modifier_from_critical_symptom = self.model.modifier_from_critical_symptom
+        modifier_from_critical_symptom_extra = self.model.modifier_from_critical_symptom_extra
+        modifier_from_absence_of_adequate_care = self.model.modifier_from_absence_of_adequate_care
+
+        index = self.infectious_index
+        prob = self.prob
+        onset_multiplier = self.static_onset_multiplier[index]
+        prob['prob_recover'] = prob['prob_recover'] * self.static_recover_multiplier[index]
+        prob['prob_infectious_no_to_severe_symptom'] = prob['prob_infectious_no_to_severe_symptom'] * onset_multiplier
+        prob['prob_infectious_no_to_critical_symptom'] = prob['prob_infectious_no_to_critical_symptom'] * onset_multiplier
+
+        symptom = self.infectious_symptom_state[index]
+        care = modifier_from_absence_of_adequate_care
+
+        severe = symptom == SEVERE_SYMPTOM
+        in_bed = self.infectious_hospital_bed_state[index] == YES
+        on_ventilator = self.infectious_ventilator_state[index] == YES
+        recover = 1 - modifier_from_severe_symptom
+        kill = 1 + modifier_from_severe_symptom
+        to_critical = 1.0
+        recover = recover * np.where(in_bed, 1+care, 1-care)
+        to_critical = to_critical * np.where(in_bed, 1-care, 1+care)
+        kill = kill * np.where(in_bed, 1-care, 1+care)
+        recover = recover * (1-care)
+        to_critical = to_critical * np.where(on_ventilator, 1-care, 1+care)
+        kill = kill * np.where(on_ventilator, 1-care, 1+care)
+        prob['prob_recover'] = np.where(severe, prob['prob_recover'] * recover, prob['prob_recover'])
+        prob['prob_virus_kill_host'] = np.where(severe, prob['prob_virus_kill_host'] * kill,
+                                                prob['prob_virus_kill_host'])
+        prob['prob_infectious_severe_to_critical_symptom'] = np.where(
+            severe, prob['prob_infectious_severe_to_critical_symptom'] * to_critical,
+            prob['prob_infectious_severe_to_critical_symptom'])
+
+        critical = symptom == CRITICAL_SYMPTOM
+        in_icu = self.infectious_icu_bed_state[index] == YES
+        recover = 1 - modifier_from_critical_symptom
+        kill = 1 + modifier_from_critical_symptom + modifier_from_critical_symptom_extra
+        to_severe = 1.0
+        for adequate_care in [in_icu, on_ventilator]:
+            recover = recover * np.where(adequate_care, 1+care, 1-care)
+            to_severe = to_severe * np.where(adequate_care, 1+care, 1-care)
+            kill = kill * np.where(adequate_care, 1-care, 1+care)
+        prob['prob_recover'] = np.where(critical, prob['prob_recover'] * recover, prob['prob_recover'])
+        prob['prob_virus_kill_host'] = np.where(critical, prob['prob_virus_kill_host'] * kill,
+                                                prob['prob_virus_kill_host'])
+        prob['prob_infectious_critical_to_severe_symptom'] = np.where(
+            critical, prob['prob_infectious_critical_to_severe_symptom'] * to_severe,
+            prob['prob_infectious_critical_to_severe_symptom'])
+
+    def final_probability_update(self):
+        for from_state, to_states in [('no', ['mild', 'severe', 'critical']),
+                                      ('mild', ['no', 'severe', 'critical']),
+                                      ('severe', ['no', 'mild', 'critical']),
+                                      ('critical', ['no', 'mild', 'severe'])]:
+            keys = ['prob_infectious_{}_to_{}_symptom'.format(from_state, to_state) for to_state in to_states]
+            if self.model._use_numba_kernels:
+                maintained = np.empty(self.infectious_index.size)
+                rescale = np.empty(self.infectious_index.size, dtype=bool)
+                count = rescale_transition_kernel(*[self.prob[key] for key in keys], maintained, rescale)
+                if count > 0:
+                    self.model.probability_rescale_count += self.count_hosts(self.infectious_index[rescale])
+                    logger.warning('WARNING:`prob_infectious_{}_symptom_maintained` for {} hosts is less than 0, '
+                                   'rescaling applied.'.format(from_state, count))
+                self.prob['prob_infectious_{}_symptom_maintained'.format(from_state)] = maintained
+                continue
+
+            total = self.prob[keys[0]] + self.prob[keys[1]] + self.prob[keys[2]]
+            maintained = 1 - total
+
+            # Rescale if `prob_infectious_{}_symptom_maintained` is less than 0
+            rescale = maintained < 0
+            if rescale.any():
+                self.model.probability_rescale_count += self.count_hosts(self.infectious_index[rescale])
+                logger.warning('WARNING:`prob_infectious_{}_symptom_maintained` for {} hosts is less than 0, '
+                               'rescaling applied.'.format(from_state, np.count_nonzero(rescale)))
+                maintained = np.where(rescale, 0.0, maintained)
+                for key in keys:
+                    self.prob[key] = np.where(rescale, self.prob[key] / np.where(rescale, total, 1), self.prob[key])
+            self.prob['prob_infectious_{}_symptom_maintained'.format(from_state)] = maintained
+
+    def validate_probability_setting(self):
+        for from_state in ['no', 'mild', 'severe', 'critical']:
+            assert (self.prob['prob_infectious_{}_symptom_maintained'.format(from_state)] >= 0).all(), \
+                'ValueError: `prob_infectious_{}_symptom_maintained` is less than 0.'.format(from_state)
+
+    def try_social_distancing(self):
+        self.model.social_distancing.current_time = self.time
+        if self.model.social_distancing.check_timing():
+            self._edge_weight_threshold_to_infect = self.model.social_distancing.assign_edge_threshold()
+        else:
+            self._edge_weight_threshold_to_infect = 0.0
+
+    def try_test_disease_status(self):
+        testing = self.model.testing
+        testing.current_time = self.time
+        if not testing.check_timing():
+            return
+        slot = testing._list_slot_counter
+
+        state = self.disease_health_state
+        symptom = self.infectious_symptom_state
+        prob_tested = np.select(
+            [(state == SUSCEPTIBLE) | (state == RECOVERED) | ((state == INFECTIOUS) & (symptom == NO_SYMPTOM)),
+             (state == INFECTIOUS) & (symptom == MILD_SYMPTOM),
+             (state == INFECTIOUS) & (symptom == SEVERE_SYMPTOM),
+             (state == INFECTIOUS) & (symptom == CRITICAL_SYMPTOM)],
+            [testing.prob_tested_for_no_symptom[slot], testing.prob_tested_for_mild_symptom[slot],
+             testing.prob_tested_for_severe_symptom[slot], testing.prob_tested_for_critical_symptom[slot]],
+            default=0.0)
+        not_tested_recently = (self.time_last_tested == NONE_STATE) | (
+            self.time - self.time_last_tested >= testing._min_days_between_two_tests)
+        tested = self.select('testing_suitability', self.all_hosts, np.where(not_tested_recently, prob_tested, 0.0))
+
+        self.time_last_tested[tested] = self.time
+        self.new_test_done_over_current_time_unit[tested] = 1
+        self.model.cumulative_test_done += self.count_hosts(tested)
+
+        infectious = self.disease_health_state[tested] == INFECTIOUS
+        tested, wrong = self.choose('test_result', tested, np.where(
+            infectious, testing.test_sensitivity[slot], testing.test_specificity[slot])[:, None])
+        infectious = self.disease_health_state[tested] == INFECTIOUS
+        self.test_result_on_disease_health_state[tested] = np.where(
+            infectious,
+            np.where(wrong == 0, TestResultState.TP.value, TestResultState.FN.value),
+            np.where(wrong == 0, TestResultState.TN.value, TestResultState.FP.value))
+
+        confirmed = tested[infectious & (self.test_result_on_disease_health_state[tested] == TestResultState.TP.value)
+                           & ~self.test_confirmed[tested]]
+        self.test_confirmed[confirmed] = True
+        self.model.cumulative_infectious_test_confirmed_cases += self.count_hosts(confirmed)
+
+    def get_candidate(self):
+        '''Mask of the hosts an infectious neighbor can infect today.'''
+        vaccinated = self.vaccine_immunity_state == VaccineImmunityState.WITH_IMMUNITY.value
+        return ((self.disease_health_state == SUSCEPTIBLE) & ~vaccinated) | (
+            (self.disease_health_state == RECOVERED) & ~vaccinated &
+            (self.recovered_immunity_state != RecoveredImmunityState.WITH_IMMUNITY.value))
+
+    def find_infections(self):
+        '''Every edge that transmits today, as `(source, target, credit)` arrays, where `credit` is the draw that
+        picks the credited spreader of a host reached by several of them.'''
+        prob_spread_virus = np.zeros(self.num_hosts)
+        prob_spread_virus[self.infectious_index] = self.prob['prob_spread_virus']
+        spreader = (self.disease_health_state == INFECTIOUS) & (prob_spread_virus > 0)
+        candidate = self.get_candidate()
+
+        if self.check_pull_direction(spreader, candidate):
+            # Same edges read from the candidates' rows, the draws stay keyed on the spreader side of every edge
+            target, source, weight, position = self.adjacency.gather(np.flatnonzero(candidate),
+                                                                     self._edge_weight_threshold_to_infect)
+            exposed = spreader[source]
+            source, target = source[exposed], target[exposed]
+            position = self.adjacency.get_reverse_edge_positions()[position[exposed]]
+        else:
+            # Only the CSR rows of the spreaders are read, and only their edges over the threshold
+            source, target, weight, position = self.adjacency.gather(np.flatnonzero(spreader),
+                                                                     self._edge_weight_threshold_to_infect)
+            exposed = candidate[target]
+            source, target, position = source[exposed], target[exposed], position[exposed]
+
+        if self.model._use_geometric_skip_transmission:
+            # Draws follow the edge positions within each spreader, so the hits depend neither on row sorting nor on
+            # the direction the edges were read in
+            order = np.lexsort((position, source))
+            source, target, position = source[order], target[order], position[order]
+            success = self.draw_transmission_hits(source, prob_spread_virus[source])
+        else:
+            success = self.draw_uniform('spread_virus', position) < prob_spread_virus[source]
+        return source[success], target[success], self.draw_uniform('infection_credit', position[success])
+
+    def take_infections(self, source, target, credit):
+        '''Infect the hosts in `target`, returns the credited `(source, target)` pairs.'''
+        order = np.argsort(credit)
+        source, target = source[order], target[order]
+
+        # A host reached by several spreaders is credited to one of them at random
+        target, first = np.unique(target, return_index=True)
+        source = source[first]
+        if target.size > 0:
+            self.infect(target)
+            self.model.cumulative_infectious_cases += self.count_hosts(target)
+        return source, target
+
+    def try_infect_neighbors(self):
+        source, target = self.take_infections(*self.find_infections())
+        if target.size > 0:
+            self.new_infection_tracker[self.time] = [np.unique(source).size, target.size]
+
+    def check_pull_direction(self, spreader, candidate):
+        '''True if today's transmission reads the rows of the candidates (pull) rather than of the spreaders (push),
+        see `model._transmission_direction`. In 'auto', the side with fewer edges to read is picked, as in
+        direction-optimizing breadth-first search.'''
+        direction = self.model._transmission_direction
+        if direction == 'auto':
+            degree = self.adjacency.degree()
+            return degree[candidate].sum() < degree[spreader].sum()
+        return direction == 'pull'
+
+    def draw_transmission_hits(self, source, prob):
+        '''Mask of the exposed edges, grouped by `source`, that infect their target. Same geometric gaps as
+        `HostAgent.draw_transmission_hits()`: draw `r` of a spreader is keyed on the `r`-th edge position of its row
+        and moves to the next infected edge, the gaps of all spreaders are summed at once. The edges of a spreader are
+        expected in edge position order.'''
+        _, group_start, count = np.unique(source, return_index=True, return_counts=True)
+        if self.model._use_numba_kernels:
+            rank = np.arange(source.size) - np.repeat(group_start, count)
+            random_num = self.draw_uniform('spread_virus_skip',
+                                           self.adjacency.global_offsets[source].astype(np.int64) + rank)
+            hit = np.zeros(source.size, dtype=bool)
+            transmission_hit_kernel(group_start, count, random_num, prob, hit)
+            return hit
+
+        group_start, count = np.repeat(group_start, count), np.repeat(count, count)
+        rank = np.arange(source.size) - group_start
+        random_num = self.draw_uniform('spread_virus_skip', self.adjacency.global_offsets[source].astype(np.int64) + rank)
+        with np.errstate(divide='ignore'):
+            log_prob_miss = np.log1p(-np.minimum(prob, 1))
+            # A probability too small to miss ends the list, as in `transmission_hit_kernel()`
+            gap = np.where(log_prob_miss < 0, np.floor(np.log1p(-random_num) / np.where(log_prob_miss < 0,
+                                                                                       log_prob_miss, -1)), count)
+        # A gap past the end of the list ends it, clipping keeps the sums exact
+        step = 1 + np.minimum(gap, count).astype(np.int64)
+        total = np.cumsum(step)
+        index = total - (total - step)[group_start] - 1
+        hit = np.zeros(source.size, dtype=bool)
+        hit[(group_start + index)[index < count]] = True
+        return hit
+
+    def try_recover_from_infection(self):
+        prob_recover_with_no_complication = 0.70 # Setting: Assumed
+        prob_recover_with_mild_complication = 0.20 # Setting: Assumed
+        prob_recover_with_severe_complication = 0.10 # Setting: Assumed
+        assert 1-(prob_recover_with_no_complication + prob_recover_with_mild_complication + \
+                  prob_recover_with_severe_complication) <= 0.0000001, \
+            'ValueError: `prob_recover_with_{}_complication` not sum to 1.00.'
+
+        index = self.infectious_index
+        recovered = self.select('recover', index, np.where(self.disease_health_state[index] == INFECTIOUS,
+                                                           self.prob['prob_recover'], 0.0))
+        self.disease_health_state[recovered] = RECOVERED
+        self.infectious_symptom_state[recovered] = NONE_STATE
+        recovered, complication = self.choose('recovered_complication', recovered, np.cumsum(
+            [[prob_recover_with_no_complication, prob_recover_with_mild_complication]], axis=1))
+        self.recovered_complication_state[recovered] = complication
+        self.try_gain_immunity_from_recovery(recovered)
+
+    def try_gain_immunity_from_recovery(self, index):
+        immune = self.select('gain_immunity_from_recovery', index, self.model.prob_gain_immunity)
+        self.recovered_immunity_state[immune] = RecoveredImmunityState.WITH_IMMUNITY.value
+
+    def try_check_death(self):
+        index = self.infectious_index
+        dead = self.select('kill_host', index, np.where(self.disease_health_state[index] == INFECTIOUS,
+                                                        self.prob['prob_virus_kill_host'], 0.0))
+        self.disease_health_state[dead] = DEAD
+        self.model.cumulative_dead_cases += self.count_hosts(dead)
+        self.model.cumulative_dead_test_confirmed_cases += self.count_hosts(
+            dead[self.test_result_on_disease_health_state[dead] == TestResultState.TP.value])
+
+    def try_change_infectious_symptom_state(self):
+        index = self.infectious_index
+        still_infectious = self.disease_health_state[index] == INFECTIOUS
+        symptom = self.infectious_symptom_state[index]
+        random_num = self.draw_uniform('change_infectious_symptom', index)
+        # Hosts that recovered or died earlier in the step are sampled from a dummy state and keep their own
+        new_symptom, onset_mild, onset_severe_or_critical = sample_symptom_transitions(
+            np.where(still_infectious, symptom, NO_SYMPTOM), self.prob, random_num,
+            use_kernel=self.model._use_numba_kernels)
+        new_symptom = np.where(still_infectious, new_symptom, symptom)
+        onset_mild = onset_mild & still_infectious
+        onset_severe_or_critical = onset_severe_or_critical & still_infectious
+        self.infectious_symptom_state[index] = new_symptom
+        self._timer_since_beginning_of_last_onset_of_mild_symptom[index[onset_mild]] = 0
+        self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom[index[onset_severe_or_critical]] = 0
+
+    def try_change_recovered_complication_state(self):
+        index = np.flatnonzero(self.disease_health_state == RECOVERED)
+        complication = self.recovered_complication_state[index]
+        random_num = self.draw_uniform('change_recovered_complication', index)
+        new_complication = complication.copy()
+        transitions = [
+            (NO_COMPLICATION, [(MILD_COMPLICATION, self.model.prob_recovered_no_to_mild_complication),
+                               (SEVERE_COMPLICATION, self.model.prob_recovered_no_to_severe_complication)]),
+            (MILD_COMPLICATION, [(NO_COMPLICATION, self.model.prob_recovered_mild_to_no_complication),
+                                 (SEVERE_COMPLICATION, self.model.prob_recovered_mild_to_severe_complication)]),
+            (SEVERE_COMPLICATION, [(NO_COMPLICATION, self.model.prob_recovered_severe_to_no_complication),
+                                   (MILD_COMPLICATION, self.model.prob_recovered_severe_to_mild_complication)])]
+
+        if self.model._use_numba_kernels:
+            # Rows in complication code order
+            to_state = np.array([[to_state for to_state, _ in targets] for _, targets in transitions], dtype=np.int8)
+            to_prob = np.array([[prob for _, prob in targets] for _, targets in transitions], dtype=np.float64)
+            complication_transition_kernel(complication, random_num, to_state, to_prob, new_complication)
+        else:
+            for from_state, targets in transitions:
+                current = complication == from_state
+                lower = 0
+                for to_state, prob_to_state in targets:
+                    upper = lower + prob_to_state
+                    new_complication = np.where(current & (random_num >= lower) & (random_num < upper), to_state,
+                                                new_complication)
+                    lower = upper
+        self.recovered_complication_state[index] = new_complication
+
+    def allocate(self, candidates, available, purpose):
+        '''Hand out `available` units of a resource to `candidates` in random order.'''
+        return candidates[np.argsort(self.draw_uniform(purpose, candidates))][:max(int(available), 0)]
+
+    def try_use_drugX(self):
+        clinical_resource = self.model.clinical_resource
+        needs = (self.disease_health_state == RECOVERED) & (self.recovered_complication_state == SEVERE_COMPLICATION)
+        candidates = np.flatnonzero(needs)
+        num_candidates = self.count_hosts(candidates)
+        receiving = self.allocate(candidates, clinical_resource.total_drugX - clinical_resource.drugX_use_day_tracker,
+                                  'use_drugX')
+        clinical_resource.drugX_maxed_out = self.count_hosts(receiving) < num_candidates
+
+        self.model.cumulative_drugX_use_in_new_host_counts += self.count_hosts(
+            receiving[self.recovered_drugX_state[receiving] != YES])
+        self.recovered_drugX_state[candidates] = NO
+        self.recovered_drugX_state[receiving] = YES
+        self.recovered_drugX_state[(self.recovered_drugX_state == YES) & ~(
+            (self.disease_health_state == RECOVERED) & (self.recovered_complication_state == SEVERE_COMPLICATION))] = NO
+        clinical_resource.drugX_use_day_tracker += self.count_hosts(receiving)
+        self.model.cumulative_drugX_use_in_days += self.count_hosts(receiving)
+
+    def try_use_hospital_bed(self):
+        clinical_resource = self.model.clinical_resource
+        needs = (self.disease_health_state == INFECTIOUS) & (self.infectious_symptom_state == SEVERE_SYMPTOM)
+        in_bed = self.infectious_hospital_bed_state == YES
+        released = in_bed & ~needs
+        self.infectious_hospital_bed_state[released] = NO
+        clinical_resource.hospital_bed_current_load -= self.count_mask(released)
+
+        candidates = np.flatnonzero(needs & ~in_bed)
+        num_candidates = self.count_hosts(candidates)
+        admitted = self.allocate(candidates, clinical_resource.total_hospital_bed -
+                                 clinical_resource.hospital_bed_current_load, 'use_hospital_bed')
+        clinical_resource.hospital_bed_maxed_out = self.count_hosts(admitted) < num_candidates
+        self.infectious_hospital_bed_state[admitted] = YES
+        clinical_resource.hospital_bed_current_load += self.count_hosts(admitted)
+        self.model.cumulative_hospital_bed_use_in_new_host_counts += self.count_hosts(admitted)
+        moved_from_icu = admitted[self.infectious_icu_bed_state[admitted] == YES]
+        self.infectious_icu_bed_state[moved_from_icu] = NO
+        clinical_resource.icu_bed_current_load -= self.count_hosts(moved_from_icu)
+
+        days = self.count_mask(self.infectious_hospital_bed_state == YES)
+        clinical_resource.hospital_bed_use_day_tracker += days
+        self.model.cumulative_hospital_bed_use_in_days += days
+
+    def try_use_icu_bed(self):
+        clinical_resource = self.model.clinical_resource
+        needs = (self.disease_health_state == INFECTIOUS) & (self.infectious_symptom_state == CRITICAL_SYMPTOM)
+        in_icu = self.infectious_icu_bed_state == YES
+        released = in_icu & ~needs
+        self.infectious_icu_bed_state[released] = NO
+        clinical_resource.icu_bed_current_load -= self.count_mask(released)
+
+        candidates = np.flatnonzero(needs & ~in_icu)
+        num_candidates = self.count_hosts(candidates)
+        admitted = self.allocate(candidates, clinical_resource.total_icu_bed - clinical_resource.icu_bed_current_load,
+                                 'use_icu_bed')
+        clinical_resource.icu_bed_maxed_out = self.count_hosts(admitted) < num_candidates
+        self.infectious_icu_bed_state[admitted] = YES
+        clinical_resource.icu_bed_current_load += self.count_hosts(admitted)
+        self.model.cumulative_icu_bed_use_in_new_host_counts += self.count_hosts(admitted)
+        moved_from_bed = admitted[self.infectious_hospital_bed_state[admitted] == YES]
+        self.infectious_hospital_bed_state[moved_from_bed] = NO
+        clinical_resource.hospital_bed_current_load -= self.count_hosts(moved_from_bed)
+
+        days = self.count_mask(self.infectious_icu_bed_state == YES)
+        clinical_resource.icu_bed_use_day_tracker += days
+        self.model.cumulative_icu_bed_use_in_days += days
+
+    def try_use_ventilator(self):
+        clinical_resource = self.model.clinical_resource
+        needs = (self.disease_health_state == INFECTIOUS) & ((self.infectious_symptom_state == SEVERE_SYMPTOM) |
+                                                            (self.infectious_symptom_state == CRITICAL_SYMPTOM))
+        on_ventilator = self.infectious_ventilator_state == YES
+        released = on_ventilator & ~needs
+        self.infectious_ventilator_state[released] = NO
+        clinical_resource.ventilator_current_load -= self.count_mask(released)
+
+        candidates = np.flatnonzero(needs & ~on_ventilator)
+        num_candidates = self.count_hosts(candidates)
+        admitted = self.allocate(candidates, clinical_resource.total_ventilator -
+                                 clinical_resource.ventilator_current_load, 'use_ventilator')
+        clinical_resource.ventilator_maxed_out = self.count_hosts(admitted) < num_candidates
+        self.infectious_ventilator_state[admitted] = YES
+        clinical_resource.ventilator_current_load += self.count_hosts(admitted)
+        self.model.cumulative_ventilator_use_in_new_host_counts += self.count_hosts(admitted)
+
+        days = self.count_mask(self.infectious_ventilator_state == YES)
+        clinical_resource.ventilator_use_day_tracker += days
+        self.model.cumulative_ventilator_use_in_days += days
+
+    def try_gain_immunity_from_vaccine(self):
+        vaccine = self.model.vaccine
+        vaccine.current_time = self.time
+        if not vaccine.check_timing():
+            return
+        slot = vaccine._list_slot_counter
+        suitable = (self.disease_health_state != DEAD) & (self.disease_health_state != INFECTIOUS) & (
+            self.vaccine_immunity_state != VaccineImmunityState.WITH_IMMUNITY.value)
+        immune = self.select('vaccine_suitability', self.all_hosts, np.where(
+            suitable, vaccine.prob_vaccinated[slot] * vaccine.vaccine_success_rate[slot], 0.0))
+        self.vaccine_immunity_state[immune] = VaccineImmunityState.WITH_IMMUNITY.value
+
+    def update_time_variable(self):
+        not_susceptible = self.disease_health_state != SUSCEPTIBLE
+        self._timer_since_beginning_of_last_infection[not_susceptible] += 1
+        self._timer_since_beginning_of_last_infection[~not_susceptible] = NONE_STATE
+
+        symptom = self.infectious_symptom_state
+        self._timer_since_beginning_of_last_onset_of_severe_or_critical_symptom[not_susceptible & (
+            (symptom == SEVERE_SYMPTOM) | (symptom == CRITICAL_SYMPTOM))] += 1
+        self._timer_since_beginning_of_last_onset_of_mild_symptom[not_susceptible & (symptom == MILD_SYMPTOM)] += 1
+
+    def initial_variable_reset(self):
+        self.new_test_done_over_current_time_unit[:] = 0
+
+    def step(self):
+        self.time = self.model._current_timer
+
+        self.initial_variable_reset()
+        self.construct_base_probability()
+        self.update_probability_by_special_condition()
+        self.final_probability_update()
+        if self.model.validate_probability_today:
+            self.validate_probability_setting()
+        self.try_social_distancing()
+        self.try_test_disease_status()
+
+        self.try_infect_neighbors()
+        self.try_recover_from_infection()
+        self.try_check_death()
+        self.try_change_infectious_symptom_state()
+        self.try_change_recovered_complication_state()
+        self.try_use_drugX()
+        self.try_use_hospital_bed()
+        self.try_use_icu_bed()
+        self.try_use_ventilator()
+        self.try_gain_immunity_from_vaccine()
+
+        self.update_time_variable()
+        self.steps += 1
+
+    ### Class helper functions ###
+    def get_agent_count(self):
+        return self.num_hosts
+
+    def count_state(self, attribute, state, exclude_dead=False):
+        '''Number of hosts whose `attribute` array equals `state` (an enum member or its integer code).'''
+        value = state.value if isinstance(state, Enum) else state
+        match = getattr(self, attribute) == value
+        if exclude_dead:
+            match &= self.disease_health_state != DEAD
+        return int(np.count_nonzero(match))
+
+    def count_state_test_confirmed(self, state):
+        return int(np.count_nonzero((self.disease_health_state == state.value) & (
+            self.test_result_on_disease_health_state == TestResultState.TP.value)))
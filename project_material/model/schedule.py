@@ -0,0 +1,202 @@
+import heapq
+import numpy as np
+from mesa.time import BaseScheduler, SimultaneousActivation
+from ..model.state import DiseaseHealthState, RecoveredComplicationState, UseHospitalBedState, UseICUBedState, \
+    UseVentilatorState, UseDrugXState
+
+class ActiveSetActivation(BaseScheduler):
+    '''Random activation over the agents that can change state on the current day.
+
+    The active set holds infectious hosts, recovered hosts whose complication state can still change, hosts
+    holding a clinical resource and hosts with a test result to reset. On a day when testing or vaccination is
+    running, the living hosts whose keyed draws can pick them are stepped as well, see
+    `get_intervention_hosts()`. Other hosts cannot change on their own, so they are skipped and replay the missed
+    days with `HostAgent.catch_up_time_units()` when stepped again. Needs `model.counter_random`.
+    Hosts still in `model.cohort` have no agent, only the ones the day's events reach are materialized.
+    With `model._use_complication_event_queue` on, recovered hosts without severe complication are only stepped
+    on the day their next complication change is due in `model.complication_event_queue`.'''
+    def __init__(self, model):
+        super().__init__(model)
+        self._active_agents = {} # unique_id: agent, kept in insertion order
+
+    def activate(self, agent):
+        '''Add an agent whose state was changed by another agent, e.g. a newly infected neighbor.'''
+        self._active_agents[agent.unique_id] = agent
+
+    def get_active_agents(self):
+        '''Agents in the active set, or all agents before the first step.'''
+        return list(self._active_agents.values()) if self.steps > 0 else self.agents
+
+    def check_intervention_timing(self):
+        '''True if an intervention that any living host may be eligible for runs on the current day.'''
+        true_holder = False
+        for intervention in [self.model.testing, self.model.vaccine]:
+            intervention.current_time = self.model._current_timer
+            if intervention.check_timing():
+                true_holder = True
+        return true_holder
+
+    def get_intervention_hosts(self):
+        '''Ids of the hosts whose testing or vaccine draw of the current day is under the probability of being
+        tested (in the most likely symptom state) or vaccinated. No other host can take part in today's interventions,
+        since `Testing.check_suitability()` and `Vaccine.check_suitability()` compare the same keyed draws.'''
+        time = self.model._current_timer
+        counter_random = self.model.counter_random
+        picked = np.zeros(self.model.num_nodes, dtype=bool)
+
+        testing = self.model.testing
+        testing.current_time = time
+        if testing.check_timing():
+            slot = testing._list_slot_counter
+            picked |= counter_random.uniforms(time, 'testing_suitability') < max(
+                testing.prob_tested_for_no_symptom[slot], testing.prob_tested_for_mild_symptom[slot],
+                testing.prob_tested_for_severe_symptom[slot], testing.prob_tested_for_critical_symptom[slot])
+
+        vaccine = self.model.vaccine
+        vaccine.current_time = time
+        if vaccine.check_timing():
+            picked |= counter_random.uniforms(time, 'vaccine_suitability') < \
+                vaccine.prob_vaccinated[vaccine._list_slot_counter] * vaccine.vaccine_success_rate[vaccine._list_slot_counter]
+        return np.flatnonzero(picked)
+
+    def check_active(self, agent):
+        if agent.disease_health_state is DiseaseHealthState.INFECTIOUS:
+            return True
+
+        if agent.disease_health_state is DiseaseHealthState.RECOVERED:
+            if agent.recovered_complication_state is RecoveredComplicationState.SEVERE_COMPLICATION:
+                return True # Tries to use drugX every day
+            if not self.model._use_complication_event_queue:
+                if agent.recovered_complication_state is RecoveredComplicationState.MILD_COMPLICATION:
+                    return True
+                if (agent.prob_recovered_no_to_mild_complication + agent.prob_recovered_no_to_severe_complication) > 0:
+                    return True
+
+        return ((agent.infectious_hospital_bed_state is UseHospitalBedState.YES) |
+                (agent.infectious_icu_bed_state is UseICUBedState.YES) |
+                (agent.infectious_ventilator_state is UseVentilatorState.YES) |
+                (agent.recovered_drugX_state is UseDrugXState.YES) |
+                (agent.new_test_done_over_current_time_unit is not None))
+
+    def step(self):
+        cohort = self.model.cohort
+        if self.steps == 0:
+            # The active set is built from every agent on the first day
+            if cohort is not None:
+                cohort.materialize_intervention_hosts(self.model._current_timer)
+            agent_keys = [key for key, agent in self._agents.items() if
+                          (agent.disease_health_state is not DiseaseHealthState.DEAD) or self.check_active(agent)]
+        else:
+            agent_keys = list(self._active_agents.keys())
+            if self.check_intervention_timing():
+                if cohort is not None:
+                    cohort.materialize_intervention_hosts(self.model._current_timer)
+                agent_keys += [key for key in self.get_intervention_hosts().tolist() if
+                               (key not in self._active_agents) and (key in self._agents) and
+                               (self._agents[key].disease_health_state is not DiseaseHealthState.DEAD)]
+
+        # Add the hosts with a complication change due today, entries that no longer match the host are dropped
+        queue = self.model.complication_event_queue
+        due_keys = set()
+        while queue and (queue[0][0] <= self.model._current_timer):
+            time_of_change, key = heapq.heappop(queue)
+            if self._agents[key]._time_of_next_complication_change == time_of_change:
+                due_keys.add(key)
+        agent_keys += list(due_keys.difference(agent_keys))
+        if self.model.counter_random is not None:
+            # Activation order keyed on the host, the same on every process for a given run seed
+            activation_keys = self.model.counter_random.uniforms(self.model._current_timer, 'activation_order')
+            agent_keys.sort(key=activation_keys.__getitem__)
+        else:
+            self.model.random_stream.shuffle(agent_keys)
+
+        for key in agent_keys:
+            agent = self._agents[key]
+            agent.catch_up_time_units(self.model._current_timer)
+            agent.step()
+
+        # Newly infected hosts were added to `self._active_agents` while stepping
+        stepped_agents = {key: self._agents[key] for key in agent_keys}
+        stepped_agents.update(self._active_agents)
+        self._active_agents = {key: agent for key, agent in stepped_agents.items() if self.check_active(agent)}
+
+        self.steps += 1
+        self.time += 1
+
+class SynchronousActivation(SimultaneousActivation):
+    '''Two-phase activation of every agent, used when `model._use_synchronous_update` is on.
+
+    In `HostAgent.step()` the infectious agents only read today's states of their neighbors and buffer the
+    infections, so the agents can be stepped in any order or in separate partitions. In `HostAgent.advance()` every
+    agent takes its buffered infection and runs its own behaviours, which only change the agent itself and add to
+    model-wide counters. Requests for a clinical resource are granted once every agent has advanced, in a random
+    order keyed on the host with the draws of `HostPopulation.allocate()`.'''
+    resources = ['drugX', 'hospital_bed', 'icu_bed', 'ventilator']
+
+    def __init__(self, model):
+        super().__init__(model)
+        self._pending_infections = {} # unique_id of the infected agent: (credit draw, spreader)
+        self._prepared_probabilities = {} # unique_id of an infectious agent: its daily probabilities built in `step()`
+        self._resource_requests = {resource: [] for resource in self.resources}
+
+    def buffer_infection(self, agent, spreader, credit):
+        '''Buffer the infection of `agent` by `spreader`, of several spreaders the one with the lowest `credit` is kept.'''
+        current = self._pending_infections.get(agent.unique_id)
+        if (current is None) or (credit < current[0]):
+            self._pending_infections[agent.unique_id] = (credit, spreader)
+
+    def pop_infection(self, agent):
+        '''Spreader credited with the buffered infection of `agent`, `None` if it was not reached.'''
+        infection = self._pending_infections.pop(agent.unique_id, None)
+        return infection[1] if infection is not None else None
+
+    def buffer_probabilities(self, agent, probabilities):
+        '''Keep the daily probabilities `agent` built in the first phase for its `advance()`.'''
+        self._prepared_probabilities[agent.unique_id] = probabilities
+
+    def pop_probabilities(self, agent):
+        '''Daily probabilities `agent` built in the first phase, `None` if it was not infectious then.'''
+        return self._prepared_probabilities.pop(agent.unique_id, None)
+
+    def request_resource(self, resource, agent):
+        self._resource_requests[resource].append(agent)
+
+    def grant_resource_requests(self):
+        clinical_resource = self.model.clinical_resource
+        for resource in self.resources:
+            agents = self._resource_requests[resource]
+            if self.model.counter_random is not None:
+                keys = self.model.counter_random.uniforms_at(self.model._current_timer, 'use_' + resource,
+                                                             [agent.unique_id for agent in agents])
+                agents = [agents[i] for i in np.argsort(keys, kind='stable')]
+            else:
+                self.model.random_stream.shuffle(agents)
+
+            for agent in agents:
+                if resource == 'drugX':
+                    if clinical_resource.check_available_drugX():
+                        agent.start_drugX()
+                    else:
+                        agent.recovered_drugX_state = UseDrugXState.NO
+                elif resource == 'hospital_bed':
+                    if clinical_resource.check_available_hospital_bed():
+                        agent.admit_to_hospital_bed()
+                        agent.count_hospital_bed_day()
+                elif resource == 'icu_bed':
+                    if clinical_resource.check_available_icu_bed():
+                        agent.admit_to_icu_bed()
+                        agent.count_icu_bed_day()
+                elif clinical_resource.check_available_ventilator():
+                    agent.put_on_ventilator()
+                    agent.count_ventilator_day()
+            self._resource_requests[resource] = []
+
+    def step(self):
+        agents = self.agents
+        for agent in agents:
+            agent.step()
+        for agent in agents:
+            agent.advance()
+        self.grant_resource_requests()
+        self.steps += 1
+        self.time += 1
@@ -54,6 +54,10 @@ class RecoveredComplicationState(Enum):
 ##############################
 
 def number_disease_health_state(model, state):
+    if model.population is not None:
+        return model.population.count_state('disease_health_state', state)
+    if model.state_counter is not None:
+        return model.state_counter.count_state('disease_health_state', state)
     return sum([1 for a in model.grid.get_all_cell_contents() if a.disease_health_state is state])
 
 def number_infectious(model):
@@ -69,6 +73,10 @@ def number_dead(model):
     return number_disease_health_state(model, DiseaseHealthState.DEAD)
 
 def number_disease_health_state_test_confirmed(model, state):
+    if model.population is not None:
+        return model.population.count_state_test_confirmed(state)
+    if model.state_counter is not None:
+        return model.state_counter.count_state_test_confirmed(state)
     return sum([1 for a in model.grid.get_all_cell_contents() if ((a.disease_health_state is state) & (
         a.test_result_on_disease_health_state is TestResultState.TP
     ))])
@@ -80,6 +88,10 @@ def number_dead_test_confirmed(model):
     return number_disease_health_state_test_confirmed(model, DiseaseHealthState.DEAD)
 
 def number_infectious_hospital_bed_state(model, state):
+    if model.population is not None:
+        return model.population.count_state('infectious_hospital_bed_state', state, exclude_dead=True)
+    if model.state_counter is not None:
+        return model.state_counter.count_state('infectious_hospital_bed_state', state, exclude_dead=True)
     return sum([1 for a in model.grid.get_all_cell_contents() if ((a.infectious_hospital_bed_state is state) & (
         a.disease_health_state is not DiseaseHealthState.DEAD
     ))])
@@ -88,6 +100,10 @@ def number_infectious_using_hospital_bed(model):
     return number_infectious_hospital_bed_state(model, UseHospitalBedState.YES)
 
 def number_infectious_icu_bed_state(model, state):
+    if model.population is not None:
+        return model.population.count_state('infectious_icu_bed_state', state, exclude_dead=True)
+    if model.state_counter is not None:
+        return model.state_counter.count_state('infectious_icu_bed_state', state, exclude_dead=True)
     return sum([1 for a in model.grid.get_all_cell_contents() if ((a.infectious_icu_bed_state is state) & (
         a.disease_health_state is not DiseaseHealthState.DEAD
     ))])
@@ -96,6 +112,10 @@ def number_infectious_using_icu_bed(model):
     return number_infectious_icu_bed_state(model, UseICUBedState.YES)
 
 def number_infectious_ventilator_state(model, state):
+    if model.population is not None:
+        return model.population.count_state('infectious_ventilator_state', state, exclude_dead=True)
+    if model.state_counter is not None:
+        return model.state_counter.count_state('infectious_ventilator_state', state, exclude_dead=True)
     return sum([1 for a in model.grid.get_all_cell_contents() if ((a.infectious_ventilator_state is state) & (
         a.disease_health_state is not DiseaseHealthState.DEAD
     ))])
@@ -104,6 +124,10 @@ def number_infectious_using_ventilator(model):
     return number_infectious_ventilator_state(model, UseVentilatorState.YES)
 
 def number_recovered_drugX_state(model, state):
+    if model.population is not None:
+        return model.population.count_state('recovered_drugX_state', state, exclude_dead=True)
+    if model.state_counter is not None:
+        return model.state_counter.count_state('recovered_drugX_state', state, exclude_dead=True)
     return sum([1 for a in model.grid.get_all_cell_contents() if ((a.recovered_drugX_state is state) & (
         a.disease_health_state is not DiseaseHealthState.DEAD
     ))])
@@ -112,6 +136,10 @@ def number_recovered_using_drugX(model):
     return number_recovered_drugX_state(model, UseDrugXState.YES)
 
 def number_infectious_symptom_state(model, state):
+    if model.population is not None:
+        return model.population.count_state('infectious_symptom_state', state, exclude_dead=True)
+    if model.state_counter is not None:
+        return model.state_counter.count_state('infectious_symptom_state', state, exclude_dead=True)
     return sum([1 for a in model.grid.get_all_cell_contents() if ((a.infectious_symptom_state is state) & (
         a.disease_health_state is not DiseaseHealthState.DEAD
     ))])
@@ -129,9 +157,17 @@ def number_infectious_critical_symptom(model):
     return number_infectious_symptom_state(model, InfectiousSymptomState.CRITICAL_SYMPTOM)
 
 def number_test_done(model):
+    if model.population is not None:
+        return model.population.count_state('new_test_done_over_current_time_unit', 1)
+    if model.state_counter is not None:
+        return model.state_counter.count_state('new_test_done_over_current_time_unit', 1)
     return sum([1 for a in model.grid.get_all_cell_contents() if a.new_test_done_over_current_time_unit is 1])
 
 def number_test_result(model, state):
+    if model.population is not None:
+        return model.population.count_state('test_result_on_disease_health_state', state)
+    if model.state_counter is not None:
+        return model.state_counter.count_state('test_result_on_disease_health_state', state)
     return sum([1 for a in model.grid.get_all_cell_contents() if a.test_result_on_disease_health_state is state])
 
 def number_test_result_tp(model):
@@ -147,6 +183,10 @@ def number_test_result_fn(model):
     return number_test_result(model, TestResultState.FN)
 
 def number_infectious_immunity_state(model, state):
+    if model.population is not None:
+        return model.population.count_state('recovered_immunity_state', state, exclude_dead=True)
+    if model.state_counter is not None:
+        return model.state_counter.count_state('recovered_immunity_state', state, exclude_dead=True)
     return sum([1 for a in model.grid.get_all_cell_contents() if ((a.recovered_immunity_state is state) & (
         a.disease_health_state is not DiseaseHealthState.DEAD
     ))])
@@ -158,6 +198,10 @@ def number_recovered_without_immunity(model):
     return number_infectious_immunity_state(model, RecoveredImmunityState.WITHOUT_IMMUNITY)
 
 def number_recovered_complication_state(model, state):
+    if model.population is not None:
+        return model.population.count_state('recovered_complication_state', state, exclude_dead=True)
+    if model.state_counter is not None:
+        return model.state_counter.count_state('recovered_complication_state', state, exclude_dead=True)
     return sum([1 for a in model.grid.get_all_cell_contents() if ((a.recovered_complication_state is state) & (
         a.disease_health_state is not DiseaseHealthState.DEAD
     ))])
@@ -169,4 +213,86 @@ def number_recovered_mild_complication(model):
     return number_recovered_complication_state(model, RecoveredComplicationState.MILD_COMPLICATION)
 
 def number_recovered_severe_complication(model):
-    return number_recovered_complication_state(model, RecoveredComplicationState.SEVERE_COMPLICATION)
\ No newline at end of file
+    return number_recovered_complication_state(model, RecoveredComplicationState.SEVERE_COMPLICATION)
+
+##############################
+####### State counter ########
+##############################
+
+class StateCounter():
+    '''Number of hosts in each state, kept up to date by `HostAgent` on every state change so that the reporters
+    above read a count instead of scanning every host. Keys are `(attribute, state, is_dead)`, plus
+    `('test_confirmed', disease_health_state, is_dead)` for hosts with a TP test result.'''
+    tracked_attributes = [
+        'disease_health_state',
+        'infectious_symptom_state',
+        'recovered_complication_state',
+        'recovered_immunity_state',
+        'infectious_hospital_bed_state',
+        'infectious_icu_bed_state',
+        'infectious_ventilator_state',
+        'recovered_drugX_state',
+        'test_result_on_disease_health_state',
+        'new_test_done_over_current_time_unit',
+    ]
+
+    def __init__(self):
+        self.counts = {}
+
+    def _increment(self, key, value):
+        self.counts[key] = self.counts.get(key, 0) + value
+
+    def add(self, agent, value=1, disease_health_state=None):
+        if disease_health_state is None:
+            disease_health_state = agent.disease_health_state
+        is_dead = disease_health_state is DiseaseHealthState.DEAD
+        for attribute in self.tracked_attributes:
+            state = disease_health_state if attribute == 'disease_health_state' else getattr(agent, attribute)
+            self._increment((attribute, state, is_dead), value)
+        if agent.test_result_on_disease_health_state is TestResultState.TP:
+            self._increment(('test_confirmed', disease_health_state, is_dead), value)
+
+    def remove(self, agent):
+        self.add(agent, value=-1)
+
+    def update(self, agent, attribute, state):
+        '''Move `agent` from its current `attribute` state to `state`, called before the attribute is set.'''
+        current_state = getattr(agent, attribute)
+        if current_state is state:
+            return
+
+        is_dead = agent.disease_health_state is DiseaseHealthState.DEAD
+        if attribute == 'disease_health_state':
+            # Every count that excludes dead hosts depends on the disease health state
+            self.remove(agent)
+            self.add(agent, disease_health_state=state)
+            return
+
+        self._increment((attribute, current_state, is_dead), -1)
+        self._increment((attribute, state, is_dead), 1)
+        if attribute == 'test_result_on_disease_health_state':
+            if current_state is TestResultState.TP:
+                self._increment(('test_confirmed', agent.disease_health_state, is_dead), -1)
+            if state is TestResultState.TP:
+                self._increment(('test_confirmed', agent.disease_health_state, is_dead), 1)
+
+    def count_state(self, attribute, state, exclude_dead=False):
+        count = self.counts.get((attribute, state, False), 0)
+        if not exclude_dead:
+            count += self.counts.get((attribute, state, True), 0)
+        return count
+
+    def count_state_test_confirmed(self, state):
+        return self.count_state('test_confirmed', state)
+
+    def cross_check(self, agents, cohort=None):
+        '''Compare the counts against a full scan of `agents` and of the hosts in `cohort`, for debugging.'''
+        scan = StateCounter()
+        if cohort is not None:
+            cohort.add_to_state_counter(scan)
+        for agent in agents:
+            scan.add(agent)
+        for key in set(self.counts) | set(scan.counts):
+            assert self.counts.get(key, 0) == scan.counts.get(key, 0), \
+                'ValueError: `StateCounter` count for {} is {}, a full scan gives {}.'.format(
+                    key, self.counts.get(key, 0), scan.counts.get(key, 0))
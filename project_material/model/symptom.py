@@ -0,0 +1,70 @@
+import numpy as np
+from ..model.state import InfectiousSymptomState
+from ..model.kernel import symptom_transition_kernel
+
+NO_SYMPTOM = InfectiousSymptomState.NO_SYMPTOM.value
+MILD_SYMPTOM = InfectiousSymptomState.MILD_SYMPTOM.value
+SEVERE_SYMPTOM = InfectiousSymptomState.SEVERE_SYMPTOM.value
+CRITICAL_SYMPTOM = InfectiousSymptomState.CRITICAL_SYMPTOM.value
+
+# Row `s` of the 4x4 kernel lists the next states of a host in symptom state `s` in inverse-CDF order:
+# the other three states by code, then staying in `s` with the remaining probability
+SYMPTOM_SAMPLING_ORDER = [
+    [MILD_SYMPTOM, SEVERE_SYMPTOM, CRITICAL_SYMPTOM, NO_SYMPTOM],
+    [NO_SYMPTOM, SEVERE_SYMPTOM, CRITICAL_SYMPTOM, MILD_SYMPTOM],
+    [NO_SYMPTOM, MILD_SYMPTOM, CRITICAL_SYMPTOM, SEVERE_SYMPTOM],
+    [NO_SYMPTOM, MILD_SYMPTOM, SEVERE_SYMPTOM, CRITICAL_SYMPTOM],
+]
+
+# Probability attribute of each move, in the order of `SYMPTOM_SAMPLING_ORDER`
+SYMPTOM_TRANSITION_ATTRIBUTES = [
+    ['prob_infectious_no_to_mild_symptom', 'prob_infectious_no_to_severe_symptom',
+     'prob_infectious_no_to_critical_symptom'],
+    ['prob_infectious_mild_to_no_symptom', 'prob_infectious_mild_to_severe_symptom',
+     'prob_infectious_mild_to_critical_symptom'],
+    ['prob_infectious_severe_to_no_symptom', 'prob_infectious_severe_to_mild_symptom',
+     'prob_infectious_severe_to_critical_symptom'],
+    ['prob_infectious_critical_to_no_symptom', 'prob_infectious_critical_to_mild_symptom',
+     'prob_infectious_critical_to_severe_symptom'],
+]
+
+def symptom_transition_rows(symptom, prob):
+    '''Row of the 4x4 kernel for every host, as an array of shape `(len(symptom), 4)` in the order of
+    `SYMPTOM_SAMPLING_ORDER`. `prob` maps each name in `SYMPTOM_TRANSITION_ATTRIBUTES` to an array over the hosts.'''
+    symptom = np.asarray(symptom, dtype=np.int64)
+    moves = np.stack([np.stack([np.broadcast_to(prob[name], symptom.shape) for name in names], axis=-1)
+                      for names in SYMPTOM_TRANSITION_ATTRIBUTES])
+    rows = np.empty((symptom.size, 4))
+    rows[:, :3] = moves[symptom, np.arange(symptom.size)]
+    rows[:, 3] = 1 - rows[:, :3].sum(axis=1)
+    return rows
+
+def sample_symptom_transitions(symptom, prob, random_num, use_kernel=False):
+    '''Next symptom state of every host in one inverse-CDF pass over `symptom_transition_rows()`, with one uniform
+    per host in `random_num`. Returns `(new_symptom, onset_mild, onset_severe_or_critical)`, the last two being
+    masks of the hosts whose onset timers restart. `use_kernel` runs the same pass as `symptom_transition_kernel()`.'''
+    symptom = np.asarray(symptom, dtype=np.int64)
+    if use_kernel:
+        moves = tuple(np.ascontiguousarray(np.broadcast_to(np.asarray(prob[name], dtype=np.float64), symptom.shape))
+                      for names in SYMPTOM_TRANSITION_ATTRIBUTES for name in names)
+        new_symptom = np.empty_like(symptom)
+        onset_mild = np.empty(symptom.size, dtype=bool)
+        onset_severe_or_critical = np.empty(symptom.size, dtype=bool)
+        symptom_transition_kernel(symptom, moves, np.asarray(random_num, dtype=np.float64),
+                                  np.array(SYMPTOM_SAMPLING_ORDER, dtype=np.int64), new_symptom, onset_mild,
+                                  onset_severe_or_critical)
+        return new_symptom, onset_mild, onset_severe_or_critical
+
+    cumulative = np.cumsum(symptom_transition_rows(symptom, prob)[:, :3], axis=1)
+    return apply_symptom_choice(symptom, (np.asarray(random_num)[:, None] >= cumulative).sum(axis=1))
+
+def apply_symptom_choice(symptom, choice):
+    '''`sample_symptom_transitions()` outputs for hosts whose column `choice` of `SYMPTOM_SAMPLING_ORDER` is drawn.'''
+    symptom = np.asarray(symptom, dtype=np.int64)
+    new_symptom = np.array(SYMPTOM_SAMPLING_ORDER)[symptom, choice]
+
+    changed = new_symptom != symptom
+    onset_mild = changed & (new_symptom == MILD_SYMPTOM)
+    onset_severe_or_critical = changed & ((symptom == NO_SYMPTOM) | (symptom == MILD_SYMPTOM)) & (
+        (new_symptom == SEVERE_SYMPTOM) | (new_symptom == CRITICAL_SYMPTOM))
+    return new_symptom, onset_mild, onset_severe_or_critical
@@ -98,6 +98,16 @@ def track_params(model):
         model.ventilator_cost_per_day,
         model.drugX_capacity_as_percent_of_population,
         model.drugX_cost_per_day,
+        model.modifier_from_hypertension,
+        model.modifier_from_diabetes,
+        model.modifier_from_ihd,
+        model.modifier_from_asthma,
+        model.modifier_from_cancer,
+        model.modifier_from_old_age,
+        model.modifier_from_severe_symptom,
+        model.modifier_from_critical_symptom,
+        model.modifier_from_critical_symptom_extra,
+        model.modifier_from_absence_of_adequate_care,
     )
 
 def track_run(model):
@@ -203,6 +213,22 @@ class BatchHostNetwork(HostNetwork):
 
                     drugX_capacity_as_percent_of_population,
                     drugX_cost_per_day,
+
+                    modifier_from_hypertension=0.05,
+                    modifier_from_diabetes=0.05,
+                    modifier_from_ihd=0.05,
+                    modifier_from_asthma=0.05,
+                    modifier_from_cancer=0.05,
+                    modifier_from_old_age=0.05,
+                    modifier_from_severe_symptom=0.05,
+                    modifier_from_critical_symptom=0.05,
+                    modifier_from_critical_symptom_extra=0.05/2,
+                    modifier_from_absence_of_adequate_care=0.05,
+
+                    engine='agent',
+                    seed=None,
+                    validation_level='full',
+                    validation_sample_rate=0.05,
                  ):
 
         super().__init__(
@@ -302,6 +328,22 @@ class BatchHostNetwork(HostNetwork):
 
             drugX_capacity_as_percent_of_population,
             drugX_cost_per_day,
+
+            modifier_from_hypertension=modifier_from_hypertension,
+            modifier_from_diabetes=modifier_from_diabetes,
+            modifier_from_ihd=modifier_from_ihd,
+            modifier_from_asthma=modifier_from_asthma,
+            modifier_from_cancer=modifier_from_cancer,
+            modifier_from_old_age=modifier_from_old_age,
+            modifier_from_severe_symptom=modifier_from_severe_symptom,
+            modifier_from_critical_symptom=modifier_from_critical_symptom,
+            modifier_from_critical_symptom_extra=modifier_from_critical_symptom_extra,
+            modifier_from_absence_of_adequate_care=modifier_from_absence_of_adequate_care,
+
+            engine=engine,
+            seed=seed,
+            validation_level=validation_level,
+            validation_sample_rate=validation_sample_rate,
         )
 
         self.model_reporters_dict.update({'Model params': track_params, 'Run': track_run})
@@ -404,6 +446,21 @@ br_params = {
     'ventilator_cost_per_day': [100],
     'drugX_capacity_as_percent_of_population': [0.1],
     'drugX_cost_per_day': [20],
+
+    'modifier_from_hypertension': [0.05], # Setting: Assumed
+    'modifier_from_diabetes': [0.05], # Setting: Assumed
+    'modifier_from_ihd': [0.05], # Setting: Assumed
+    'modifier_from_asthma': [0.05], # Setting: Assumed
+    'modifier_from_cancer': [0.05], # Setting: Assumed
+    'modifier_from_old_age': [0.05], # Setting: Assumed
+    'modifier_from_severe_symptom': [0.05], # Setting: Assumed
+    'modifier_from_critical_symptom': [0.05], # Setting: Assumed
+    'modifier_from_critical_symptom_extra': [0.05/2], # Setting: Assumed
+    'modifier_from_absence_of_adequate_care': [0.05], # Setting: Assumed
+
+    'engine': ['agent'], # Setting: 'agent' or 'vectorized' (NumPy arrays, for large `num_nodes`)
+    'validation_level': ['full'], # Setting: 'full', 'sampled' (on a fraction `validation_sample_rate` of days) or 'off'
+    'validation_sample_rate': [0.05], # Setting: Only read when `validation_level` is 'sampled'
 }
 
 start_date = datetime.datetime(2020, 2, 20) # Setting
@@ -0,0 +1,104 @@
+import pytest
+from project_material.model.network import HostNetwork
+
+# First value of every required `HostNetwork` parameter in `br_params` of `run_batch.py`
+MODEL_PARAMS = {
+    'num_nodes': 500,
+    'avg_node_degree': 10,
+    'initial_outbreak_size': 2,
+    'prob_spread_virus_gamma_shape': 1,
+    'prob_spread_virus_gamma_scale': 3,
+    'prob_spread_virus_gamma_loc': 0,
+    'prob_spread_virus_gamma_magnitude_multiplier': 0.25,
+    'prob_recover_gamma_shape': 7,
+    'prob_recover_gamma_scale': 3,
+    'prob_recover_gamma_loc': 0,
+    'prob_recover_gamma_magnitude_multiplier': 0.75,
+    'prob_virus_kill_host_gamma_shape': 5.2,
+    'prob_virus_kill_host_gamma_scale': 3.2,
+    'prob_virus_kill_host_gamma_loc': 0,
+    'prob_virus_kill_host_gamma_magnitude_multiplier': 0.069,
+    'prob_infectious_no_to_mild_symptom_gamma_shape': 4.1,
+    'prob_infectious_no_to_mild_symptom_gamma_scale': 1,
+    'prob_infectious_no_to_mild_symptom_gamma_loc': 0,
+    'prob_infectious_no_to_mild_symptom_gamma_magnitude_multiplier': 0.75,
+    'prob_infectious_no_to_severe_symptom_gamma_shape': 1,
+    'prob_infectious_no_to_severe_symptom_gamma_scale': 2,
+    'prob_infectious_no_to_severe_symptom_gamma_loc': 0,
+    'prob_infectious_no_to_severe_symptom_gamma_magnitude_multiplier': 0.1,
+    'prob_infectious_no_to_critical_symptom_gamma_shape': 1,
+    'prob_infectious_no_to_critical_symptom_gamma_scale': 2.8,
+    'prob_infectious_no_to_critical_symptom_gamma_loc': 0,
+    'prob_infectious_no_to_critical_symptom_gamma_magnitude_multiplier': 0.15,
+    'prob_infectious_mild_to_no_symptom_gamma_shape': 3,
+    'prob_infectious_mild_to_no_symptom_gamma_scale': 3,
+    'prob_infectious_mild_to_no_symptom_gamma_loc': 0,
+    'prob_infectious_mild_to_no_symptom_gamma_magnitude_multiplier': 0.25,
+    'prob_infectious_mild_to_severe_symptom_gamma_shape': 4.9,
+    'prob_infectious_mild_to_severe_symptom_gamma_scale': 2.2,
+    'prob_infectious_mild_to_severe_symptom_gamma_loc': 0,
+    'prob_infectious_mild_to_severe_symptom_gamma_magnitude_multiplier': 0.11,
+    'prob_infectious_mild_to_critical_symptom_gamma_shape': 3.3,
+    'prob_infectious_mild_to_critical_symptom_gamma_scale': 3.1,
+    'prob_infectious_mild_to_critical_symptom_gamma_loc': 0,
+    'prob_infectious_mild_to_critical_symptom_gamma_magnitude_multiplier': 0.11,
+    'prob_infectious_severe_to_no_symptom_gamma_shape': 3,
+    'prob_infectious_severe_to_no_symptom_gamma_scale': 2,
+    'prob_infectious_severe_to_no_symptom_gamma_loc': 0,
+    'prob_infectious_severe_to_no_symptom_gamma_magnitude_multiplier': 0.001,
+    'prob_infectious_severe_to_mild_symptom_gamma_shape': 5,
+    'prob_infectious_severe_to_mild_symptom_gamma_scale': 3,
+    'prob_infectious_severe_to_mild_symptom_gamma_loc': 0,
+    'prob_infectious_severe_to_mild_symptom_gamma_magnitude_multiplier': 0.001,
+    'prob_infectious_severe_to_critical_symptom_gamma_shape': 7,
+    'prob_infectious_severe_to_critical_symptom_gamma_scale': 3,
+    'prob_infectious_severe_to_critical_symptom_gamma_loc': 0,
+    'prob_infectious_severe_to_critical_symptom_gamma_magnitude_multiplier': 0.01,
+    'prob_infectious_critical_to_no_symptom_gamma_shape': 7,
+    'prob_infectious_critical_to_no_symptom_gamma_scale': 1,
+    'prob_infectious_critical_to_no_symptom_gamma_loc': 0,
+    'prob_infectious_critical_to_no_symptom_gamma_magnitude_multiplier': 0.001,
+    'prob_infectious_critical_to_mild_symptom_gamma_shape': 4,
+    'prob_infectious_critical_to_mild_symptom_gamma_scale': 2,
+    'prob_infectious_critical_to_mild_symptom_gamma_loc': 0,
+    'prob_infectious_critical_to_mild_symptom_gamma_magnitude_multiplier': 0.001,
+    'prob_infectious_critical_to_severe_symptom_gamma_shape': 5,
+    'prob_infectious_critical_to_severe_symptom_gamma_scale': 2,
+    'prob_infectious_critical_to_severe_symptom_gamma_loc': 0,
+    'prob_infectious_critical_to_severe_symptom_gamma_magnitude_multiplier': 0.25,
+    'prob_recovered_no_to_mild_complication': 0.016,
+    'prob_recovered_no_to_severe_complication': 0,
+    'prob_recovered_mild_to_no_complication': 0.02,
+    'prob_recovered_mild_to_severe_complication': 0.02,
+    'prob_recovered_severe_to_no_complication': 0.001,
+    'prob_recovered_severe_to_mild_complication': 0.001,
+    'prob_gain_immunity': 0.005,
+    'hospital_bed_capacity_as_percent_of_population': 0.1,
+    'hospital_bed_cost_per_day': 2000,
+    'icu_bed_capacity_as_percent_of_population': 0.1,
+    'icu_bed_cost_per_day': 3000,
+    'ventilator_capacity_as_percent_of_population': 0.1,
+    'ventilator_cost_per_day': 100,
+    'drugX_capacity_as_percent_of_population': 0.1,
+    'drugX_cost_per_day': 20,
+}
+
+class ConfiguredHostNetwork(HostNetwork):
+    '''`HostNetwork` with some of the settings hard-coded in `HostNetwork.__init__()` replaced by `settings`.'''
+    settings = {}
+
+    def __setattr__(self, key, value):
+        super().__setattr__(key, self.settings.get(key, value))
+
+@pytest.fixture
+def build_model():
+    '''`HostNetwork` with `MODEL_PARAMS` on `num_nodes` hosts, other arguments as for `HostNetwork`. `settings` replaces
+    the `# Setting:` attributes of the same name.'''
+    def build(num_nodes=300, seed=7, engine='vectorized', settings=None, **kwargs):
+        params = dict(MODEL_PARAMS, num_nodes=num_nodes, seed=seed, engine=engine)
+        params.update(kwargs)
+        if settings:
+            return type('ConfiguredHostNetwork', (ConfiguredHostNetwork,), {'settings': settings})(**params)
+        return HostNetwork(**params)
+
+    return build
@@ -0,0 +1,32 @@
+import pytest
+from project_material.model.agent import DAILY_PROBABILITY_ATTRIBUTES
+from project_material.model.state import DiseaseHealthState
+
+def test_memo_entry_built_without_validation_is_validated_when_read(build_model):
+    model = build_model(engine='agent', validation_level='sampled', validation_sample_rate=0.5)
+    agent = next(agent for agent in model.host_agents if
+                 (agent is not None) and (agent.disease_health_state is DiseaseHealthState.INFECTIOUS))
+    model.validate_probability_today = False
+    agent.construct_daily_probability()
+    (key, (probabilities, rescale_count, is_validated)), = model.probability_memo.table.items()
+    assert not is_validated
+
+    # An entry that fails validation is reused as is until a validation day
+    position = DAILY_PROBABILITY_ATTRIBUTES.index('prob_infectious_no_symptom_maintained')
+    probabilities = probabilities[:position] + (-0.5,) + probabilities[position + 1:]
+    model.probability_memo.put(key, (probabilities, rescale_count, False))
+    agent.construct_daily_probability()
+    model.validate_probability_today = True
+    with pytest.raises(AssertionError):
+        agent.construct_daily_probability()
+
+def test_memo_entry_is_validated_once(build_model):
+    model = build_model(engine='agent')
+    agent = next(agent for agent in model.host_agents if
+                 (agent is not None) and (agent.disease_health_state is DiseaseHealthState.INFECTIOUS))
+    model.validate_probability_today = False
+    agent.construct_daily_probability()
+    model.validate_probability_today = True
+    agent.construct_daily_probability()
+    (_, (_, _, is_validated)), = model.probability_memo.table.items()
+    assert is_validated
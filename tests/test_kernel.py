@@ -0,0 +1,166 @@
+import numpy as np
+import pytest
+from project_material.model.kernel import symptom_transition_kernel, rescale_transition_kernel, \
+    complication_transition_kernel, transmission_hit_kernel
+from project_material.model.population import NONE_STATE, INFECTIOUS, RECOVERED, NO_COMPLICATION, \
+    MILD_COMPLICATION, SEVERE_COMPLICATION
+from project_material.model.symptom import SYMPTOM_SAMPLING_ORDER, SYMPTOM_TRANSITION_ATTRIBUTES, \
+    sample_symptom_transitions
+
+# Without numba the kernels are the plain Python functions, compared to the same NumPy paths
+
+def test_symptom_transition_kernel():
+    num_hosts = 400
+    rng = np.random.default_rng(1)
+    symptom = np.repeat(np.arange(4), num_hosts // 4)
+    prob = {name: rng.uniform(0, 0.3, num_hosts) for names in SYMPTOM_TRANSITION_ATTRIBUTES for name in names}
+    random_num = rng.random(num_hosts)
+
+    moves = tuple(prob[name] for names in SYMPTOM_TRANSITION_ATTRIBUTES for name in names)
+    new_symptom = np.empty_like(symptom)
+    onset_mild = np.empty(num_hosts, dtype=bool)
+    onset_severe_or_critical = np.empty(num_hosts, dtype=bool)
+    symptom_transition_kernel(symptom, moves, random_num, np.array(SYMPTOM_SAMPLING_ORDER, dtype=np.int64),
+                              new_symptom, onset_mild, onset_severe_or_critical)
+
+    expected = sample_symptom_transitions(symptom, prob, random_num)
+    np.testing.assert_array_equal(new_symptom, expected[0])
+    np.testing.assert_array_equal(onset_mild, expected[1])
+    np.testing.assert_array_equal(onset_severe_or_critical, expected[2])
+    assert (new_symptom != symptom).any()
+
+def test_rescale_transition_kernel(build_model):
+    model = build_model()
+    population = model.population
+    num_hosts = 200
+    rng = np.random.default_rng(2)
+    population.infectious_index = np.arange(num_hosts)
+    # Some rows sum over 1 and are rescaled
+    prob = {name: rng.uniform(0, 0.6, num_hosts) for names in SYMPTOM_TRANSITION_ATTRIBUTES for name in names}
+
+    results = []
+    for use_kernel in [True, False]:
+        model._use_numba_kernels = use_kernel
+        model.probability_rescale_count = 0
+        population.prob = {name: values.copy() for name, values in prob.items()}
+        population.final_probability_update()
+        results.append((population.prob, model.probability_rescale_count))
+
+    (kernel_prob, kernel_count), (numpy_prob, numpy_count) = results
+    assert kernel_count == numpy_count > 0
+    assert kernel_prob.keys() == numpy_prob.keys()
+    for name in numpy_prob:
+        np.testing.assert_allclose(kernel_prob[name], numpy_prob[name], rtol=0, atol=1e-15)
+
+    # Kernel called directly on one row
+    prob_a, prob_b, prob_c = (prob[name].copy() for name in SYMPTOM_TRANSITION_ATTRIBUTES[0])
+    maintained = np.empty(num_hosts)
+    rescale = np.empty(num_hosts, dtype=bool)
+    count = rescale_transition_kernel(prob_a, prob_b, prob_c, maintained, rescale)
+    assert count == np.count_nonzero(rescale)
+    np.testing.assert_allclose(maintained, numpy_prob['prob_infectious_no_symptom_maintained'], rtol=0, atol=1e-15)
+
+def test_complication_transition_kernel(build_model):
+    model = build_model()
+    population = model.population
+    num_hosts = population.num_hosts
+    for attribute in ['prob_recovered_no_to_mild_complication', 'prob_recovered_no_to_severe_complication',
+                      'prob_recovered_mild_to_no_complication', 'prob_recovered_mild_to_severe_complication',
+                      'prob_recovered_severe_to_no_complication', 'prob_recovered_severe_to_mild_complication']:
+        setattr(model, attribute, 0.2)
+    disease_health_state = np.where(np.arange(num_hosts) % 5 == 0, INFECTIOUS, RECOVERED).astype(np.int8)
+    complication = np.array([NONE_STATE, NO_COMPLICATION, MILD_COMPLICATION, SEVERE_COMPLICATION],
+                            dtype=np.int8)[np.arange(num_hosts) % 4]
+
+    results = []
+    for use_kernel in [True, False]:
+        model._use_numba_kernels = use_kernel
+        population.disease_health_state = disease_health_state.copy()
+        population.recovered_complication_state = complication.copy()
+        population.try_change_recovered_complication_state()
+        results.append(population.recovered_complication_state)
+
+    np.testing.assert_array_equal(results[0], results[1])
+    assert (results[1] != complication).any()
+
+    # Kernel called directly, `NONE_STATE` is kept
+    random_num = np.linspace(0, 1, 12, endpoint=False)
+    state = np.array([NONE_STATE, NO_COMPLICATION, MILD_COMPLICATION, SEVERE_COMPLICATION] * 3, dtype=np.int8)
+    to_state = np.array([[MILD_COMPLICATION, SEVERE_COMPLICATION], [NO_COMPLICATION, SEVERE_COMPLICATION],
+                         [NO_COMPLICATION, MILD_COMPLICATION]], dtype=np.int8)
+    to_prob = np.full((3, 2), 0.3)
+    new_complication = np.empty_like(state)
+    complication_transition_kernel(state, random_num, to_state, to_prob, new_complication)
+    expected = state.copy()
+    for i in range(state.size):
+        if (state[i] != NONE_STATE) and (random_num[i] < 0.6):
+            expected[i] = to_state[state[i], int(random_num[i] >= 0.3)]
+    np.testing.assert_array_equal(new_complication, expected)
+
+# Probabilities under the machine epsilon come from the gamma tail of long infections, `1 - prob` rounds to 1
+@pytest.mark.parametrize('group_prob', [[0.3, 0.05, 1.0, 0.7], [0.01, 0.5, 0.9, 0.2], [5e-17, 0.5, 1e-30, 0.2]])
+def test_transmission_hit_kernel(build_model, group_prob):
+    model = build_model()
+    population = model.population
+    # Exposed edges of four spreaders, grouped by spreader
+    group_size = np.array([1, 7, 4, 6])
+    source = np.repeat(np.array([3, 10, 11, 40]), group_size)
+    prob = np.repeat(np.array(group_prob), group_size)
+
+    hits = []
+    for use_kernel in [True, False]:
+        model._use_numba_kernels = use_kernel
+        hits.append(population.draw_transmission_hits(source, prob))
+    np.testing.assert_array_equal(hits[0], hits[1])
+    # A spreader with probability 1 infects all its exposed edges, one under the machine epsilon none of them
+    np.testing.assert_array_equal(hits[0][prob == 1.0], True)
+    np.testing.assert_array_equal(hits[0][prob < np.finfo(float).eps], False)
+
+    # Kernel called directly, hits are at the summed gaps
+    random_num = np.array([0.5, 0.99, 0.5, 0.5, 0.75, 0.1, 0.1])
+    hit = np.zeros(random_num.size, dtype=bool)
+    transmission_hit_kernel(np.array([0, 4]), np.array([4, 3]), random_num, np.full(7, 0.5), hit)
+    # Gaps of floor(log(1 - draw) / log(0.5)): 1 then 6 past the end, 2 then past the end
+    np.testing.assert_array_equal(hit, [False, True, False, False, False, False, True])
+
+@pytest.mark.parametrize('prob_spread_virus', [5e-17, 1e-300, 0.0])
+def test_agent_transmission_hits_with_tiny_probability(build_model, prob_spread_virus):
+    model = build_model(engine='agent')
+    agent = next(agent for agent in model.host_agents if agent is not None)
+    agent.prob_spread_virus = prob_spread_virus
+    assert agent.draw_transmission_hits(8) == []
+
+@pytest.mark.parametrize('engine', ['vectorized', 'agent'])
+def test_kernels_match_numpy_run(build_model, engine):
+    outputs = []
+    for use_kernel in [True, False]:
+        model = build_model(num_nodes=600, seed=3, engine=engine)
+        model._use_numba_kernels = use_kernel
+        model._use_symptom_kernel_prepass = True # Agent engine, the only kernel it runs
+        for _ in range(40):
+            model.step()
+        outputs.append(model.datacollector.get_model_vars_dataframe())
+
+    assert outputs[0].equals(outputs[1])
+    assert outputs[1]['Cumulative infectious'].iloc[-1] > 10
+
+def test_symptom_prepass_matches_agent_steps(build_model):
+    outputs = []
+    for use_prepass in [True, False]:
+        model = build_model(num_nodes=600, seed=3, engine='agent')
+        model._use_symptom_kernel_prepass = use_prepass
+        for _ in range(40):
+            model.step()
+        outputs.append(model.datacollector.get_model_vars_dataframe())
+
+    # Memo hits and misses included, the prepass builds the probabilities of the day once
+    assert outputs[0].equals(outputs[1])
+    assert outputs[1]['Probability memo hits'].iloc[-1] > 0
+
+def test_kernels_are_compiled_with_numba(build_model):
+    numba = pytest.importorskip('numba')
+    kernels = [symptom_transition_kernel, rescale_transition_kernel, complication_transition_kernel,
+               transmission_hit_kernel]
+    assert all(numba.extending.is_jitted(kernel) for kernel in kernels)
+    # On by default, so the tests above compare the compiled loops with the NumPy paths
+    assert build_model()._use_numba_kernels
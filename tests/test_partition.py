@@ -0,0 +1,58 @@
+import multiprocessing
+import pytest
+
+def run_model(model, num_steps):
+    try:
+        for _ in range(num_steps):
+            model.step()
+    finally:
+        if model._num_partitions > 1:
+            model.population.close()
+    return model.datacollector.get_model_vars_dataframe()
+
+@pytest.mark.parametrize('num_partitions', [2, 3])
+def test_partitioned_run_matches_default_run(build_model, num_partitions):
+    params = dict(num_nodes=1500, seed=5, hospital_bed_capacity_as_percent_of_population=0.002,
+                  icu_bed_capacity_as_percent_of_population=0.001)
+    # The default run picks the transmission direction each day, the partitioned one always pushes
+    default = build_model(**params)
+    assert default._transmission_direction == 'auto'
+    expected = run_model(default, 50)
+
+    partitioned = build_model(settings={'_num_partitions': num_partitions}, **params)
+    assert partitioned._transmission_direction == 'push'
+    output = run_model(partitioned, 50)
+
+    assert output.equals(expected)
+    assert expected['Cumulative infectious'].iloc[-1] > 100
+
+def test_changes_after_construction_reach_the_parts(build_model):
+    params = dict(num_nodes=1500, seed=5)
+    models = [build_model(**params), build_model(settings={'_num_partitions': 2}, **params)]
+    unchanged = run_model(build_model(**params), 40)
+    for model in models:
+        social_distancing = model.social_distancing
+        social_distancing.on_switch = True
+        social_distancing.time_period = [(10, 999)]
+        social_distancing.edge_threshold = [0.5]
+    expected, output = [run_model(model, 40) for model in models]
+
+    assert output.equals(expected)
+    assert expected['Cumulative infectious'].iloc[-1] < unchanged['Cumulative infectious'].iloc[-1]
+
+def test_daemon_process_fails_fast(build_model):
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+
+    def build():
+        try:
+            build_model(num_nodes=300, settings={'_num_partitions': 2})
+            queue.put('')
+        except AssertionError as error:
+            queue.put(str(error))
+
+    process = context.Process(target=build, daemon=True)
+    process.start()
+    message = queue.get(timeout=60)
+    process.join()
+    assert 'daemon process' in message
@@ -0,0 +1,22 @@
+import numpy as np
+from project_material.helper.probability import CounterBasedRandom
+
+def test_chunked_draws_match_whole_block():
+    num_edge_positions = 10 * CounterBasedRandom.chunk_size + 3
+    whole_block = CounterBasedRandom(5, 100, num_edge_positions).generator(4, 'spread_virus').random(
+        num_edge_positions)
+    index = np.array([3, 700, 2000, 5, 2001])
+
+    counter_random = CounterBasedRandom(5, 100, num_edge_positions)
+    np.testing.assert_array_equal(counter_random.uniforms_at(4, 'spread_virus', index), whole_block[index])
+    assert counter_random.uniform(4, 'spread_virus', num_edge_positions - 1) == whole_block[-1]
+    np.testing.assert_array_equal(counter_random.uniforms_between(4, 'spread_virus', 250, 900), whole_block[250:900])
+    # Only the chunks read so far were generated
+    assert not counter_random.get_block(4, 'spread_virus')[1].all()
+    np.testing.assert_array_equal(counter_random.uniforms(4, 'spread_virus'), whole_block)
+
+def test_draws_are_kept_for_the_latest_time_unit_only():
+    counter_random = CounterBasedRandom(5, 100, None)
+    first = counter_random.uniforms_at(1, 'recover', [3, 7])
+    assert not np.array_equal(counter_random.uniforms_at(2, 'recover', [3, 7]), first)
+    np.testing.assert_array_equal(counter_random.uniforms_at(1, 'recover', [3, 7]), first)